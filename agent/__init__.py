@@ -1 +1 @@
-from .agent import request_to_agent_async, request_to_agent_sync 
\ No newline at end of file
+from .agent import request_to_agent_async, request_to_agent_sync, prefetch_agent_response 
\ No newline at end of file
@@ -1,11 +1,12 @@
 
-from langchain_core.messages import HumanMessage, SystemMessage, BaseMessage, ToolMessage, AIMessage
+from langchain_core.messages import HumanMessage, SystemMessage, BaseMessage, ToolMessage, AIMessage, AIMessageChunk
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableLambda
+from contextlib import aclosing
 from agent.prompts.main_system_prompt import prompt
-from agent.models.openrouter_models import *
-from agent.models.polza_ai_models import *
-from typing import TypedDict, Annotated
-import operator
+from agent.prompts.summary_prompt import summary_prompt
+from agent.models.openrouter_models import get_model, get_async_model
+from functools import lru_cache
 import logging
 from typing import List
 from agent.tools.pc_control_tools import *
@@ -13,8 +14,11 @@ from agent.tools.web_tools import search_web
 from agent.tools.useful_tools import waiting
 from agent.tools.screen_tools import get_screenshot_tool
 from agent.window_interaction_agent import interact_with_window
-import langchain
 import json
+from agent.tool_executor import ToolExecutor
+from agent.conversation import ConversationStore, MEMORY_KEEP_RECENT_TURNS, render_transcript
+from agent.message_state import (AgentState, TOOLS_TO_HIDE, fill_empty_tool_call_content, make_agent_nodes,
+                                 make_tool_nodes, make_should_continue, tool_result_messages)
 
 tools = [get_installed_software, 
          find_application_name, 
@@ -27,7 +31,18 @@ tools = [get_installed_software,
          interact_with_window]
 
 tools_by_name = {tool.name: tool for tool in tools}
-model_with_tools = gpt_oss_120b.bind_tools(tools)
+tool_executor = ToolExecutor()
+# Модель для фоновой суммаризации старых ходов диалога.
+SUMMARY_MODEL = "gpt_oss_120b"
+
+
+@lru_cache(maxsize=None)
+def get_model_with_tools():
+    return get_model("gpt_oss_120b").bind_tools(tools)
+
+
+def get_async_model_with_tools():
+    return get_async_model("gpt_oss_120b", tools)
 
 
 logging.basicConfig(
@@ -40,221 +55,192 @@ logging.basicConfig(
 )
 
 
-class AgentState(TypedDict):
-    messages: list[BaseMessage]
-    ids_to_hide: Annotated[list[str], operator.add]
-    screenshot_ids_to_hide: Annotated[list[str], operator.add]
-    last_search_web_id: str | None
+def _tool_messages(tool_call, observation):
+    if tool_call["name"] == "get_screenshot_tool":
+        mime_type = observation["mime_type"]
+        screenshot_data = observation["screenshot_data"]
 
- 
-def agent_node(state):
-    logging.info("--- Вход в agent_node ---")
-    # 1. Заглушка для пустого контента (чтобы Xiaomi не крашился)
-    for msg in state["messages"]:
-        if getattr(msg, "type", "") == "ai" and not getattr(msg, "content", "") and getattr(msg, "tool_calls", None):
-            msg.content = "Вызываю инструменты..."
+        human_message_content = [
+            {"type": "text", "text": "Вот запрошенный скриншот для анализа."},
+            {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{screenshot_data}"}}
+        ]
+        tool_confirmation = json.dumps({"status": "success", "message": "Image provided in a new message."})
+        return [HumanMessage(content=human_message_content),
+                ToolMessage(content=tool_confirmation, tool_call_id=tool_call["id"])]
 
-    logging.info(f"Количество сообщений в истории: {len(state['messages'])}")
-    response = model_with_tools.invoke(state["messages"])
-    logging.info(f"Ответ агента получен. Содержит tool_calls: {bool(getattr(response, 'tool_calls', None))}")
-    
-    # 2. КРИТИЧЕСКИ ВАЖНО: склеиваем старую историю с новым ответом!
-    return {"messages": state["messages"] + [response]}
+    return tool_result_messages(tool_call, observation)
 
 
-def tool_node(state: AgentState) -> dict:
-    logging.info("--- Вход в tool_node ---")
-    tools_to_hide = ["scrape_application", "get_installed_software", "get_screenshot_tool"]
-    last_message = state["messages"][-1]
-    
-    is_search_web_called_now = any(
-        tc["name"] == "search_web" for tc in last_message.tool_calls
-    )
-    
-    previous_search_web_id = state.get("last_search_web_id")
-
-    is_heavy_tool_called = any(
-        tc["name"] in tools_to_hide for tc in last_message.tool_calls
-    )
+should_continue = make_should_continue()
 
-    should_clean_history = is_heavy_tool_called or (is_search_web_called_now and previous_search_web_id)
-    logging.info(f"Очистка истории необходима: {should_clean_history}")
-
-    previous_ids_to_hide = state.get("ids_to_hide", [])
-    screenshot_ids_to_hide = state.get("screenshot_ids_to_hide", [])
-    cleaned_messages = []
-
-    if should_clean_history:
-        logging.info("Выполняется очистка контекста от тяжелых результатов...")
-        i = 0
-        while i < len(state["messages"]):
-            msg = state["messages"][i]
-            
-            if isinstance(msg, ToolMessage):
-                should_hide = False
-                if msg.tool_call_id in previous_ids_to_hide:
-                    should_hide = True
-                
-                elif is_search_web_called_now and msg.tool_call_id == previous_search_web_id:
-                    should_hide = True
-
-                if should_hide:
-                    if "Ошибка" in msg.content or "ошибка" in msg.content:
-                        cleaned_messages.append(
-                            ToolMessage(
-                                content=msg.content,
-                                tool_call_id=msg.tool_call_id,
-                            )
-                        )
-                    else:
-                        cleaned_messages.append(
-                            ToolMessage(
-                                content="Результат выполнения предыдущего инструмента скрыт для экономии контекста.",
-                                tool_call_id=msg.tool_call_id,
-                            )
-                        )
-                    
-                    if msg.tool_call_id in screenshot_ids_to_hide:
-                        if i + 1 < len(state["messages"]):
-                            next_msg = state["messages"][i + 1]
-                            if isinstance(next_msg, HumanMessage):
-                                content = next_msg.content
-                                if isinstance(content, list):
-                                    has_image = any(
-                                        isinstance(c, dict) and c.get("type") == "image_url"
-                                        for c in content
-                                    )
-                                    if has_image:
-                                        i += 1
-                else:
-                    cleaned_messages.append(msg)
-            else:
-                 cleaned_messages.append(msg)
-            
-            i += 1
-    else:
-        cleaned_messages = state["messages"]
-
-    new_tool_results = []
-    current_ids_to_hide = list(previous_ids_to_hide)
-    current_screenshot_ids = list(screenshot_ids_to_hide)
-    current_search_web_id = None
-
-    logging.info(f"Вызов инструментов: {[tc['name'] for tc in last_message.tool_calls]}")
-    for tool_call in last_message.tool_calls:
-        tool = tools_by_name[tool_call["name"]]
-        logging.info(f"Выполнение инструмента: {tool_call['name']} с аргументами: {tool_call['args']}")
-        
-        if tool_call["name"] == "search_web":
-            current_search_web_id = tool_call["id"]
-
-        if tool_call["name"] == "get_screenshot_tool":
-            screenshot = tool.invoke(tool_call["args"])
-            mime_type = screenshot["mime_type"]
-            screenshot_data = screenshot["screenshot_data"]
-            
-            human_message_content = [
-                {"type": "text", "text": "Вот запрошенный скриншот для анализа."},
-                {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{screenshot_data}"}}
-            ]
-            new_tool_results.append(HumanMessage(content=human_message_content))
-            
-            tool_confirmation = json.dumps({"status": "success", "message": "Image provided in a new message."})
-            new_tool_results.append(ToolMessage(content=tool_confirmation, tool_call_id=tool_call["id"]))
-            
-            current_screenshot_ids.append(tool_call["id"])
-        else:
-            observation = tool.invoke(tool_call["args"])
-            new_tool_results.append(
-                ToolMessage(content=str(observation), tool_call_id=tool_call["id"])
-            )
-        
-        if tool_call["name"] in tools_to_hide:
-            current_ids_to_hide.append(tool_call["id"])
-    
-    logging.info("Все инструменты выполнены.")
-    return {
-        "messages": cleaned_messages + new_tool_results,
-        "ids_to_hide": current_ids_to_hide,
-        "screenshot_ids_to_hide": current_screenshot_ids,
-        "last_search_web_id": current_search_web_id,
-    }
 
+def route_entry(state):
+    # Если первый ответ модели уже получен спекулятивно, граф начинается сразу с инструментов.
+    if isinstance(state["messages"][-1], AIMessage):
+        return should_continue(state)
+    return "agent"
 
 
+def build_graph(async_nodes=True):
+    """
+    С async_nodes узлы имеют асинхронные реализации: в astream/ainvoke вызов модели идёт через ainvoke
+    и не занимает поток пула на время запроса, а отмена задачи обрывает сам HTTP-запрос.
+    Синхронный invoke (request_to_agent_sync) по-прежнему использует синхронные узлы.
+    """
+    # Узлы собираются при построении графа из текущих get_model_with_tools и tools_by_name.
+    agent_node, agent_node_async = make_agent_nodes(get_model_with_tools, get_async_model_with_tools)
+    tool_node, tool_node_async = make_tool_nodes(tools_by_name, tool_executor, TOOLS_TO_HIDE, tool_messages=_tool_messages)
+    workflow = StateGraph(AgentState)
 
-def should_continue(state):
-    last_message = state["messages"][-1]
-    if hasattr(last_message, "tool_calls") and last_message.tool_calls:
-        logging.info("Цикл продолжается: агент запросил вызов инструментов.")
-        return "continue"
+    if async_nodes:
+        workflow.add_node("agent", RunnableLambda(agent_node, afunc=agent_node_async))
+        workflow.add_node("action", RunnableLambda(tool_node, afunc=tool_node_async))
     else:
-        logging.info("Цикл завершен: агент вернул финальный ответ.")
-        return "end"
-
-
-workflow = StateGraph(AgentState)
+        workflow.add_node("agent", agent_node)
+        workflow.add_node("action", tool_node)
+
+    workflow.set_conditional_entry_point(
+        route_entry,
+        {
+            "agent": "agent",
+            "continue": "action",
+            "end": END,
+        },
+    )
 
-workflow.add_node("agent", agent_node)
-workflow.add_node("action", tool_node)
+    workflow.add_conditional_edges(
+        "agent",
+        should_continue,
+        {
+            "continue": "action",
+            "end": END,
+        },
+    )
 
-workflow.set_entry_point("agent")
+    workflow.add_edge("action", "agent")
 
-workflow.add_conditional_edges(
-    "agent",
-    should_continue,
-    {
-        "continue": "action",
-        "end": END,
-    },
-)
+    return workflow.compile()
 
-workflow.add_edge("action", "agent")
 
-graph = workflow.compile()
+graph = build_graph()
 
 config = {"recursion_limit": 200}
 
 #for chunk in graph.stream(input_data, stream_mode="values", config=config):
 #    print(chunk, end="", flush=True)
 
-async def request_to_agent_async(req: List):
+async def summarize_conversation(previous_summary: str | None, messages: List) -> str:
+    """Сворачивает старые ходы диалога вместе с прошлой сводкой в новую сводку (см. ConversationStore)."""
+    request = f"Предыдущая сводка:\n{previous_summary or '(нет)'}\n\nСтарые ходы разговора:\n{render_transcript(messages)}"
+    response = await get_async_model(SUMMARY_MODEL).ainvoke([SystemMessage(summary_prompt), HumanMessage(content=request)])
+    return _chunk_text(response).strip()
+
+
+def new_conversation(token_budget: int | None = None,
+                     keep_recent_turns: int = MEMORY_KEEP_RECENT_TURNS) -> ConversationStore:
+    return ConversationStore(prompt, token_budget=token_budget, keep_recent_turns=keep_recent_turns,
+                             summarize=summarize_conversation)
+
+
+def _with_system_prompt(req: List) -> list:
+    # История из ConversationStore.messages() уже начинается с системного промпта — второй не добавляется.
+    if req and isinstance(req[0], SystemMessage):
+        return list(req)
+    return [SystemMessage(prompt)] + req
+
+
+async def prefetch_agent_response(req: List) -> AIMessage:
+    """
+    Спекулятивный первый шаг агента: только вызов LLM, без выполнения инструментов.
+    Результат передаётся в request_to_agent_async(first_response=...) после подтверждения запроса.
+    """
+    logging.info(f"Спекулятивный запрос к модели: {req}")
+    return await get_async_model_with_tools().ainvoke(_with_system_prompt(req))
+
+
+def _chunk_text(chunk) -> str:
+    content = chunk.content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _cancelled(cancel_event) -> bool:
+    if cancel_event is not None and cancel_event.is_set():
+        logging.info("Запрос к агенту отменён.")
+        return True
+    return False
+
+
+async def _stream_graph(input_data: dict, on_text, cancel_event=None) -> list | None:
+    """
+    Прогоняет граф, передавая в on_text токены ответов узла agent по мере генерации.
+    Ходы, в которых модель начала вызывать инструменты, дальше не озвучиваются.
+    """
+    final_state = None
+    tool_turns = set()
+    async with aclosing(graph.astream(input_data, config=config, stream_mode=["messages", "values"])) as stream:
+        async for mode, payload in stream:
+            if _cancelled(cancel_event):
+                return None
+            if mode == "values":
+                final_state = payload
+                continue
+            chunk, metadata = payload
+            if metadata.get("langgraph_node") != "agent" or not isinstance(chunk, AIMessageChunk):
+                continue
+            if chunk.tool_call_chunks:
+                tool_turns.add(chunk.id)
+            if chunk.id in tool_turns:
+                continue
+            text = _chunk_text(chunk)
+            if text:
+                on_text(text)
+    logging.info("Граф успешно отработал (потоковый режим).")
+    return final_state["messages"] if final_state else None
+
+
+async def request_to_agent_async(req: List, first_response: AIMessage | None = None, on_text=None,
+                                 cancel_event=None):
+    """
+    cancel_event — любое событие с is_set() (например, threading.Event остановки приложения): проверяется
+    между шагами и токенами графа, после чего граф закрывается и возвращается None. Отмена самой задачи
+    asyncio тоже поддерживается: узлы асинхронные и прерываются на текущем await.
+    """
     logging.info(f"Получен новый запрос: {req}")
     
     try:
-        input_data = {"messages": [SystemMessage(prompt)] + req}
+        input_data = {"messages": _with_system_prompt(req)}
+        if first_response is not None:
+            logging.info("Используется подтверждённый спекулятивный ответ модели.")
+            if not first_response.tool_calls:
+                return input_data["messages"] + [first_response]
+            input_data["messages"].append(first_response)
+        fill_empty_tool_call_content(input_data["messages"])
         logging.info("Данные для графа подготовлены.")
+        if on_text is not None:
+            return await _stream_graph(input_data, on_text, cancel_event)
         logging.info("Вызов графа в асинхронном потоковом режиме...")
-        
-        final_answer = None
-        last_chunk = None 
-
-        async for chunk in graph.astream(input_data, config={"recursion_limit": 200}):
-            if "__end__" not in chunk:
-                logging.info(f"Промежуточный шаг графа: {chunk}")
-            
-            last_chunk = chunk
 
-            if "__end__" in chunk:
-                final_answer = chunk["__end__"]
+        # Как и в потоковом режиме, возвращается весь список сообщений графа: вызовы инструментов и их
+        # результаты за ход тоже попадают в историю (ConversationStore.add_agent_result).
+        final_state = None
+        async with aclosing(graph.astream(input_data, config=config, stream_mode="values")) as stream:
+            async for state in stream:
+                if _cancelled(cancel_event):
+                    return None
+                final_state = state
+                logging.info(f"Промежуточный шаг графа: {state['messages'][-1]}")
 
         logging.info("Граф успешно отработал.")
 
-        if final_answer:
-            answer = final_answer.get("messages")
-            logging.info("Ответ успешно извлечен из финального узла.")
-            logging.info(answer)
+        answer = final_state["messages"] if final_state else None
+        if answer and isinstance(answer[-1], AIMessage):
+            logging.info("Ответ успешно извлечен из финального состояния графа.")
+            logging.info(answer[-1])
             return answer
-        elif last_chunk and "agent" in last_chunk:
-            agent_messages = last_chunk["agent"].get("messages", [])
-            if agent_messages and isinstance(agent_messages[-1], AIMessage):
-                answer = [agent_messages[-1]]
-                logging.info("Извлечен прямой текстовый ответ от агента.")
-                logging.info(answer)
-                return answer
-        else:
-            logging.warning("Граф завершил работу, но не вернул никакого ответа.")
-            return None
+        logging.warning("Граф завершил работу, но не вернул никакого ответа.")
+        return None
 
     except Exception as e:
         logging.error(f"Произошла ошибка при обработке запроса: {req}", exc_info=True)
@@ -263,7 +249,8 @@ async def request_to_agent_async(req: List):
 def request_to_agent_sync(req: List):
     logging.info(f"Получен новый запрос: {req}")
     
-    input_data = {"messages": [SystemMessage(prompt)] + req}
+    input_data = {"messages": _with_system_prompt(req)}
+    fill_empty_tool_call_content(input_data["messages"])
     
     response = graph.invoke(input=input_data, config=config)
     
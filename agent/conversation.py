@@ -0,0 +1,253 @@
+import asyncio
+import json
+import logging
+import time
+from functools import lru_cache
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+# Кодировка токенизатора gpt-oss; без файла кодировки (нет сети) число токенов оценивается по символам.
+TOKEN_ENCODING = "o200k_base"
+TOKEN_ESTIMATE_CHARS = 3.5
+# Служебные токены разметки на каждое сообщение в chat-формате.
+MESSAGE_OVERHEAD_TOKENS = 4
+# Сколько символов результата инструмента остаётся в сжатом следе хода.
+TOOL_TRACE_RESULT_CHARS = 200
+TOOL_TRACE_PREFIX = "Вызванные инструменты: "
+# Сколько последних ходов (реплика пользователя и ответ) не сворачивается в сводку при превышении бюджета.
+MEMORY_KEEP_RECENT_TURNS = 3
+SUMMARY_PREFIX = "Краткое содержание предыдущей части разговора:\n"
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        logging.warning(f"Токенизатор {TOKEN_ENCODING} недоступен, токены оцениваются по длине текста: {e}")
+        return None
+
+
+def count_tokens(text):
+    encoding = _encoding()
+    if encoding is None:
+        return int(len(text) / TOKEN_ESTIMATE_CHARS) + 1 if text else 0
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_text(message):
+    content = message.content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def message_tokens(message):
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(message_text(message))
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += count_tokens(tool_call["name"]) + count_tokens(json.dumps(tool_call["args"], ensure_ascii=False))
+    return tokens
+
+
+def messages_tokens(messages):
+    return sum(message_tokens(message) for message in messages)
+
+
+def _shorten(text, limit):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def compact_turn(messages, result_chars=TOOL_TRACE_RESULT_CHARS):
+    """
+    Сжимает сообщения одного хода агента (после запроса пользователя): вызовы инструментов
+    и их результаты сворачиваются в одно сообщение-след, финальный ответ остаётся без служебных полей.
+    """
+    calls = []
+    results = {}
+    answer = None
+    for message in messages:
+        if isinstance(message, ToolMessage):
+            results[message.tool_call_id] = message_text(message)
+        elif isinstance(message, AIMessage):
+            if message.tool_calls:
+                calls.extend(message.tool_calls)
+            elif message_text(message):
+                answer = message
+    compacted = []
+    if calls:
+        trace = []
+        for tool_call in calls:
+            args = json.dumps(tool_call["args"], ensure_ascii=False)
+            result = _shorten(results.get(tool_call["id"], "нет результата"), result_chars)
+            trace.append(f"{tool_call['name']}({args}) → {result}")
+        compacted.append(AIMessage(content=TOOL_TRACE_PREFIX + "; ".join(trace)))
+    if answer is not None:
+        compacted.append(AIMessage(content=message_text(answer)))
+    return compacted
+
+
+def render_transcript(messages):
+    """Текст ходов для суммаризации: реплики пользователя, ответы и след инструментов."""
+    lines = []
+    for message in messages:
+        role = "Пользователь" if isinstance(message, HumanMessage) else "Ассистент"
+        lines.append(f"{role}: {message_text(message)}")
+    return "\n".join(lines)
+
+
+class ConversationStore:
+    """
+    История диалога между запросами к агенту. Системный промпт — один объект в начале каждого запроса
+    (стабильный префикс, который провайдер может кэшировать); между запросами хранятся только реплики
+    пользователя, ответы агента и сжатый след вызванных инструментов, без полных результатов.
+
+    С token_budget история ограничена по токенам: когда запрос (системный промпт, сводка и ходы) превышает
+    бюджет, старые ходы, кроме keep_recent_turns последних, сворачиваются в фоне корутиной
+    summarize(previous_summary, messages) -> str в общую сводку, которая идёт сразу после системного
+    промпта. Запрос, пришедший во время суммаризации, уходит с полной историей — ответ не ждёт сводку.
+    """
+
+    def __init__(self, system_prompt, result_chars=TOOL_TRACE_RESULT_CHARS, token_budget=None,
+                 keep_recent_turns=MEMORY_KEEP_RECENT_TURNS, summarize=None):
+        self.system_message = SystemMessage(system_prompt)
+        self.system_tokens = message_tokens(self.system_message)
+        self.result_chars = result_chars
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.summarize = summarize
+        self.turns = []
+        self.turn_tokens = []
+        self.summary = None
+        self.summary_message = None
+        self.summary_tokens = 0
+        self.summaries = 0
+        # По каждой применённой сводке: время суммаризации и токены истории до и после свёртки.
+        self.summary_stats = []
+        self.last_request_usage = None
+        self._last_user = None
+        self._summary_task = None
+
+    def messages(self):
+        """Сообщения для запроса к агенту: системный промпт, сводка старых ходов и история."""
+        prefix = [self.system_message]
+        if self.summary_message is not None:
+            prefix.append(self.summary_message)
+        return prefix + self.turns
+
+    def add_user(self, text):
+        message = HumanMessage(content=text)
+        self._append([message])
+        self._last_user = message
+        self.last_request_usage = self.usage()
+        return message
+
+    def add_agent_result(self, messages):
+        """
+        Сохраняет ход агента. messages — результат request_to_agent_async: полный список графа
+        (начинается с messages()) или только новые сообщения.
+        """
+        for index in range(len(messages) - 1, -1, -1):
+            if messages[index] is self._last_user:
+                messages = messages[index + 1:]
+                break
+        compacted = compact_turn(messages, self.result_chars)
+        self._append(compacted)
+        if self.last_request_usage is not None:
+            self.last_request_usage.update(_reported_usage(messages))
+        self._schedule_summary()
+        return compacted
+
+    def _append(self, messages):
+        self.turns.extend(messages)
+        self.turn_tokens.extend(message_tokens(message) for message in messages)
+
+    def tokens(self):
+        return self.system_tokens + self.summary_tokens + sum(self.turn_tokens)
+
+    def usage(self):
+        """Токены запроса по частям: системный промпт, сводка, ходы, всего и бюджет."""
+        return {
+            "system_tokens": self.system_tokens,
+            "summary_tokens": self.summary_tokens,
+            "turn_tokens": sum(self.turn_tokens),
+            "total_tokens": self.tokens(),
+            "token_budget": self.token_budget,
+            "turns": len(self.turns),
+            "summaries": self.summaries,
+        }
+
+    def _split_point(self):
+        """Индекс, с которого начинаются keep_recent_turns последних ходов (ход начинается с реплики)."""
+        starts = [i for i, message in enumerate(self.turns) if isinstance(message, HumanMessage)]
+        if len(starts) <= self.keep_recent_turns:
+            return 0
+        return starts[-self.keep_recent_turns] if self.keep_recent_turns else len(self.turns)
+
+    def _schedule_summary(self):
+        if self.token_budget is None or self.summarize is None or self.tokens() <= self.token_budget:
+            return None
+        if self._summary_task is not None and not self._summary_task.done():
+            return self._summary_task
+        split = self._split_point()
+        if split == 0:
+            return None
+        self._summary_task = asyncio.get_running_loop().create_task(self._summarize(self.turns[:split]))
+        return self._summary_task
+
+    async def _summarize(self, old_turns):
+        started = time.perf_counter()
+        logging.info(f"Суммаризация истории: {len(old_turns)} сообщений, {self.tokens()} токенов "
+                     f"при бюджете {self.token_budget}.")
+        try:
+            summary = await self.summarize(self.summary, old_turns)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning(f"Суммаризация истории не удалась, история сохранена целиком: {e}")
+            return
+        # Пока шла суммаризация, в конец могли добавиться новые ходы: заменяются только свёрнутые.
+        count = len(old_turns)
+        if len(self.turns) < count or any(a is not b for a, b in zip(self.turns, old_turns)):
+            logging.warning("История изменилась во время суммаризации, сводка отброшена.")
+            return
+        tokens_before = self.tokens()
+        self.summary = summary
+        self.summary_message = SystemMessage(SUMMARY_PREFIX + summary)
+        self.summary_tokens = message_tokens(self.summary_message)
+        self.turns = self.turns[count:]
+        self.turn_tokens = self.turn_tokens[count:]
+        self.summaries += 1
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.summary_stats.append({"ms": elapsed_ms, "tokens_before": tokens_before, "tokens_after": self.tokens()})
+        logging.info(f"История свёрнута за {elapsed_ms:.0f} мс: "
+                     f"сводка {self.summary_tokens} токенов, всего {self.tokens()}.")
+
+    async def wait_summary(self):
+        if self._summary_task is not None:
+            await asyncio.shield(self._summary_task)
+
+    def close(self):
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+
+    def clear(self):
+        self.close()
+        self.turns = []
+        self.turn_tokens = []
+        self.summary = None
+        self.summary_message = None
+        self.summary_tokens = 0
+
+
+def _reported_usage(messages):
+    """Фактические токены по usage_metadata ответов модели за ход (если провайдер их вернул)."""
+    usage = {"input_tokens": 0, "output_tokens": 0, "model_calls": 0}
+    for message in messages:
+        metadata = getattr(message, "usage_metadata", None)
+        if isinstance(message, AIMessage) and metadata:
+            usage["input_tokens"] += metadata.get("input_tokens", 0)
+            usage["output_tokens"] += metadata.get("output_tokens", 0)
+            usage["model_calls"] += 1
+    return usage if usage["model_calls"] else {}
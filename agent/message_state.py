@@ -0,0 +1,192 @@
+import logging
+from typing import TypedDict, Annotated
+
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage
+
+HIDDEN_TOOL_RESULT = "Результат выполнения предыдущего инструмента скрыт для экономии контекста."
+HIDDEN_SCREENSHOT = "Скриншот скрыт для экономии контекста."
+# Результаты этих инструментов скрываются из истории на следующих шагах.
+TOOLS_TO_HIDE = ["scrape_application", "get_installed_software", "get_screenshot_tool"]
+
+
+class MessagesPatch:
+    """Обновление messages от tool_node: новые сообщения в конец и замены уже скрытых по позиции."""
+
+    def __init__(self, append, replace=None):
+        self.append = append
+        self.replace = replace or {}
+
+
+def append_messages(current, update):
+    """
+    Редьюсер messages: узлы возвращают только новые сообщения (и замены скрытых), а не всю историю.
+    Копируется лишь список ссылок: LangGraph делит значение канала между его копиями внутри шага,
+    поэтому дописывать в current на месте нельзя.
+    """
+    if isinstance(update, MessagesPatch):
+        merged = current + update.append
+        for position, message in update.replace.items():
+            merged[position] = message
+        return merged
+    return current + update
+
+
+class AgentState(TypedDict):
+    messages: Annotated[list[BaseMessage], append_messages]
+    # Ещё не скрытые результаты тяжёлых инструментов (tool_call_id).
+    ids_to_hide: set[str]
+    last_search_web_id: str | None
+    # Позиции в messages сообщений результата (ToolMessage и картинка скриншота) для ids_to_hide
+    # и last_search_web_id: скрытие трогает только их, без прохода по всей истории.
+    result_positions: dict[str, list[int]]
+
+
+def fill_empty_tool_call_content(messages):
+    # Заглушка для пустого контента (чтобы Xiaomi не крашился)
+    for msg in messages:
+        if getattr(msg, "type", "") == "ai" and not getattr(msg, "content", "") and getattr(msg, "tool_calls", None):
+            msg.content = "Вызываю инструменты..."
+
+
+def _hidden_copy(msg):
+    if isinstance(msg, ToolMessage):
+        if "Ошибка" in msg.content or "ошибка" in msg.content:
+            return None
+        return ToolMessage(content=HIDDEN_TOOL_RESULT, tool_call_id=msg.tool_call_id)
+    return HumanMessage(content=HIDDEN_SCREENSHOT)
+
+
+def tool_step_update(state, tool_calls, results, tools_to_hide, log_prefix=""):
+    """
+    Обновление состояния после выполнения tool_calls: results — списки сообщений каждого вызова.
+    Если вызван тяжёлый инструмент (или повторный search_web), скрываются ждущие результаты прошлых шагов;
+    результаты с ошибкой остаются как есть.
+    """
+    messages = state["messages"]
+    pending = state.get("ids_to_hide") or set()
+    positions = state.get("result_positions") or {}
+    previous_search_web_id = state.get("last_search_web_id")
+
+    is_search_web_called_now = any(tc["name"] == "search_web" for tc in tool_calls)
+    is_heavy_tool_called = any(tc["name"] in tools_to_hide for tc in tool_calls)
+    should_clean_history = is_heavy_tool_called or (is_search_web_called_now and previous_search_web_id)
+    logging.info(f"{log_prefix}Очистка истории необходима: {bool(should_clean_history)}")
+
+    replace = {}
+    if should_clean_history:
+        hide = set(pending)
+        if is_search_web_called_now and previous_search_web_id:
+            hide.add(previous_search_web_id)
+        logging.info(f"{log_prefix}Скрываются результаты инструментов: {len(hide)}")
+        for tool_call_id in hide:
+            for position in positions.get(tool_call_id, []):
+                hidden = _hidden_copy(messages[position])
+                if hidden is not None:
+                    replace[position] = hidden
+        pending = set()
+
+    new_messages = []
+    new_pending = set(pending)
+    new_positions = {tool_call_id: positions[tool_call_id] for tool_call_id in pending if tool_call_id in positions}
+    current_search_web_id = None
+    for tool_call, tool_messages in zip(tool_calls, results):
+        start = len(messages) + len(new_messages)
+        new_messages.extend(tool_messages)
+        tool_positions = list(range(start, start + len(tool_messages)))
+
+        if tool_call["name"] == "search_web":
+            current_search_web_id = tool_call["id"]
+            new_positions[tool_call["id"]] = tool_positions
+
+        if tool_call["name"] in tools_to_hide:
+            new_pending.add(tool_call["id"])
+            new_positions[tool_call["id"]] = tool_positions
+
+    return {
+        "messages": MessagesPatch(new_messages, replace),
+        "ids_to_hide": new_pending,
+        "last_search_web_id": current_search_web_id,
+        "result_positions": new_positions,
+    }
+
+
+def tool_result_messages(tool_call, observation):
+    return [ToolMessage(content=str(observation), tool_call_id=tool_call["id"])]
+
+
+def make_agent_nodes(get_model, get_async_model, log_prefix=""):
+    """
+    Узел agent для графа агента: синхронная реализация (invoke) и асинхронная (ainvoke).
+    get_model и get_async_model возвращают модель с привязанными инструментами.
+    """
+
+    def agent_input(state):
+        logging.info(f"--- {log_prefix}Вход в agent_node ---")
+        logging.info(f"{log_prefix}Количество сообщений в истории: {len(state['messages'])}")
+        return state["messages"]
+
+    def agent_update(response):
+        logging.info(f"{log_prefix}Ответ агента получен. Содержит tool_calls: {bool(getattr(response, 'tool_calls', None))}")
+        fill_empty_tool_call_content([response])
+        # Редьюсер append_messages дописывает ответ к истории.
+        return {"messages": [response]}
+
+    def agent_node(state):
+        return agent_update(get_model().invoke(agent_input(state)))
+
+    async def agent_node_async(state):
+        return agent_update(await get_async_model().ainvoke(agent_input(state)))
+
+    return agent_node, agent_node_async
+
+
+def make_tool_nodes(tools_by_name, tool_executor, tools_to_hide=TOOLS_TO_HIDE, tool_messages=tool_result_messages,
+                    log_prefix=""):
+    """
+    Узел action для графа агента: синхронная и асинхронная реализации.
+    tool_messages(tool_call, observation) превращает результат инструмента в сообщения истории.
+    """
+
+    def tool_for(tool_call):
+        logging.info(f"{log_prefix}Выполнение инструмента: {tool_call['name']} с аргументами: {tool_call['args']}")
+        return tools_by_name[tool_call["name"]]
+
+    def run_tool(tool_call):
+        return tool_messages(tool_call, tool_for(tool_call).invoke(tool_call["args"]))
+
+    async def arun_tool(tool_call):
+        return tool_messages(tool_call, await tool_for(tool_call).ainvoke(tool_call["args"]))
+
+    def tool_calls_of(state):
+        logging.info(f"--- {log_prefix}Вход в tool_node ---")
+        tool_calls = state["messages"][-1].tool_calls
+        logging.info(f"{log_prefix}Вызов инструментов: {[tc['name'] for tc in tool_calls]}")
+        return tool_calls
+
+    def tool_update(state, tool_calls, results):
+        logging.info(f"{log_prefix}Все инструменты выполнены.")
+        return tool_step_update(state, tool_calls, results, tools_to_hide, log_prefix=log_prefix)
+
+    def tool_node(state: AgentState) -> dict:
+        tool_calls = tool_calls_of(state)
+        # Независимые инструменты выполняются одновременно, результаты — в исходном порядке tool_calls.
+        return tool_update(state, tool_calls, tool_executor.run(tool_calls, run_tool))
+
+    async def tool_node_async(state: AgentState) -> dict:
+        tool_calls = tool_calls_of(state)
+        return tool_update(state, tool_calls, await tool_executor.arun(tool_calls, arun_tool))
+
+    return tool_node, tool_node_async
+
+
+def make_should_continue(log_prefix=""):
+    def should_continue(state):
+        last_message = state["messages"][-1]
+        if hasattr(last_message, "tool_calls") and last_message.tool_calls:
+            logging.info(f"{log_prefix}Цикл продолжается: агент запросил вызов инструментов.")
+            return "continue"
+        else:
+            logging.info(f"{log_prefix}Цикл завершен: агент вернул финальный ответ.")
+            return "end"
+
+    return should_continue
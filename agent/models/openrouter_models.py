@@ -1,89 +1,141 @@
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
 from dotenv import load_dotenv
+import asyncio
 import os
 
 load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-BASE_URL = "https://openrouter.ai/api/v1"
-
-gpt_oss_120b = ChatOpenAI(
-    model="openai/gpt-oss-120b",
-    api_key=OPENROUTER_API_KEY,
-    base_url=BASE_URL,
-    temperature=0.7,
-    extra_body={
-        "provider": {
-            "sort": "latency",
-            "allow_fallbacks": True,
-            "ignore": ["google-vertex/global"]
-        }
-    }
-)
-
-glm_5 = ChatOpenAI(
-    model="z-ai/glm-5",
-    api_key=OPENROUTER_API_KEY,
-    base_url=BASE_URL,
-    temperature=0.5,
-    extra_body={
-        "provider": {
-            "sort": "latency",
-            "allow_fallbacks": False
+BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+# Клиенты ChatOpenAI создаются при первом обращении (get_model или атрибут модуля),
+# чтобы импорт агента не строил все клиенты и не тянул langchain_openai раньше времени.
+MODEL_CONFIGS = {
+    "gpt_oss_120b": dict(
+        model="openai/gpt-oss-120b",
+        temperature=0.7,
+        # usage в потоковом ответе: фактические токены запроса видны в ConversationStore.last_request_usage.
+        stream_usage=True,
+        extra_body={
+            "provider": {
+                "sort": "latency",
+                "allow_fallbacks": True,
+                "ignore": ["google-vertex/global"]
+            }
         }
-    },
+    ),
+    "glm_5": dict(
+        model="z-ai/glm-5",
+        temperature=0.5,
+        extra_body={
+            "provider": {
+                "sort": "latency",
+                "allow_fallbacks": False
+            }
+        },
         model_kwargs={
-        "reasoning": {
-            "enabled": False
-        }
-    }
-)
-
-deepseek_v4_flash = ChatOpenAI(
-    model="deepseek/deepseek-v4-flash",
-    api_key=OPENROUTER_API_KEY,
-    base_url=BASE_URL,
-    temperature=0.5,
-    extra_body={
-        "provider": {
-            "sort": "latency",
-            "allow_fallbacks": False
+            "reasoning": {
+                "enabled": False
+            }
         }
-    },
-    model_kwargs={
-        "reasoning": {
-            "enabled": False
-        }
-    }
-)
-
-nvidia_nemotron_3_super_120b_a12b = ChatOpenAI(
-    model="nvidia/nemotron-3-super-120b-a12b",
-    api_key=OPENROUTER_API_KEY,
-    base_url=BASE_URL,
-    temperature=0.8,
-    extra_body={
-        "provider": {
-            "sort": "latency",
-            "allow_fallbacks": False,
-            "ignore": ["google-vertex/global"]
+    ),
+    "deepseek_v4_flash": dict(
+        model="deepseek/deepseek-v4-flash",
+        temperature=0.5,
+        extra_body={
+            "provider": {
+                "sort": "latency",
+                "allow_fallbacks": False
+            }
+        },
+        model_kwargs={
+            "reasoning": {
+                "enabled": False
+            }
         }
-    },
-    model_kwargs={
-        "reasoning": {
-            "enabled": False
+    ),
+    "nvidia_nemotron_3_super_120b_a12b": dict(
+        model="nvidia/nemotron-3-super-120b-a12b",
+        temperature=0.8,
+        extra_body={
+            "provider": {
+                "sort": "latency",
+                "allow_fallbacks": False,
+                "ignore": ["google-vertex/global"]
+            }
+        },
+        model_kwargs={
+            "reasoning": {
+                "enabled": False
+            }
         }
-    }
-)
-
-grok43 = ChatOpenAI(
-    model="x-ai/grok-4.3",
-    api_key=OPENROUTER_API_KEY,
-    base_url=BASE_URL,
-    temperature=0.5,
-    model_kwargs={
-        "reasoning": {
-            "enabled": False
+    ),
+    "grok43": dict(
+        model="x-ai/grok-4.3",
+        temperature=0.5,
+        model_kwargs={
+            "reasoning": {
+                "enabled": False
+            }
         }
-    }
-)
\ No newline at end of file
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def get_model(name):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(api_key=OPENROUTER_API_KEY, base_url=BASE_URL, **MODEL_CONFIGS[name])
+
+
+# Модели для ainvoke по циклам событий: асинхронный HTTP-клиент привязан к циклу, в котором создан,
+# и после закрытия цикла (следующий asyncio.run) им пользоваться нельзя.
+# На цикл — один httpx.AsyncClient, общий для всех моделей этого цикла.
+_loop_models = {}
+
+
+async def _close_loop_client(loop, client):
+    """
+    Живёт до конца цикла: asyncio.run перед закрытием отменяет незавершённые задачи и дожидается их,
+    так что клиент закрывается, пока цикл ещё работает, а запись о цикле удаляется.
+    """
+    try:
+        await loop.create_future()
+    finally:
+        _loop_models.pop(loop, None)
+        await client.aclose()
+
+
+def _models_for_loop(loop):
+    entry = _loop_models.get(loop)
+    if entry is None:
+        import httpx
+
+        client = httpx.AsyncClient()
+        # Ссылка на задачу хранится в записи, иначе незавершённую задачу может собрать GC.
+        entry = {"client": client, "models": {}, "closer": loop.create_task(_close_loop_client(loop, client))}
+        _loop_models[loop] = entry
+    return entry
+
+
+def get_async_model(name, tools=None):
+    """ChatOpenAI (с bind_tools, если переданы tools) для ainvoke в текущем цикле событий."""
+    entry = _models_for_loop(asyncio.get_running_loop())
+    key = (name, tuple(tool.name for tool in tools) if tools else None)
+    model = entry["models"].get(key)
+    if model is None:
+        from langchain_openai import ChatOpenAI
+
+        model = ChatOpenAI(api_key=OPENROUTER_API_KEY, base_url=BASE_URL, http_async_client=entry["client"],
+                           **MODEL_CONFIGS[name])
+        if tools:
+            model = model.bind_tools(tools)
+        entry["models"][key] = model
+    return model
+
+
+def __getattr__(name):
+    if name in MODEL_CONFIGS:
+        return get_model(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import re
+import time
+
+from langchain_core.messages import HumanMessage
+
+
+def normalize_transcript(text):
+    return " ".join(re.findall(r"\w+", (text or "").lower()))
+
+
+class SpeculativeDispatcher:
+    """
+    Запускает первый вызов LLM по стабильной частичной расшифровке, пока VAD ещё ждёт конца фразы.
+
+    prefetch_fn должна только обращаться к модели (см. prefetch_agent_response): инструменты
+    с побочными эффектами выполняются лишь в request_to_agent_async после resolve().
+    """
+
+    def __init__(self, loop, prefetch_fn):
+        self.loop = loop
+        self.prefetch_fn = prefetch_fn
+        self.started = 0
+        self.committed = 0
+        self.aborted = 0
+        self.saved_ms = 0.0
+        self._task = None
+        self._text = None
+        self._started_at = None
+
+    def submit_partial(self, text, history):
+        # Вызывается из потока распознавания.
+        self.loop.call_soon_threadsafe(self._start, text, list(history))
+
+    def _start(self, text, history):
+        if self._task is not None and normalize_transcript(text) == normalize_transcript(self._text):
+            return
+        self._abort()
+        logging.info(f"Спекулятивный запуск агента по частичной расшифровке: '{text}'")
+        self._text = text
+        self._started_at = time.perf_counter()
+        self._task = self.loop.create_task(self.prefetch_fn(history + [HumanMessage(content=text)]))
+        self.started += 1
+
+    def _abort(self):
+        if self._task is not None:
+            self._task.cancel()
+            self.aborted += 1
+        self._task = None
+        self._text = None
+
+    def cancel(self):
+        self._abort()
+
+    async def resolve(self, final_text):
+        """Возвращает готовый первый ответ модели, если финальная расшифровка совпала со спекулятивной."""
+        # Даём выполниться отложенным _start из потока распознавания.
+        await asyncio.sleep(0)
+        if self._task is None:
+            return None
+        if normalize_transcript(final_text) != normalize_transcript(self._text):
+            logging.info(f"Спекуляция отменена: '{self._text}' != '{final_text}'")
+            self._abort()
+            return None
+
+        task, started_at = self._task, self._started_at
+        self._task = None
+        self._text = None
+        ahead_ms = (time.perf_counter() - started_at) * 1000
+        try:
+            response = await task
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning(f"Спекулятивный запрос завершился ошибкой, запрос будет повторён: {e}")
+            self.aborted += 1
+            return None
+        self.committed += 1
+        self.saved_ms += ahead_ms
+        return response
+
+    def stats(self):
+        resolved = self.committed + self.aborted
+        return {
+            "started": self.started,
+            "committed": self.committed,
+            "aborted": self.aborted,
+            "commit_rate": round(self.committed / resolved, 3) if resolved else None,
+            "avg_head_start_ms": round(self.saved_ms / self.committed, 1) if self.committed else None,
+        }
@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+TOOL_EXECUTOR_MAX_WORKERS = 4
+
+# Классы параллельности инструментов:
+#   "parallel" — только читают состояние системы или сети, могут выполняться одновременно;
+#   "serial"   — меняют UI/систему (или ждут, пока UI успокоится), выполняются по одному и по порядку.
+# Неизвестные инструменты считаются "serial".
+TOOL_CONCURRENCY = {
+    "get_installed_software": "parallel",
+    "find_application_name": "parallel",
+    "get_open_windows": "parallel",
+    "search_web": "parallel",
+    "get_screenshot_tool": "parallel",
+    "current_date_time": "parallel",
+    "start_application": "serial",
+    "execute_bash_command": "serial",
+    "scrape_application": "serial",
+    "interact_with_element_by_id": "serial",
+    "interact_with_window": "serial",
+    "waiting": "serial",
+}
+
+
+class ToolExecutor:
+    """
+    Выполняет tool_calls одного ответа модели. Подряд идущие "parallel"-вызовы запускаются одновременно
+    в пуле потоков; "serial"-вызов служит барьером: ждёт всех предыдущих и выполняется один в текущем
+    потоке, поэтому чтение после действия в UI видит его результат, как при последовательном запуске.
+    Результаты возвращаются в исходном порядке tool_calls.
+    """
+
+    def __init__(self, max_workers=TOOL_EXECUTOR_MAX_WORKERS, concurrency=None):
+        self.concurrency = TOOL_CONCURRENCY if concurrency is None else concurrency
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    def is_parallel(self, name):
+        return self.concurrency.get(name, "serial") == "parallel"
+
+    def run(self, tool_calls, invoke):
+        """invoke(tool_call) выполняет один вызов; исключение первого упавшего вызова пробрасывается."""
+        results = [None] * len(tool_calls)
+        batch = []
+        for index, tool_call in enumerate(tool_calls):
+            if self.is_parallel(tool_call["name"]):
+                batch.append(index)
+                continue
+            self._run_batch(batch, tool_calls, invoke, results)
+            batch = []
+            results[index] = invoke(tool_call)
+        self._run_batch(batch, tool_calls, invoke, results)
+        return results
+
+    def _run_batch(self, batch, tool_calls, invoke, results):
+        if len(batch) == 1:
+            results[batch[0]] = invoke(tool_calls[batch[0]])
+            return
+        if not batch:
+            return
+        logging.info(f"Параллельный вызов инструментов: {[tool_calls[i]['name'] for i in batch]}")
+        # Контекст (колбэки langchain) копируется для каждого вызова: один Context нельзя войти дважды.
+        futures = [
+            (index, self._pool.submit(contextvars.copy_context().run, invoke, tool_calls[index]))
+            for index in batch
+        ]
+        for index, future in futures:
+            results[index] = future.result()
+
+    async def arun(self, tool_calls, ainvoke):
+        """Асинхронный вариант run: ainvoke(tool_call) — корутина, параллельные вызовы идут через gather.
+
+        Отмена задачи отменяет и ожидающие вызовы; синхронный инструмент, уже запущенный langchain
+        в потоке, доработает, но его результат будет отброшен.
+        """
+        results = [None] * len(tool_calls)
+        batch = []
+        for index, tool_call in enumerate(tool_calls):
+            if self.is_parallel(tool_call["name"]):
+                batch.append(index)
+                continue
+            await self._arun_batch(batch, tool_calls, ainvoke, results)
+            batch = []
+            results[index] = await ainvoke(tool_call)
+        await self._arun_batch(batch, tool_calls, ainvoke, results)
+        return results
+
+    async def _arun_batch(self, batch, tool_calls, ainvoke, results):
+        if not batch:
+            return
+        if len(batch) > 1:
+            logging.info(f"Параллельный вызов инструментов: {[tool_calls[i]['name'] for i in batch]}")
+        outputs = await asyncio.gather(*(ainvoke(tool_calls[index]) for index in batch))
+        for index, output in zip(batch, outputs):
+            results[index] = output
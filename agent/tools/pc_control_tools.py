@@ -1,16 +1,12 @@
 import subprocess
-import winreg
 import shlex
-import psutil
 import time
 from typing import List, Dict, Any, Union, Optional
 
 from langchain_core.tools import tool
-from pywinauto import Desktop
-from pywinauto.application import Application
-from pywinauto.findwindows import ElementNotFoundError
 
-import pyautogui
+# pywinauto, pyautogui и winreg импортируются при первом вызове инструмента:
+# текстовый путь (server.py) не должен платить за них при импорте агента.
 
 ELEMENTS_CACHE = {}
 CURRENT_ID = 0
@@ -84,6 +80,8 @@ def find_application_name(approximate_name: str) -> str:
 
 
 def _get_classic_app_paths():
+    import winreg
+
     app_paths = {}
     registry_paths = [
         r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall",
@@ -170,6 +168,8 @@ def start_application(app_name: str)->bool:
 @tool
 def get_open_windows():
     """Возвращает список заголовков всех открытых окон."""
+    from pywinauto import Desktop
+
     desktop = Desktop(backend="uia")
     windows = desktop.windows()
     window_titles = [win.window_text() for win in windows if win.window_text()]
@@ -193,6 +193,9 @@ def scrape_application(name: str, control_types: Optional[List[str]] = None) ->
         name (str): Часть заголовка окна для поиска.
         control_types (Optional[List[str]]): Список типов для фильтрации (необязательно).
     """
+    from pywinauto import Desktop
+    from pywinauto.findwindows import ElementNotFoundError
+
     global ELEMENTS_CACHE, CURRENT_ID
     ELEMENTS_CACHE.clear()
     CURRENT_ID = 0
@@ -305,6 +308,10 @@ def interact_with_element_by_id(
             - Для действия 'get_text' — текст, содержащийся в элементе.
             - В случае ошибки — строка с описанием ошибки (например, "Ошибка: Элемент с координатами ... не найден.").
     """
+    import pyautogui
+    from pywinauto import Desktop
+    from pywinauto.findwindows import ElementNotFoundError
+
     try:
         app_name = name.split(" - ")[-1].strip() if " - " in name else name.strip()
 
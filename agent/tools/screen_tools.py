@@ -1,6 +1,5 @@
-from langchain.tools import tool
+from langchain_core.tools import tool
 import base64
-from PIL import ImageGrab, Image
 from io import BytesIO
 from datetime import datetime
 import os
@@ -13,6 +12,8 @@ def get_screenshot_tool() -> dict:
     Этот инструмент следует использовать, когда нужно увидеть, что в данный момент находится на экране пользователя.
     """
     try:
+        from PIL import ImageGrab, Image
+
         screenshot = ImageGrab.grab()
         screenshot.thumbnail((1280, 720), Image.Resampling.LANCZOS)
         
@@ -1,6 +1,4 @@
-from ddgs import DDGS
 from langchain_core.tools import tool
-from markdownify import markdownify as md
 
 
 @tool
@@ -16,6 +14,8 @@ def search_web(query: str, num_results: int = 5) -> str:
         str: Отформатированная строка с результатами (заголовок, описание, ссылка).
     """
     try:
+        from ddgs import DDGS
+
         with DDGS() as ddgs:
             results = ddgs.text(query, max_results=num_results)
             
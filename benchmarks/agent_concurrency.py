@@ -0,0 +1,103 @@
+"""
+Пропускная способность графа агента при N одновременных запросах: синхронные узлы против асинхронных.
+
+Модель заменена локальной заглушкой benchmarks.stub_llm (фиксированная задержка первого токена и между
+токенами), запросы запускаются через asyncio.gather(graph.ainvoke(...)). Синхронные узлы LangGraph
+выполняет в пуле потоков по умолчанию, поэтому их параллельность ограничена размером пула и каждый
+запрос держит поток на всё время HTTP-вызова; асинхронные узлы ждут ответа на await в одном цикле событий.
+
+Дополнительно замеряется отмена: через --cancel-after секунд задачи отменяются и считается, сколько
+проходит до их фактического завершения. Перед замерами каждый граф прогревается одним запросом
+(создание клиента модели).
+
+Запуск из корня репозитория:
+    python -m benchmarks.agent_concurrency --concurrency 1 4 16 32 --json agent_concurrency.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+
+from benchmarks.stub_llm import StubLLM
+
+
+async def timed_request(graph, messages):
+    started = time.perf_counter()
+    await graph.ainvoke({"messages": messages}, config={"recursion_limit": 200})
+    return (time.perf_counter() - started) * 1000
+
+
+async def measure(graph, make_messages, concurrency):
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(timed_request(graph, make_messages(i)) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "wall_ms": round(wall * 1000, 1),
+        "throughput_rps": round(concurrency / wall, 2),
+        "latency_ms_p50": round(statistics.median(latencies), 1),
+        "latency_ms_max": round(max(latencies), 1),
+    }
+
+
+async def measure_cancel(graph, make_messages, concurrency, cancel_after):
+    tasks = [asyncio.ensure_future(timed_request(graph, make_messages(i))) for i in range(concurrency)]
+    await asyncio.sleep(cancel_after)
+    started = time.perf_counter()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {"cancel_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+async def run(args, graphs, make_messages):
+    results = []
+    for name, graph in graphs.items():
+        await timed_request(graph, make_messages(-1))
+        for concurrency in args.concurrency:
+            entry = {"nodes": name, **await measure(graph, make_messages, concurrency)}
+            results.append(entry)
+            print(f"{name:>5} узлы, N={concurrency:>3}: {entry['throughput_rps']:6.2f} запр/с, "
+                  f"p50 {entry['latency_ms_p50']:.0f} мс, макс {entry['latency_ms_max']:.0f} мс")
+        cancel = await measure_cancel(graph, make_messages, max(args.concurrency), args.cancel_after)
+        results.append({"nodes": name, "concurrency": max(args.concurrency), **cancel})
+        print(f"{name:>5} узлы, отмена {max(args.concurrency)} запросов: {cancel['cancel_ms']:.0f} мс")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--first-token-delay", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--cancel-after", type=float, default=0.2)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    stub = StubLLM(first_token_delay=args.first_token_delay, token_delay=args.token_delay).start()
+    os.environ["OPENROUTER_BASE_URL"] = stub.base_url
+    os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from agent.agent import build_graph, prompt
+    logging.getLogger().setLevel(logging.WARNING)
+
+    graphs = {"sync": build_graph(async_nodes=False), "async": build_graph(async_nodes=True)}
+
+    def make_messages(i):
+        return [SystemMessage(prompt), HumanMessage(content=f"Какая сейчас погода? Запрос {i}")]
+
+    try:
+        results = asyncio.run(run(args, graphs, make_messages))
+    finally:
+        stub.stop()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
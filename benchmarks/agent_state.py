@@ -0,0 +1,113 @@
+"""
+Размер состояния графа агента и накладные расходы на шаг на длинной задаче (--steps шагов графа,
+recursion_limit).
+
+Модель и инструменты заменены мгновенными заглушками: модель по кругу вызывает тяжёлый
+get_installed_software, search_web и get_open_windows, инструменты возвращают строки заданного размера.
+Поэтому время между вызовами модели — это чистые накладные расходы графа: редьюсер messages, скрытие
+результатов, обновление индексов. Для окон по --window шагов агента выводятся число сообщений, объём
+контекста, уходящего в модель, и p50 накладных расходов на шаг; в конце — наибольший размер индексов
+скрытия. Накладные расходы и индексы не должны расти с длиной задачи; контекст растёт только на результаты,
+которые политика скрытия оставляет (get_open_windows и search_web, после которого не было повторного поиска).
+
+Запуск из корня репозитория:
+    python -m benchmarks.agent_state --steps 200 --json agent_state.json
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+TOOL_CYCLE = ["get_installed_software", "search_web", "search_web", "get_open_windows"]
+TOOL_RESULT_CHARS = {"get_installed_software": 20000, "search_web": 8000, "get_open_windows": 1000}
+
+
+def make_model(agent_steps, log):
+    from langchain_core.messages import AIMessage
+
+    def model(messages):
+        now = time.perf_counter()
+        index = len(log)
+        log.append({
+            "called_at": now,
+            "messages": len(messages),
+            "context_chars": sum(len(m.content) for m in messages if isinstance(m.content, str)),
+        })
+        if index >= agent_steps - 1:
+            return AIMessage(content="Готово.")
+        name = TOOL_CYCLE[index % len(TOOL_CYCLE)]
+        return AIMessage(content="", tool_calls=[{"name": name, "args": {}, "id": f"call_{index}"}])
+
+    return model
+
+
+def make_tools():
+    from langchain_core.tools import StructuredTool
+
+    def make(name, size):
+        return StructuredTool.from_function(func=lambda: name[0] * size, name=name, description=name)
+
+    return {name: make(name, size) for name, size in TOOL_RESULT_CHARS.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=200, help="recursion_limit графа")
+    parser.add_argument("--window", type=int, default=20, help="Окно усреднения в шагах агента")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+    import logging
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from langchain_core.runnables import RunnableLambda
+    import agent.agent as main_agent
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Шаги графа чередуются agent → action, последний шаг — финальный ответ агента.
+    agent_steps = (args.steps + 1) // 2
+    log = []
+    main_agent.get_model_with_tools = lambda: RunnableLambda(make_model(agent_steps, log))
+    main_agent.tools_by_name = make_tools()
+    graph = main_agent.build_graph(async_nodes=False)
+
+    index_sizes = []
+    started = time.perf_counter()
+    state = None
+    for state in graph.stream({"messages": [SystemMessage(main_agent.prompt), HumanMessage(content="Задача")]},
+                              config={"recursion_limit": args.steps}, stream_mode="values"):
+        index_sizes.append(len(state.get("ids_to_hide") or ()) + len(state.get("result_positions") or {}))
+    total_ms = (time.perf_counter() - started) * 1000
+
+    overheads = [(b["called_at"] - a["called_at"]) * 1000 for a, b in zip(log, log[1:])]
+    windows = []
+    for start in range(0, len(overheads), args.window):
+        end = min(start + args.window, len(overheads))
+        windows.append({
+            "agent_steps": f"{start + 1}-{end + 1}",
+            "messages": log[end]["messages"],
+            "context_chars": log[end]["context_chars"],
+            "context_chars_max": max(entry["context_chars"] for entry in log[start + 1:end + 1]),
+            "step_overhead_ms_p50": round(statistics.median(overheads[start:end]), 3),
+        })
+    summary = {
+        "graph_steps": len(index_sizes) - 1,
+        "agent_steps": len(log),
+        "final_messages": len(state["messages"]) if state else 0,
+        "hide_index_max": max(index_sizes),
+        "total_ms": round(total_ms, 1),
+    }
+    for window in windows:
+        print(f"шаги агента {window['agent_steps']:>8}: сообщений {window['messages']:4d}, контекст "
+              f"{window['context_chars']:6d} симв. (макс {window['context_chars_max']}), "
+              f"накладные расходы на шаг p50 {window['step_overhead_ms_p50']:.2f} мс")
+    print(f"Шагов графа: {summary['graph_steps']}, сообщений в конце: {summary['final_messages']}, "
+          f"наибольший размер индексов скрытия: {summary['hide_index_max']}, всего {summary['total_ms']:.0f} мс")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "summary": summary, "windows": windows}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
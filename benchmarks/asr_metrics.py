@@ -0,0 +1,55 @@
+"""Общие метрики для бенчмарков распознавания: WER, эталонные расшифровки, пиковая память."""
+import json
+import os
+import re
+import sys
+
+
+def normalize_text(text):
+    text = (text or "").lower().replace("ё", "е")
+    return re.findall(r"\w+", text)
+
+
+def word_error_rate(reference, hypothesis):
+    ref = normalize_text(reference)
+    hyp = normalize_text(hypothesis)
+    if not ref:
+        return None
+    # Расстояние Левенштейна по словам, одна строка таблицы.
+    row = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        prev_diag, row[0] = row[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            cost = 0 if ref_word == hyp_word else 1
+            prev_diag, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev_diag + cost)
+    return row[-1] / len(ref)
+
+
+def load_references(clips, references_path=None):
+    """
+    Эталоны берутся из JSON {"клип": "текст"} или из файла рядом с клипом (test2.mp3 → test2.txt).
+    Клипы без эталона в расчёт WER не попадают.
+    """
+    references = {}
+    if references_path:
+        with open(references_path, encoding="utf-8") as f:
+            references.update(json.load(f))
+    for clip in clips:
+        if clip in references:
+            continue
+        sidecar = os.path.splitext(clip)[0] + ".txt"
+        if os.path.isfile(sidecar):
+            with open(sidecar, encoding="utf-8") as f:
+                references[clip] = f.read().strip()
+    return references
+
+
+def peak_rss_mb():
+    """Пиковый RSS текущего процесса в МБ."""
+    if sys.platform == "win32":
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
@@ -0,0 +1,173 @@
+"""
+Офлайн-бенчмарк распознавания на клипах из репозитория (test.wav, test2.mp3–test6.mp3).
+
+Для каждой конфигурации (Vosk или faster-whisper × размер модели × compute_type × beam_size × VAD)
+считаются:
+  rtf                 — время обработки / длительность звука;
+  eos_latency_ms      — время от конца речи (последний сэмпл подан) до готового текста;
+  peak_rss_mb         — пиковая память процесса с загруженной моделью;
+  wer                 — если для клипа есть эталон (--references или test2.txt рядом с test2.mp3).
+
+Каждая конфигурация запускается в отдельном процессе, чтобы пиковый RSS не смешивался между моделями.
+
+Запуск из корня репозитория:
+    python -m benchmarks.asr_suite --json asr_suite.json
+    python -m benchmarks.asr_suite --whisper-models tiny small --compute-types int8 --beam-sizes 1 5 --vad off on
+"""
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.asr_metrics import load_references, peak_rss_mb, word_error_rate
+
+SAMPLE_RATE = 16000
+VOSK_CHUNK_SIZE = 2048
+DEFAULT_CLIPS = ["test.wav", "test2.mp3", "test3.mp3", "test4.mp3", "test5.mp3", "test6.mp3"]
+
+
+def run_vosk(config, clips):
+    from vosk import KaldiRecognizer, Model, SetLogLevel
+    from utils.audio_io import load_audio
+
+    SetLogLevel(-1)
+    started = time.perf_counter()
+    model = Model(config["model"])
+    load_ms = (time.perf_counter() - started) * 1000
+    results = []
+    for clip in clips:
+        audio = load_audio(clip, SAMPLE_RATE)
+        recognizer = KaldiRecognizer(model, SAMPLE_RATE)
+        texts = []
+        started = time.perf_counter()
+        for pos in range(0, len(audio), VOSK_CHUNK_SIZE):
+            if recognizer.AcceptWaveform(audio[pos:pos + VOSK_CHUNK_SIZE].tobytes()):
+                texts.append(json.loads(recognizer.Result()).get("text", ""))
+        # Vosk декодирует по ходу подачи: после конца речи остаётся только FinalResult().
+        eos_started = time.perf_counter()
+        texts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+        finished = time.perf_counter()
+        results.append({
+            "clip": clip,
+            "duration_s": len(audio) / SAMPLE_RATE,
+            "processing_s": finished - started,
+            "eos_latency_ms": (finished - eos_started) * 1000,
+            "text": " ".join(t for t in texts if t).strip(),
+        })
+    return load_ms, results
+
+
+def run_whisper(config, clips):
+    from faster_whisper import WhisperModel
+    from utils.audio_io import load_audio, int16_to_float
+
+    started = time.perf_counter()
+    model = WhisperModel(config["model"], device="cpu", compute_type=config["compute_type"])
+    load_ms = (time.perf_counter() - started) * 1000
+    # Прогрев, чтобы первый клип не включал инициализацию.
+    list(model.transcribe(int16_to_float(load_audio(clips[0], SAMPLE_RATE))[:SAMPLE_RATE], language="ru")[0])
+    results = []
+    for clip in clips:
+        audio = int16_to_float(load_audio(clip, SAMPLE_RATE))
+        started = time.perf_counter()
+        segments, _ = model.transcribe(audio, language="ru", beam_size=config["beam_size"],
+                                       vad_filter=config["vad"])
+        text = "".join(segment.text for segment in segments).strip()
+        finished = time.perf_counter()
+        # Без потокового режима декодирование начинается только после конца речи.
+        results.append({
+            "clip": clip,
+            "duration_s": len(audio) / SAMPLE_RATE,
+            "processing_s": finished - started,
+            "eos_latency_ms": (finished - started) * 1000,
+            "text": text,
+        })
+    return load_ms, results
+
+
+def run_config(config, clips, references):
+    run = run_vosk if config["engine"] == "vosk" else run_whisper
+    load_ms, results = run(config, clips)
+    for result in results:
+        reference = references.get(result["clip"])
+        result["wer"] = word_error_rate(reference, result["text"]) if reference else None
+        result["rtf"] = result["processing_s"] / result["duration_s"] if result["duration_s"] else None
+
+    audio_s = sum(r["duration_s"] for r in results)
+    wers = [r["wer"] for r in results if r["wer"] is not None]
+    latencies = sorted(r["eos_latency_ms"] for r in results)
+    return {
+        "config": config,
+        "load_ms": round(load_ms, 1),
+        "rtf": round(sum(r["processing_s"] for r in results) / audio_s, 4) if audio_s else None,
+        "eos_latency_ms_mean": round(sum(latencies) / len(latencies), 1) if latencies else None,
+        "eos_latency_ms_max": round(latencies[-1], 1) if latencies else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "wer": round(sum(wers) / len(wers), 4) if wers else None,
+        "clips": [{k: (round(v, 4) if isinstance(v, float) else v) for k, v in r.items()} for r in results],
+    }
+
+
+def build_configs(args):
+    configs = [{"engine": "vosk", "model": model} for model in args.vosk_models]
+    for model, compute_type, beam_size, vad in itertools.product(
+            args.whisper_models, args.compute_types, args.beam_sizes, args.vad):
+        configs.append({"engine": "whisper", "model": model, "compute_type": compute_type,
+                        "beam_size": beam_size, "vad": vad == "on"})
+    return configs
+
+
+def config_label(config):
+    if config["engine"] == "vosk":
+        return f"vosk {config['model']}"
+    return (f"whisper {config['model']} {config['compute_type']} beam={config['beam_size']} "
+            f"vad={'on' if config['vad'] else 'off'}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vosk-models", nargs="*", default=["vosk-model-small-ru-0.22"])
+    parser.add_argument("--whisper-models", nargs="*", default=["tiny", "base", "small"])
+    parser.add_argument("--compute-types", nargs="*", default=["int8", "float32"])
+    parser.add_argument("--beam-sizes", nargs="*", type=int, default=[1, 5])
+    parser.add_argument("--vad", nargs="*", choices=["off", "on"], default=["off", "on"])
+    parser.add_argument("--references", default=None, help="JSON {клип: эталонный текст}")
+    parser.add_argument("--json", default=None)
+    parser.add_argument("--clips", nargs="+", default=DEFAULT_CLIPS)
+    args = parser.parse_args()
+
+    references = load_references(args.clips, args.references)
+    report = {
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "clips": args.clips,
+        "references": sorted(references),
+        "runs": [],
+    }
+    ctx = mp.get_context("spawn")
+    for config in build_configs(args):
+        label = config_label(config)
+        # Новый процесс на конфигурацию: ru_maxrss монотонен и иначе показывал бы максимум по всем моделям.
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            try:
+                run = pool.submit(run_config, config, args.clips, references).result()
+            except Exception as e:
+                print(f"{label}: ошибка {e}")
+                report["runs"].append({"config": config, "error": str(e)})
+                continue
+        report["runs"].append(run)
+        wer = f"{run['wer']:.3f}" if run["wer"] is not None else "—"
+        print(f"{label:<45} RTF {run['rtf']:.3f} | конец речи → текст {run['eos_latency_ms_mean']:8.1f} мс | "
+              f"RSS {run['peak_rss_mb']:7.1f} МБ | WER {wer}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Задержка barge-in: клипы из репозитория (голос пользователя) смешиваются с синтетическим «TTS»,
+который одновременно подаётся в EchoReference и, с задержкой и ослаблением, в микрофон как эхо.
+
+Для каждого клипа:
+  detection_ms  — от начала речи пользователя (по webrtcvad на чистом клипе) до срабатывания детектора;
+  stop_ms       — от interrupt() до остановки вывода (реальный TTSPipeline и AudioOutput с NullSink);
+  total_ms      — сумма.
+Отдельно прогоняется только эхо без пользователя: ложных срабатываний быть не должно. Срабатывание
+раньше начала речи пользователя (отрицательный detection_ms) — тоже ложное: детектор сработал на эхо.
+Код выхода 1, если есть ложные срабатывания или клип не был распознан как перебивание.
+
+Запуск из корня репозитория:
+    python -m benchmarks.barge_in_latency --json barge_in.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+import webrtcvad
+
+from utils.audio_io import load_audio
+from utils.audio_output import AudioOutput, NullSink, AUDIO_OUTPUT_BLOCK_MS
+from utils.barge_in import BargeInDetector, EchoReference
+from utils.endpointing import frame_energy_db
+from utils.tts_pipeline import TTSPipeline
+
+SAMPLE_RATE = 16000
+TTS_SAMPLE_RATE = 48000
+FRAME_MS = 30
+FRAME = SAMPLE_RATE * FRAME_MS // 1000
+TTS_BLOCK_MS = AUDIO_OUTPUT_BLOCK_MS
+DEFAULT_CLIPS = ["test.wav", "test2.mp3", "test3.mp3", "test4.mp3", "test5.mp3", "test6.mp3"]
+
+
+def synthetic_tts(duration_s, sample_rate, level_db=-20.0):
+    """Речеподобный сигнал: гармоники плавающего F0 с огибающей слогов ~4 Гц и паузами между «фразами»."""
+    t = np.arange(int(duration_s * sample_rate)) / sample_rate
+    f0 = 120 + 20 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 12))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    phrases = (np.sin(2 * np.pi * 0.25 * t) > -0.7).astype(np.float32)
+    signal = voice * syllables * phrases
+    signal *= 10 ** (level_db / 20) * 32768 / (np.sqrt(np.mean(signal ** 2)) + 1e-9)
+    return np.clip(signal, -32768, 32767).astype(np.int16)
+
+
+def normalize_level(audio, level_db):
+    """Приводит громкие кадры клипа (90-й перцентиль энергии) к level_db: клипы записаны с разной громкостью."""
+    frames = [frame_energy_db(audio[i:i + FRAME]) for i in range(0, len(audio) - FRAME + 1, FRAME)]
+    gain = 10 ** ((level_db - np.percentile(frames, 90)) / 20)
+    return np.clip(audio.astype(np.float32) * gain, -32768, 32767).astype(np.int16)
+
+
+def speech_onset_s(audio, vad, level_db, min_frames=3):
+    """Начало речи на чистом клипе: VAD и энергия не ниже level_db − 20 дБ (дыхание и шум не считаются)."""
+    run = 0
+    for i in range(0, len(audio) - FRAME + 1, FRAME):
+        frame = audio[i:i + FRAME]
+        voiced = vad.is_speech(frame.tobytes(), SAMPLE_RATE) and frame_energy_db(frame) > level_db - 20
+        run = run + 1 if voiced else 0
+        if run == min_frames:
+            return (i - (min_frames - 1) * FRAME) / SAMPLE_RATE
+    return None
+
+
+def simulate(user, user_at_s, duration_s, echo_gain_db, echo_delay_ms, aggressiveness, seed=0):
+    """Прогон детектора в модельном времени; возвращает время срабатывания (с) или None."""
+    vad = webrtcvad.Vad(aggressiveness)
+    reference = EchoReference(history_seconds=duration_s + 1)
+    detector = BargeInDetector(reference, frame_ms=FRAME_MS)
+    tts_ref = synthetic_tts(duration_s, TTS_SAMPLE_RATE)
+    tts_mic = synthetic_tts(duration_s, SAMPLE_RATE).astype(np.float32)
+
+    delay = int(SAMPLE_RATE * echo_delay_ms / 1000)
+    mic = np.zeros(len(tts_mic), dtype=np.float32)
+    mic[delay:] = tts_mic[:len(tts_mic) - delay] * 10 ** (echo_gain_db / 20)
+    mic += np.random.default_rng(seed).normal(0, 30, len(mic))
+    if user is not None:
+        start = int(user_at_s * SAMPLE_RATE)
+        end = min(len(mic), start + len(user))
+        mic[start:end] += user[:end - start]
+    mic = np.clip(mic, -32768, 32767).astype(np.int16)
+
+    block = TTS_SAMPLE_RATE * TTS_BLOCK_MS // 1000
+    next_block = 0
+    for i in range(0, len(mic) - FRAME + 1, FRAME):
+        now = (i + FRAME) / SAMPLE_RATE
+        # Поток воспроизведения пишет блок чуть раньше, чем он прозвучит.
+        while next_block < len(tts_ref) and next_block / TTS_SAMPLE_RATE <= now + TTS_BLOCK_MS / 1000:
+            reference.push(tts_ref[next_block:next_block + block], TTS_SAMPLE_RATE, at=next_block / TTS_SAMPLE_RATE)
+            next_block += block
+        frame = mic[i:i + FRAME]
+        if detector.process(frame, vad.is_speech(frame.tobytes(), SAMPLE_RATE), now=now):
+            return now
+    return None
+
+
+def measure_stop_ms(runs):
+    pcm = synthetic_tts(2.0, TTS_SAMPLE_RATE)
+    output = AudioOutput(NullSink(TTS_SAMPLE_RATE), TTS_SAMPLE_RATE).start()
+    pipeline = TTSPipeline(lambda text: pcm, output, TTS_SAMPLE_RATE)
+    rng = np.random.default_rng(1)
+    results = []
+    for _ in range(runs):
+        job = pipeline.speak(["фраза"] * 3, wait=False)
+        while not pipeline.is_playing:
+            time.sleep(0.005)
+        time.sleep(rng.uniform(0.1, 0.6))
+        results.append(pipeline.interrupt())
+        job.done.wait()
+    pipeline.close()
+    output.close()
+    return results
+
+
+def p95(values):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(0.95 * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-at", type=float, default=2.0, help="Когда пользователь начинает говорить (с)")
+    parser.add_argument("--user-level-db", type=float, default=-25.0)
+    parser.add_argument("--echo-gain-db", type=float, default=-15.0)
+    parser.add_argument("--echo-delay-ms", type=float, default=60.0)
+    parser.add_argument("--aggressiveness", type=int, default=3)
+    parser.add_argument("--stop-runs", type=int, default=10)
+    parser.add_argument("--json", default=None)
+    parser.add_argument("clips", nargs="*", default=DEFAULT_CLIPS)
+    args = parser.parse_args()
+
+    vad = webrtcvad.Vad(args.aggressiveness)
+    stop_ms = measure_stop_ms(args.stop_runs)
+    stop_p50 = statistics.median(stop_ms)
+    results = []
+    failures = 0
+    for clip in args.clips:
+        user = normalize_level(load_audio(clip, SAMPLE_RATE), args.user_level_db)
+        onset = speech_onset_s(user, vad, args.user_level_db)
+        duration_s = args.user_at + len(user) / SAMPLE_RATE + 1.0
+        echo_trigger = simulate(None, 0, duration_s, args.echo_gain_db, args.echo_delay_ms, args.aggressiveness)
+        trigger = simulate(user.astype(np.float32), args.user_at, duration_s, args.echo_gain_db,
+                           args.echo_delay_ms, args.aggressiveness)
+        detection_ms = (trigger - args.user_at - onset) * 1000 if trigger is not None and onset is not None else None
+        early = detection_ms is not None and detection_ms < 0
+        entry = {
+            "clip": clip,
+            "user_onset_s": round(args.user_at + onset, 3) if onset is not None else None,
+            "false_trigger_echo_only": echo_trigger is not None,
+            "false_trigger_before_onset": early,
+            "detection_ms": round(detection_ms, 1) if detection_ms is not None else None,
+            "total_ms": round(detection_ms + stop_p50, 1) if detection_ms is not None and not early else None,
+        }
+        failures += entry["false_trigger_echo_only"] or detection_ms is None or early
+        results.append(entry)
+        print(f"{clip:>10}: перебивание {entry['detection_ms']} мс + остановка {stop_p50:.0f} мс = "
+              f"{entry['total_ms']} мс | ложное срабатывание на эхо: {'да' if echo_trigger is not None else 'нет'}"
+              f"{', до начала речи' if early else ''}")
+
+    detections = [r["detection_ms"] for r in results if r["detection_ms"] is not None and r["detection_ms"] >= 0]
+    summary = {
+        "stop_ms_p50": round(stop_p50, 1),
+        "stop_ms_p95": round(p95(stop_ms), 1),
+        "detection_ms_p50": round(statistics.median(detections), 1) if detections else None,
+        "detection_ms_p95": round(p95(detections), 1) if detections else None,
+        "false_triggers": sum(r["false_trigger_echo_only"] or r["false_trigger_before_onset"] for r in results),
+        "failures": failures,
+    }
+    print(f"Итого: {summary}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "summary": summary, "results": results}, f, ensure_ascii=False, indent=2)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
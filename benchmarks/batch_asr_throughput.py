@@ -0,0 +1,83 @@
+"""
+Пропускная способность пакетной расшифровки (BatchTranscriber) против цикла одиночных transcribe(),
+как в listen_with_vad_whisper.
+
+Клипы повторяются --copies раз, чтобы набрать очередь. Декодирование MP3 входит в оба замера.
+
+Запуск из корня репозитория:
+    python -m benchmarks.batch_asr_throughput --model small --batch-size 8 --json batch_asr.json
+"""
+import argparse
+import json
+import time
+
+from faster_whisper import WhisperModel
+
+from utils.audio_io import load_audio, int16_to_float
+from utils.batch_asr import BatchTranscriber, BATCH_ASR_BATCH_SIZE
+from utils.decoding_profiles import profile_kwargs
+
+SAMPLE_RATE = 16000
+DEFAULT_CLIPS = ["test.wav", "test2.mp3", "test3.mp3", "test4.mp3", "test5.mp3", "test6.mp3"]
+
+
+def run_loop(model, clips):
+    started = time.perf_counter()
+    texts = []
+    for clip in clips:
+        audio = int16_to_float(load_audio(clip, SAMPLE_RATE))
+        segments, _ = model.transcribe(audio, language="ru", **profile_kwargs("command"))
+        texts.append("".join(segment.text for segment in segments).strip())
+    return texts, time.perf_counter() - started
+
+
+def run_batched(transcriber, clips):
+    started = time.perf_counter()
+    texts = transcriber.transcribe_many(clips)
+    return texts, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--batch-size", type=int, default=BATCH_ASR_BATCH_SIZE)
+    parser.add_argument("--copies", type=int, default=4)
+    parser.add_argument("--json", default=None)
+    parser.add_argument("clips", nargs="*", default=DEFAULT_CLIPS)
+    args = parser.parse_args()
+
+    model = WhisperModel(args.model, device=args.device, compute_type=args.compute_type)
+    # Пакетный путь использует те же параметры, что и профиль "command" в одиночном цикле.
+    transcriber = BatchTranscriber(model, batch_size=args.batch_size, transcribe_kwargs=profile_kwargs("command"))
+    clips = args.clips * args.copies
+    run_loop(model, args.clips[:1])
+
+    loop_texts, loop_s = run_loop(model, clips)
+    batch_texts, batch_s = run_batched(transcriber, clips)
+    transcriber.close()
+    mismatched = [clip for clip, a, b in zip(clips, loop_texts, batch_texts) if a != b]
+    report = {
+        "model": args.model,
+        "compute_type": args.compute_type,
+        "batch_size": args.batch_size,
+        "clips": len(clips),
+        "loop_clips_per_s": round(len(clips) / loop_s, 3),
+        "batched_clips_per_s": round(len(clips) / batch_s, 3),
+        "speedup": round(loop_s / batch_s, 2),
+        "text_mismatches": sorted(set(mismatched)),
+    }
+    print(f"Цикл transcribe(): {report['loop_clips_per_s']} клипов/с | "
+          f"пакетно (batch_size={args.batch_size}): {report['batched_clips_per_s']} клипов/с | "
+          f"ускорение ×{report['speedup']}")
+    if mismatched:
+        print(f"Расшифровки различаются для: {report['text_mismatches']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
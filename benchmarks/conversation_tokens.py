@@ -0,0 +1,186 @@
+"""
+Токены запроса к модели по ходам сценария из 20 реплик (--turns повторяет его по кругу): прежняя история
+(в chat_history сохранялся весь список сообщений графа, и к нему на каждом ходе снова добавлялся системный
+промпт) против ConversationStore без ограничения и с бюджетом токенов --budget.
+
+Модель и инструменты заменены заглушками: по сценарию модель вызывает инструменты (тяжёлый
+get_installed_software, search_web, start_application) или отвечает сразу, инструменты возвращают строки
+заданного размера. Для каждого хода считаются токены первого вызова модели (то, что уходит в LLM сразу
+после реплики пользователя) и сумма по всем вызовам хода. Токены считаются tiktoken, а без файла
+кодировки — оценкой по длине текста (см. agent.conversation.count_tokens).
+
+С бюджетом суммаризация заменена заглушкой с задержкой --summary-delay: она идёт в фоне, поэтому
+время хода (от реплики до сохранённого ответа) не должно расти, когда история сворачивается. Между
+репликами в этом режиме выдерживается пауза --pause, за которую сводка успевает примениться; по каждой
+сводке выводятся время суммаризации и токены истории до и после свёртки.
+
+Запуск из корня репозитория:
+    python -m benchmarks.conversation_tokens --json conversation_tokens.json
+    python -m benchmarks.conversation_tokens --turns 60 --budget 3000 --pause 0
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+# Реплика пользователя и инструменты, которые модель вызывает в этом ходе (по одному шагу на инструмент).
+SCRIPT = [
+    ("Какие браузеры у меня установлены?", ["get_installed_software"]),
+    ("Открой хром.", ["start_application"]),
+    ("Какая завтра погода в Москве?", ["search_web"]),
+    ("А в Питере?", ["search_web"]),
+    ("Спасибо.", []),
+    ("Есть ли у меня фотошоп?", ["get_installed_software"]),
+    ("Запусти его.", ["start_application"]),
+    ("Сколько стоит подписка на него?", ["search_web"]),
+    ("Понятно, закрой тогда.", ["start_application"]),
+    ("Который час?", []),
+    ("Найди рецепт борща.", ["search_web"]),
+    ("А без мяса?", ["search_web"]),
+    ("Открой блокнот.", ["start_application"]),
+    ("Какие игры у меня установлены?", ["get_installed_software"]),
+    ("Запусти первую.", ["start_application"]),
+    ("Что нового в последнем патче?", ["search_web"]),
+    ("Интересно.", []),
+    ("Открой телеграм.", ["start_application"]),
+    ("Какой курс доллара?", ["search_web"]),
+    ("Всё, спасибо.", []),
+]
+TOOL_RESULT_CHARS = {"get_installed_software": 20000, "search_web": 8000, "start_application": 200}
+
+
+def make_model(log):
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+    from agent.conversation import messages_tokens
+
+    state = {"turn": -1, "step": 0}
+
+    def model(messages):
+        if isinstance(messages[-1], HumanMessage):
+            state["turn"] += 1
+            state["step"] = 0
+        log.append((state["turn"], messages_tokens(messages)))
+        text, tools = SCRIPT[state["turn"] % len(SCRIPT)]
+        step = state["step"]
+        state["step"] += 1
+        if step < len(tools):
+            return AIMessage(content="", tool_calls=[{"name": tools[step], "args": {"query": text},
+                                                      "id": f"call_{state['turn']}_{step}"}])
+        if messages and isinstance(messages[-1], ToolMessage):
+            return AIMessage(content="Готово, вот что удалось выяснить по вашему запросу.")
+        return AIMessage(content="Хорошо.")
+
+    return model
+
+
+def make_tools():
+    from langchain_core.tools import StructuredTool
+
+    def make(name, size):
+        return StructuredTool.from_function(func=lambda query="": name[0] * size, name=name, description=name)
+
+    return {name: make(name, size) for name, size in TOOL_RESULT_CHARS.items()}
+
+
+async def run_session(mode, args, request_to_agent_async, new_conversation, SystemMessage, HumanMessage, prompt):
+    conversation = new_conversation(token_budget=args.budget if mode == "budget" else None)
+    chat_history = []
+    turn_ms = []
+    for turn in range(args.turns):
+        text = SCRIPT[turn % len(SCRIPT)][0]
+        started = time.perf_counter()
+        if mode == "before":
+            # Как было в main.py: chat_history — весь список графа прошлого хода, системный промпт добавляется снова.
+            chat_history.append(HumanMessage(content=text))
+            result = await request_to_agent_async([SystemMessage(prompt)] + chat_history, on_text=lambda _: None)
+            chat_history = result
+        else:
+            conversation.add_user(text)
+            result = await request_to_agent_async(conversation.messages(), on_text=lambda _: None)
+            conversation.add_agent_result(result)
+        turn_ms.append((time.perf_counter() - started) * 1000)
+        # Пауза пользователя между репликами: за неё фоновая суммаризация успевает завершиться.
+        if mode == "budget":
+            await asyncio.sleep(args.pause)
+    await conversation.wait_summary()
+    history = chat_history if mode == "before" else conversation.messages()
+    return {
+        "system_prompts": sum(1 for m in history if isinstance(m, SystemMessage) and m.content == prompt),
+        "summaries": conversation.summaries,
+        "summary_stats": conversation.summary_stats,
+        "turn_ms": turn_ms,
+    }
+
+
+def make_summarize(delay):
+    async def summarize(previous_summary, messages):
+        await asyncio.sleep(delay)
+        return "Пользователь открывал приложения и искал в сети погоду, рецепты и цены; все задачи выполнены."
+
+    return summarize
+
+
+def per_turn(log):
+    turns = {}
+    for turn, tokens in log:
+        entry = turns.setdefault(turn, {"first_call": tokens, "all_calls": 0})
+        entry["all_calls"] += tokens
+    return [turns[turn] for turn in sorted(turns)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=len(SCRIPT))
+    parser.add_argument("--budget", type=int, default=1500, help="Бюджет токенов истории для режима budget")
+    parser.add_argument("--summary-delay", type=float, default=0.5, help="Длительность заглушки суммаризации, с")
+    parser.add_argument("--pause", type=float, default=0.6, help="Пауза между репликами в режиме budget, с")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+    import logging
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from langchain_core.runnables import RunnableLambda
+    import agent.agent as main_agent
+    from agent.conversation import count_tokens, _encoding
+    logging.getLogger().setLevel(logging.WARNING)
+
+    main_agent.tools_by_name = make_tools()
+    main_agent.summarize_conversation = make_summarize(args.summary_delay)
+    results = {}
+    sessions = {}
+    for mode in ("before", "after", "budget"):
+        log = []
+        model = RunnableLambda(make_model(log))
+        main_agent.get_model_with_tools = lambda: model
+        main_agent.get_async_model_with_tools = lambda: model
+        main_agent.graph = main_agent.build_graph()
+        sessions[mode] = asyncio.run(run_session(mode, args, main_agent.request_to_agent_async,
+                                                 main_agent.new_conversation, SystemMessage, HumanMessage,
+                                                 main_agent.prompt))
+        results[mode] = per_turn(log)
+
+    print(f"Токенизатор: {'tiktoken' if _encoding() is not None else 'оценка по длине текста'}, "
+          f"системный промпт: {count_tokens(main_agent.prompt)} токенов")
+    print(f"{'ход':>3} | {'до':>8} | {'после':>8} | {'бюджет':>8} | {'время хода с бюджетом, мс':>26}  "
+          f"(токены первого вызова модели в ходе)")
+    for turn, (before, after, budget) in enumerate(zip(results["before"], results["after"], results["budget"]), 1):
+        print(f"{turn:>3} | {before['first_call']:>8} | {after['first_call']:>8} | {budget['first_call']:>8} | "
+              f"{sessions['budget']['turn_ms'][turn - 1]:>26.1f}")
+    totals = {mode: sum(entry["all_calls"] for entry in turns) for mode, turns in results.items()}
+    print(f"Всего токенов запроса за сессию: до {totals['before']}, после {totals['after']}, "
+          f"с бюджетом {args.budget}: {totals['budget']} (сводок: {sessions['budget']['summaries']}). "
+          f"Системных промптов в истории к концу: до {sessions['before']['system_prompts']}, "
+          f"после {sessions['after']['system_prompts']}.")
+    for index, stat in enumerate(sessions["budget"]["summary_stats"], 1):
+        print(f"Сводка {index}: суммаризация {stat['ms']:.0f} мс, история {stat['tokens_before']} → "
+              f"{stat['tokens_after']} токенов (−{stat['tokens_before'] - stat['tokens_after']})")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "turns": results, "totals": totals, "sessions": sessions},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Сравнение профилей декодирования faster-whisper (utils/decoding_profiles.py) по задержке и точности.
+
+Для каждого клипа каждый профиль прогоняется --repeats раз, берётся медиана времени. Точность — WER
+относительно эталона (--references или .txt рядом с клипом); если эталона нет, в качестве
+псевдо-эталона берётся результат профиля "dictation" и выводится расхождение с ним.
+
+Запуск из корня репозитория:
+    python -m benchmarks.decoding_profiles --model small --json decoding_profiles.json
+"""
+import argparse
+import json
+import statistics
+import time
+
+from faster_whisper import WhisperModel
+
+from benchmarks.asr_metrics import load_references, word_error_rate
+from utils.audio_io import load_audio, int16_to_float
+from utils.decoding_profiles import choose_profile, profile_kwargs
+
+SAMPLE_RATE = 16000
+DEFAULT_CLIPS = ["test.wav", "test2.mp3", "test3.mp3", "test4.mp3", "test5.mp3", "test6.mp3"]
+PROFILES = ["command", "dictation"]
+
+
+def transcribe(model, audio, profile):
+    started = time.perf_counter()
+    segments, _ = model.transcribe(audio, language="ru", **profile_kwargs(profile))
+    text = "".join(segment.text for segment in segments).strip()
+    return text, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--references", default=None)
+    parser.add_argument("--json", default=None)
+    parser.add_argument("clips", nargs="*", default=DEFAULT_CLIPS)
+    args = parser.parse_args()
+
+    model = WhisperModel(args.model, device="cpu", compute_type=args.compute_type)
+    references = load_references(args.clips, args.references)
+    audios = {clip: int16_to_float(load_audio(clip, SAMPLE_RATE)) for clip in args.clips}
+    transcribe(model, audios[args.clips[0]][:SAMPLE_RATE], "command")
+
+    results = []
+    totals = {profile: {"latencies": [], "wers": []} for profile in PROFILES}
+    for clip, audio in audios.items():
+        duration_s = len(audio) / SAMPLE_RATE
+        entry = {"clip": clip, "duration_s": round(duration_s, 2), "auto_profile": choose_profile(duration_s, "wake"),
+                 "profiles": {}}
+        for profile in PROFILES:
+            runs = [transcribe(model, audio, profile) for _ in range(args.repeats)]
+            entry["profiles"][profile] = {"text": runs[-1][0],
+                                          "latency_ms": round(statistics.median(ms for _, ms in runs), 1)}
+        reference = references.get(clip) or entry["profiles"]["dictation"]["text"]
+        entry["reference"] = "manual" if clip in references else "dictation"
+        for profile in PROFILES:
+            stats = entry["profiles"][profile]
+            stats["wer"] = word_error_rate(reference, stats["text"])
+            totals[profile]["latencies"].append(stats["latency_ms"])
+            if stats["wer"] is not None:
+                totals[profile]["wers"].append(stats["wer"])
+        results.append(entry)
+        print(f"{clip:>10} ({duration_s:5.2f} с, авто: {entry['auto_profile']:>9}): " + " | ".join(
+            f"{p} {entry['profiles'][p]['latency_ms']:7.1f} мс, WER {entry['profiles'][p]['wer'] or 0:.3f}"
+            for p in PROFILES))
+
+    summary = {
+        profile: {
+            "latency_ms_median": round(statistics.median(totals[profile]["latencies"]), 1),
+            "wer_mean": round(statistics.mean(totals[profile]["wers"]), 4) if totals[profile]["wers"] else None,
+        }
+        for profile in PROFILES
+    }
+    for profile, stats in summary.items():
+        print(f"{profile:>10}: медиана {stats['latency_ms_median']} мс, средний WER {stats['wer_mean']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "compute_type": args.compute_type, "summary": summary,
+                       "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Сквозная задержка голосового контура без микрофона, динамиков и облачной LLM.
+
+Файлы подаются в AudioCapture как виртуальный микрофон в реальном времени (FileSource): кодовое слово
+(клип --wake-clip, Vosk с грамматикой ключевых слов) → main.listen_with_vad_whisper (VAD, EndpointDetector,
+потоковый faster-whisper — тот же код, что в приложении) →
+агент (request_to_agent_async против локальной заглушки benchmarks.stub_llm) → TTSStream → TTSPipeline →
+AudioOutput с NullSink. Без --wake-clip этап кодового слова пропускается и команда слушается с начала.
+
+Для каждого прогона фиксируются моменты этапов; точка отсчёта — конец речи (момент, когда последний
+речевой кадр фразы поступил в захват). Считаются p50/p95 по --runs прогонам:
+  wake_ms                   конец клипа кодового слова → срабатывание
+  endpoint_ms               конец речи → решение EndpointDetector
+  asr_ms                    решение о конце фразы → текст
+  llm_first_sentence_ms     текст → первое предложение ответа в TTS
+  tts_first_audio_ms        первое предложение → первый блок звука в выводе
+  eos_to_first_audio_ms     конец речи → первый звук ответа (сумма того, что слышит пользователь)
+  agent_total_ms, tts_done_ms
+
+Запуск из корня репозитория:
+    python -m benchmarks.e2e_latency --wake-clip wake.wav --vosk-model vosk-model-small-ru-0.22 --runs 20 test.wav
+    python -m benchmarks.e2e_latency --tts silence --runs 10 --json e2e.json test.wav test3.mp3
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.stub_llm import StubLLM
+from utils.audio_capture import AudioCapture, FileSource
+from utils.audio_output import AudioOutput, NullSink
+from utils.keyword_spotter import KeywordSpotter
+from utils.tts_pipeline import TTSPipeline, TTSStream
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME = SAMPLE_RATE * FRAME_MS // 1000
+WAKE_CHUNK_SIZE = 2048
+TTS_SAMPLE_RATE = 48000
+WAKE_WORD = "джарвис"
+STAGES = ["wake_ms", "endpoint_ms", "asr_ms", "llm_first_sentence_ms", "tts_first_audio_ms",
+          "eos_to_first_audio_ms", "agent_total_ms", "tts_done_ms"]
+
+
+def make_synthesizer(args):
+    if args.tts == "silero":
+        from utils.silero_tts import load_silero_model, synthesize
+        model = load_silero_model(speaker="aidar", warmup_sample_rates=(TTS_SAMPLE_RATE,))
+        return lambda text: synthesize(model, text, "aidar", TTS_SAMPLE_RATE)
+
+    def silence(text):
+        # Пустой синтез: ~70 мс звука на символ, стоимость задаётся --tts-rtf.
+        duration = 0.07 * len(text)
+        time.sleep(duration * args.tts_rtf)
+        return np.zeros(int(duration * TTS_SAMPLE_RATE), dtype=np.int16)
+
+    return silence
+
+
+def wait_for_wake(reader, capture, vosk_model):
+    from vosk import KaldiRecognizer
+    spotter = KeywordSpotter({}, wake_word=WAKE_WORD)
+    recognizer = KaldiRecognizer(vosk_model, SAMPLE_RATE, spotter.grammar())
+    recognizer.SetPartialWords(True)
+    while True:
+        data = reader.read_bytes(WAKE_CHUNK_SIZE, timeout=0.5)
+        if data is None:
+            if capture.finished.is_set():
+                return None
+            continue
+        final = recognizer.AcceptWaveform(data)
+        result = json.loads(recognizer.Result() if final else recognizer.PartialResult())
+        if WAKE_WORD in spotter.match(result.get("text", "") if final else result.get("partial", ""), final=final):
+            return time.perf_counter()
+
+
+def listen(app, reader, capture, model, marks):
+    """Команда через listen_with_vad_whisper из main.py; захват подставляется в глобальное состояние модуля."""
+    app.capture = capture
+
+    def on_endpoint(speech_end_pos):
+        marks["endpoint"] = time.perf_counter()
+        marks["speech_end_pos"] = speech_end_pos
+
+    text = app.listen_with_vad_whisper(reader, model, start_position=reader.position, on_endpoint=on_endpoint)
+    marks["asr"] = time.perf_counter()
+    return "" if text in ("время вышло", "ошибка") or "endpoint" not in marks else text
+
+
+async def run_once(args, clip, models, pipeline, app, request_to_agent_async, HumanMessage):
+    paths = ([args.wake_clip] if args.wake_clip else []) + [clip]
+    source = FileSource(paths, sample_rate=SAMPLE_RATE, chunk_size=FRAME, gap_seconds=args.gap_seconds)
+    capture = AudioCapture(source, sample_rate=SAMPLE_RATE)
+    reader = capture.reader("e2e")
+    marks = {}
+    capture.start()
+    try:
+        if args.wake_clip:
+            marks["wake"] = await asyncio.to_thread(wait_for_wake, reader, capture, models["vosk"])
+            if marks["wake"] is None:
+                return None
+        text = await asyncio.to_thread(listen, app, reader, capture, models["whisper"], marks)
+    finally:
+        capture.stop()
+    if not text:
+        return None
+
+    def on_sentence(_):
+        marks.setdefault("first_sentence", time.perf_counter())
+
+    stream = TTSStream(pipeline, on_sentence=on_sentence)
+    await request_to_agent_async([HumanMessage(content=text)], on_text=stream.on_text)
+    marks["agent_done"] = time.perf_counter()
+    job = stream.finish()
+    await asyncio.to_thread(job.done.wait)
+    marks["tts_done"] = time.perf_counter()
+    first_audio = job.playbacks[0].started_at if job.playbacks else None
+
+    eos = source.sample_time(marks["speech_end_pos"])
+    result = {
+        "text": text,
+        "wake_ms": (marks["wake"] - source.sample_time(source.offsets[0][2])) * 1000 if args.wake_clip else None,
+        "endpoint_ms": (marks["endpoint"] - eos) * 1000,
+        "asr_ms": (marks["asr"] - marks["endpoint"]) * 1000,
+        "agent_total_ms": (marks["agent_done"] - marks["asr"]) * 1000,
+        "tts_done_ms": (marks["tts_done"] - eos) * 1000,
+        "llm_first_sentence_ms": None,
+        "tts_first_audio_ms": None,
+        "eos_to_first_audio_ms": None,
+    }
+    if "first_sentence" in marks:
+        result["llm_first_sentence_ms"] = (marks["first_sentence"] - marks["asr"]) * 1000
+        if first_audio is not None:
+            result["tts_first_audio_ms"] = (first_audio - marks["first_sentence"]) * 1000
+    if first_audio is not None:
+        result["eos_to_first_audio_ms"] = (first_audio - eos) * 1000
+    return result
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(results):
+    summary = {}
+    for stage in STAGES:
+        values = [r[stage] for r in results if r.get(stage) is not None]
+        if values:
+            summary[stage] = {"p50": round(statistics.median(values), 1), "p95": round(percentile(values, 0.95), 1),
+                              "n": len(values)}
+    return summary
+
+
+async def run_all(args, models):
+    from langchain_core.messages import HumanMessage
+    from agent.agent import request_to_agent_async
+    import main as app
+
+    output = AudioOutput(NullSink(TTS_SAMPLE_RATE), TTS_SAMPLE_RATE).start()
+    pipeline = TTSPipeline(make_synthesizer(args), output, TTS_SAMPLE_RATE)
+    results = []
+    for run in range(args.runs):
+        for clip in args.clips:
+            result = await run_once(args, clip, models, pipeline, app, request_to_agent_async, HumanMessage)
+            if result is None:
+                print(f"{clip}: прогон {run + 1} не дошёл до ответа (кодовое слово или речь не найдены).")
+                continue
+            result["clip"] = clip
+            results.append(result)
+            print(f"{clip}: конец речи → первый звук {result['eos_to_first_audio_ms'] or float('nan'):.0f} мс "
+                  f"(конец фразы {result['endpoint_ms']:.0f}, ASR {result['asr_ms']:.0f}, "
+                  f"LLM {result['llm_first_sentence_ms'] or float('nan'):.0f}, "
+                  f"TTS {result['tts_first_audio_ms'] or float('nan'):.0f})")
+    pipeline.close()
+    output.close()
+    print(f"Вывод звука: {output.stats()}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--wake-clip", default=None, help="Клип с кодовым словом перед каждой командой")
+    parser.add_argument("--vosk-model", default="vosk-model-small-ru-0.22")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--tts", choices=["silero", "silence"], default="silence")
+    parser.add_argument("--tts-rtf", type=float, default=0.1, help="Стоимость пустого синтеза относительно длительности")
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.03)
+    parser.add_argument("--gap-seconds", type=float, default=0.3)
+    parser.add_argument("--json", default=None)
+    parser.add_argument("clips", nargs="*", default=["test.wav"])
+    args = parser.parse_args()
+
+    stub = StubLLM(first_token_delay=args.first_token_delay, token_delay=args.token_delay).start()
+    os.environ["OPENROUTER_BASE_URL"] = stub.base_url
+    os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+    from faster_whisper import WhisperModel
+    models = {"whisper": WhisperModel(args.model, device="cpu", compute_type=args.compute_type)}
+    if args.wake_clip:
+        import vosk
+        models["vosk"] = vosk.Model(args.vosk_model)
+
+    try:
+        results = asyncio.run(run_all(args, models))
+    finally:
+        stub.stop()
+    summary = summarize(results)
+    for stage, stats in summary.items():
+        print(f"{stage:>24}: p50 {stats['p50']:8.1f} мс, p95 {stats['p95']:8.1f} мс (n={stats['n']})")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "summary": summary, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Проверка времени импорта текстовой точки входа (server.py → agent.agent) через `python -X importtime`.
+
+Падает с кодом 1, если суммарное время импорта превышает бюджет или если на текстовом пути
+оказались тяжёлые модули голосового/оконного стека (torch, pygame, pywinauto и т.п.).
+
+Запуск из корня репозитория:
+    python -m benchmarks.import_time_check --budget-ms 1500
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+TEXT_ONLY_MODULE = "agent.agent"
+FORBIDDEN_MODULES = [
+    "torch", "pygame", "vosk", "faster_whisper", "ctranslate2", "pywinauto", "pyautogui",
+    "PIL", "ddgs", "pycaw", "comtypes", "langchain_openai", "openai",
+]
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure_imports(module):
+    env = dict(os.environ, OPENROUTER_API_KEY=os.environ.get("OPENROUTER_API_KEY", "import-check"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Импорт {module} завершился ошибкой:\n{result.stderr[-2000:]}")
+
+    imported = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match[1]), int(match[2]), match[3], match[4]
+        imported[name] = cumulative_us
+        # Верхний уровень (отступ в один пробел) содержит полное накопленное время своих зависимостей.
+        if len(indent) == 1:
+            total_us += cumulative_us
+    return total_us / 1000, imported
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default=TEXT_ONLY_MODULE)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", 1500)))
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    total_ms, imported = measure_imports(args.module)
+    print(f"Импорт {args.module}: {total_ms:.0f} мс (бюджет {args.budget_ms:.0f} мс)")
+    top_level = sorted(
+        ((name, us) for name, us in imported.items() if "." not in name),
+        key=lambda item: item[1], reverse=True
+    )
+    for name, us in top_level[:args.top]:
+        print(f"  {name:<30} {us / 1000:8.1f} мс")
+
+    failed = False
+    leaked = sorted(name for name in imported if name.split(".")[0] in FORBIDDEN_MODULES)
+    if leaked:
+        print(f"Ошибка: на текстовом пути импортированы тяжёлые модули: {', '.join(leaked[:20])}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("Ошибка: превышен бюджет времени импорта.")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Задержка «ключевое слово → действие» для быстрых команд Vosk.
+
+Сравниваются три режима на одних и тех же клипах:
+  final            — полный словарь, команда по финальному Result() (как было раньше);
+  partial          — полный словарь, команда по PartialResult();
+  partial+grammar  — PartialResult() и распознаватель, ограниченный SetGrammar.
+
+Задержка считается по звуку: сколько аудио после конца слова (по разметке слов Vosk) распознаватель
+успел получить к моменту срабатывания, плюс время обработки последнего куска. Звук подаётся быстрее
+реального времени, поэтому CPU-время на секунду звука сравнимо между режимами.
+
+Запуск из корня репозитория:
+    python -m benchmarks.keyword_latency --json keyword_latency.json
+    python -m benchmarks.keyword_latency --keywords привет погода test2.mp3
+"""
+import argparse
+import json
+import statistics
+import time
+
+from vosk import KaldiRecognizer, Model, SetLogLevel
+
+from utils.audio_io import load_audio
+from utils.keyword_spotter import KeywordSpotter
+
+SAMPLE_RATE = 16000
+CHUNK_SIZE = 2048
+DEFAULT_CLIPS = ["test.wav", "test2.mp3", "test3.mp3", "test4.mp3", "test5.mp3", "test6.mp3"]
+# Те же слова, что в main.py (WAKE_WORD и QUICK_COMMANDS).
+DEFAULT_KEYWORDS = ["джарвис", "тише", "громче", "пауза", "продолжи", "дальше", "назад", "вверх", "вниз"]
+MODES = ["final", "partial", "partial+grammar"]
+
+
+def find_word_end(result, word):
+    for item in reversed(result.get("partial_result") or result.get("result") or []):
+        if item.get("word") == word:
+            return item["end"]
+    return None
+
+
+def run_mode(model, audio, keywords, mode):
+    spotter = KeywordSpotter({word: None for word in keywords})
+    if mode == "partial+grammar":
+        recognizer = KaldiRecognizer(model, SAMPLE_RATE, spotter.grammar())
+    else:
+        recognizer = KaldiRecognizer(model, SAMPLE_RATE)
+    recognizer.SetWords(True)
+    recognizer.SetPartialWords(True)
+    use_partial = mode != "final"
+
+    detections = []
+    cpu_started = time.process_time()
+    for pos in range(0, len(audio), CHUNK_SIZE):
+        chunk_started = time.perf_counter()
+        final = recognizer.AcceptWaveform(audio[pos:pos + CHUNK_SIZE].tobytes())
+        if final:
+            result = json.loads(recognizer.Result())
+            text = result.get("text", "")
+        elif use_partial:
+            result = json.loads(recognizer.PartialResult())
+            text = result.get("partial", "")
+        else:
+            continue
+        processing_ms = (time.perf_counter() - chunk_started) * 1000
+        heard_until = min(pos + CHUNK_SIZE, len(audio)) / SAMPLE_RATE
+        for word in spotter.match(text, final=final, now=heard_until):
+            word_end = find_word_end(result, word)
+            lag_ms = (heard_until - word_end) * 1000 if word_end is not None else None
+            detections.append({
+                "word": word,
+                "word_end_s": word_end,
+                "heard_until_s": round(heard_until, 3),
+                "latency_ms": round(lag_ms + processing_ms, 1) if lag_ms is not None else None,
+            })
+    result = json.loads(recognizer.FinalResult())
+    for word in spotter.match(result.get("text", ""), final=True, now=len(audio) / SAMPLE_RATE):
+        word_end = find_word_end(result, word)
+        lag_ms = (len(audio) / SAMPLE_RATE - word_end) * 1000 if word_end is not None else None
+        detections.append({"word": word, "word_end_s": word_end, "heard_until_s": round(len(audio) / SAMPLE_RATE, 3),
+                           "latency_ms": round(lag_ms, 1) if lag_ms is not None else None})
+    cpu_s = time.process_time() - cpu_started
+    return detections, cpu_s
+
+
+def summarize(latencies):
+    if not latencies:
+        return {"count": 0, "p50_ms": None, "p95_ms": None}
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="vosk-model-small-ru-0.22")
+    parser.add_argument("--keywords", nargs="+", default=DEFAULT_KEYWORDS)
+    parser.add_argument("--json", default=None)
+    parser.add_argument("clips", nargs="*", default=DEFAULT_CLIPS)
+    args = parser.parse_args()
+
+    SetLogLevel(-1)
+    model = Model(args.model)
+    keywords = [word.lower() for word in args.keywords]
+    clips = []
+    totals = {mode: {"latencies": [], "cpu_s": 0.0} for mode in MODES}
+    audio_s = 0.0
+    for clip in args.clips:
+        audio = load_audio(clip, SAMPLE_RATE)
+        audio_s += len(audio) / SAMPLE_RATE
+        entry = {"clip": clip, "duration_s": round(len(audio) / SAMPLE_RATE, 2), "modes": {}}
+        for mode in MODES:
+            detections, cpu_s = run_mode(model, audio, keywords, mode)
+            totals[mode]["cpu_s"] += cpu_s
+            totals[mode]["latencies"].extend(d["latency_ms"] for d in detections if d["latency_ms"] is not None)
+            entry["modes"][mode] = {"cpu_s": round(cpu_s, 3), "detections": detections}
+            print(f"{clip:>10} {mode:>16}: {len(detections)} срабатываний, CPU {cpu_s:.2f} с, "
+                  f"{[d['word'] for d in detections]}")
+        clips.append(entry)
+
+    summary = {}
+    for mode in MODES:
+        summary[mode] = summarize(totals[mode]["latencies"])
+        summary[mode]["cpu_per_audio_s"] = round(totals[mode]["cpu_s"] / audio_s, 4) if audio_s else None
+        print(f"{mode:>16}: p50 {summary[mode]['p50_ms']} мс, p95 {summary[mode]['p95_ms']} мс, "
+              f"CPU {summary[mode]['cpu_per_audio_s']} с на секунду звука")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"keywords": keywords, "summary": summary, "clips": clips}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Время до первого озвученного предложения: пакетный ответ агента против потока токенов в TTS.
+
+Агент работает против локальной заглушки benchmarks.stub_llm, TTS заменён пустым синтезом,
+поэтому измеряется именно момент, когда первое предложение попадает в синтез.
+
+Запуск из корня репозитория:
+    python -m benchmarks.llm_tts_latency --runs 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from benchmarks.stub_llm import StubLLM
+
+
+async def measure(request_to_agent_async, HumanMessage, SentenceSplitter, streaming):
+    started = time.perf_counter()
+    first_sentence_at = None
+    splitter = SentenceSplitter()
+
+    def on_text(delta):
+        nonlocal first_sentence_at
+        if splitter.feed(delta) and first_sentence_at is None:
+            first_sentence_at = time.perf_counter()
+
+    history = await request_to_agent_async(
+        [HumanMessage(content="Какая сегодня погода?")],
+        on_text=on_text if streaming else None
+    )
+    finished = time.perf_counter()
+    if not streaming:
+        # Пакетный путь: TTS получает первое предложение только после всего ответа.
+        splitter.feed(history[-1].content + " ")
+        first_sentence_at = finished
+    return (first_sentence_at - started) * 1000, (finished - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.03)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    stub = StubLLM(first_token_delay=args.first_token_delay, token_delay=args.token_delay).start()
+    os.environ["OPENROUTER_BASE_URL"] = stub.base_url
+    os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+    from langchain_core.messages import HumanMessage
+    from agent.agent import request_to_agent_async
+    from utils.tts_pipeline import SentenceSplitter
+
+    results = {}
+    for mode, streaming in (("batch", False), ("streaming", True)):
+        first, total = [], []
+        for _ in range(args.runs):
+            f, t = asyncio.run(measure(request_to_agent_async, HumanMessage, SentenceSplitter, streaming))
+            first.append(f)
+            total.append(t)
+        results[mode] = {
+            "first_sentence_ms_p50": round(statistics.median(first), 1),
+            "total_ms_p50": round(statistics.median(total), 1),
+        }
+        print(f"{mode:>9}: первое предложение {results[mode]['first_sentence_ms_p50']:7.1f} мс, "
+              f"весь ответ {results[mode]['total_ms_p50']:7.1f} мс")
+    stub.stop()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Память моделей и цена повторной загрузки после выгрузки по простою.
+
+Каждая модель грузится через ModelLoader в режиме экономии памяти (загрузки по одной, RSS до/после),
+затем выгружается (unload) и загружается снова при get(), как это происходит в main.py после
+MODEL_IDLE_UNLOAD_SECONDS простоя. Повторы показывают, насколько загрузку ускоряет файловый кэш ОС.
+
+Запуск из корня репозитория:
+    python -m benchmarks.model_memory --models whisper silero vosk --json model_memory.json
+"""
+import argparse
+import json
+import os
+
+from utils.model_loader import ModelLoader, StartupReport, process_rss_mb
+from utils.silero_tts import load_silero_model
+
+
+def make_loaders(args):
+    def load_whisper():
+        from faster_whisper import WhisperModel
+        return WhisperModel(args.whisper_model, device="cpu", compute_type=args.compute_type)
+
+    def load_vosk():
+        import vosk
+        return vosk.Model(args.vosk_model)
+
+    def load_silero():
+        return load_silero_model(args.silero_model)
+
+    return {"whisper": load_whisper, "vosk": load_vosk, "silero": load_silero}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", nargs="+", choices=["whisper", "vosk", "silero"], default=["whisper"])
+    parser.add_argument("--whisper-model", default="small")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--vosk-model", default="vosk-model-small-ru-0.22")
+    parser.add_argument("--silero-model", default="model_silero.pt")
+    parser.add_argument("--reloads", type=int, default=3)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    baseline_mb = process_rss_mb()
+    loaders = make_loaders(args)
+    # Порог простоя не важен: выгрузка вызывается явно, режим нужен для замера RSS.
+    models = ModelLoader(StartupReport(), idle_unload_seconds=3600)
+    for name in args.models:
+        models.submit(name, loaders[name])
+        models.get(name)
+    loaded_mb = process_rss_mb()
+
+    for name in args.models:
+        for _ in range(args.reloads):
+            models.unload(name)
+            models.get(name)
+    report = models.memory_report()
+    models.shutdown()
+
+    for name, entry in report.items():
+        print(f"{name:>8}: RSS {entry['rss_mb']} МБ, освобождается при выгрузке {entry['freed_mb']} МБ, "
+              f"повторная загрузка {entry['reload_ms_avg']} мс (по {entry['reloads']} прогонам)")
+    summary = {
+        "baseline_rss_mb": round(baseline_mb, 1),
+        "all_loaded_rss_mb": round(loaded_mb, 1),
+        "final_rss_mb": round(process_rss_mb(), 1),
+        "cpu_count": os.cpu_count(),
+    }
+    print(f"Итого: {summary}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "summary": summary, "models": report}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
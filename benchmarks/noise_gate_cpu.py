@@ -0,0 +1,179 @@
+"""
+Сколько CPU экономит спектральный шумовой гейт на шумных записях.
+
+Каждый клип из репозитория окружается шумом (вентилятор: коричневый шум с гулом; музыка: синтетические
+аккорды с ритмом) и прогоняется через ту же цепочку, что listen_with_vad_whisper: webrtcvad →
+EndpointDetector → faster-whisper для каждой найденной фразы. Сравниваются прогоны без гейта и с гейтом:
+число фраз, дошедших до ASR, отсечённые гейтом срабатывания и процессорное время (VAD, гейт, ASR).
+
+Запуск из корня репозитория:
+    python -m benchmarks.noise_gate_cpu --model small --json noise_gate.json
+    python -m benchmarks.noise_gate_cpu --model none     # только подсчёт срабатываний, без Whisper
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import webrtcvad
+
+from utils.audio_io import load_audio, int16_to_float
+from utils.decoding_profiles import profile_kwargs
+from utils.endpointing import EndpointDetector
+from utils.noise_gate import SpectralNoiseGate
+
+SAMPLE_RATE = 16000
+FRAME = 480
+BLOCK_FRAMES = 8
+DEFAULT_CLIPS = ["test.wav", "test2.mp3", "test3.mp3", "test4.mp3", "test5.mp3", "test6.mp3"]
+NOISE_SECONDS = 6.0
+
+
+def fan_noise(n, rng):
+    brown = np.cumsum(rng.normal(0, 1, n))
+    brown -= np.convolve(brown, np.ones(400) / 400, "same")
+    t = np.arange(n) / SAMPLE_RATE
+    hum = sum(np.sin(2 * np.pi * f * t) / k for k, f in enumerate((100, 200, 300), 1))
+    noise = brown / np.std(brown) + 0.5 * hum
+    return noise / np.std(noise)
+
+
+def music_noise(n, rng):
+    t = np.arange(n) / SAMPLE_RATE
+    chords = [(220.0, 277.2, 329.6), (196.0, 246.9, 293.7), (174.6, 220.0, 261.6), (196.0, 246.9, 311.1)]
+    signal = np.zeros(n)
+    beat = int(0.5 * SAMPLE_RATE)
+    for start in range(0, n, beat * 4):
+        chord = chords[(start // (beat * 4)) % len(chords)]
+        end = min(n, start + beat * 4)
+        for f in chord:
+            signal[start:end] += np.sin(2 * np.pi * f * t[start:end]) + 0.3 * np.sin(4 * np.pi * f * t[start:end])
+    drums = np.zeros(n)
+    for start in range(0, n, beat):
+        length = min(n - start, 1600)
+        drums[start:start + length] += rng.normal(0, 3, length) * np.exp(-np.arange(length) / 300)
+    signal += drums
+    return signal / np.std(signal)
+
+
+NOISES = {"fan": fan_noise, "music": music_noise}
+
+
+def make_recording(speech, noise_kind, noise_level_db, rng):
+    pad = int(NOISE_SECONDS * SAMPLE_RATE)
+    total = pad + len(speech) + pad
+    noise = NOISES[noise_kind](total, rng) * 32768 * 10 ** (noise_level_db / 20)
+    mix = noise.copy()
+    mix[pad:pad + len(speech)] += speech
+    return np.clip(mix, -32768, 32767).astype(np.int16), (pad, pad + len(speech))
+
+
+def run(audio, speech_span, model, use_gate, aggressiveness):
+    vad = webrtcvad.Vad(aggressiveness)
+    gate = SpectralNoiseGate(sample_rate=SAMPLE_RATE, frame_size=FRAME) if use_gate else None
+    endpoint = EndpointDetector()
+    cpu = {"vad_s": 0.0, "gate_s": 0.0, "asr_s": 0.0}
+    utterances = []
+    speech_start = None
+
+    block_size = FRAME * BLOCK_FRAMES
+    for block_start in range(0, len(audio) - block_size + 1, block_size):
+        block = audio[block_start:block_start + block_size]
+        mask = None
+        if gate is not None:
+            started = time.process_time()
+            mask = gate.process(block)
+            cpu["gate_s"] += time.process_time() - started
+        for i in range(BLOCK_FRAMES):
+            frame = block[i * FRAME:(i + 1) * FRAME]
+            frame_end = block_start + (i + 1) * FRAME
+            started = time.process_time()
+            is_speech = vad.is_speech(frame.tobytes(), SAMPLE_RATE)
+            cpu["vad_s"] += time.process_time() - started
+            if mask is not None:
+                gate.count_rejection(is_speech, mask[i])
+                is_speech = is_speech and mask[i]
+            done = endpoint.process(is_speech, frame)
+            if endpoint.in_speech and speech_start is None:
+                speech_start = frame_end - FRAME
+            if done:
+                utterances.append((speech_start, frame_end))
+                endpoint.reset()
+                speech_start = None
+    if speech_start is not None:
+        utterances.append((speech_start, len(audio)))
+    if gate is not None:
+        gate.finish_utterance()
+
+    texts = []
+    for start, end in utterances:
+        if model is None:
+            continue
+        started = time.process_time()
+        segments, _ = model.transcribe(int16_to_float(audio[start:end]), language="ru", **profile_kwargs("command"))
+        texts.append("".join(segment.text for segment in segments).strip())
+        cpu["asr_s"] += time.process_time() - started
+
+    speech_lo, speech_hi = speech_span
+    hits_speech = any(start < speech_hi and end > speech_lo for start, end in utterances)
+    return {
+        "utterances": len(utterances),
+        "false_utterances": sum(1 for start, end in utterances if end <= speech_lo or start >= speech_hi),
+        "speech_detected": hits_speech,
+        "rejected_by_gate": gate.rejected_utterances if gate is not None else 0,
+        "cpu_s": {k: round(v, 3) for k, v in cpu.items()},
+        "cpu_total_s": round(sum(cpu.values()), 3),
+        "texts": texts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="small", help="Модель faster-whisper или none")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--noise", nargs="+", choices=sorted(NOISES), default=sorted(NOISES))
+    parser.add_argument("--noise-level-db", type=float, default=-35.0)
+    parser.add_argument("--aggressiveness", type=int, default=3)
+    parser.add_argument("--json", default=None)
+    parser.add_argument("clips", nargs="*", default=DEFAULT_CLIPS)
+    args = parser.parse_args()
+
+    model = None
+    if args.model != "none":
+        from faster_whisper import WhisperModel
+        model = WhisperModel(args.model, device="cpu", compute_type=args.compute_type)
+
+    results = []
+    totals = {False: 0.0, True: 0.0}
+    for clip in args.clips:
+        speech = load_audio(clip, SAMPLE_RATE).astype(np.float32)
+        for noise_kind in args.noise:
+            audio, span = make_recording(speech, noise_kind, args.noise_level_db, np.random.default_rng(0))
+            entry = {"clip": clip, "noise": noise_kind}
+            for use_gate in (False, True):
+                result = run(audio, span, model, use_gate, args.aggressiveness)
+                entry["gate" if use_gate else "baseline"] = result
+                totals[use_gate] += result["cpu_total_s"]
+            results.append(entry)
+            base, gated = entry["baseline"], entry["gate"]
+            print(f"{clip:>10} {noise_kind:>5}: фраз до ASR {base['utterances']} → {gated['utterances']} "
+                  f"(ложных {base['false_utterances']} → {gated['false_utterances']}, отсечено гейтом "
+                  f"{gated['rejected_by_gate']}), речь найдена: {gated['speech_detected']}, "
+                  f"CPU {base['cpu_total_s']:.2f} → {gated['cpu_total_s']:.2f} с")
+
+    summary = {
+        "cpu_baseline_s": round(totals[False], 3),
+        "cpu_gate_s": round(totals[True], 3),
+        "cpu_saved_ratio": round(1 - totals[True] / totals[False], 3) if totals[False] else None,
+        "false_utterances_baseline": sum(r["baseline"]["false_utterances"] for r in results),
+        "false_utterances_gate": sum(r["gate"]["false_utterances"] for r in results),
+        "speech_missed_with_gate": sum(not r["gate"]["speech_detected"] for r in results),
+    }
+    print(f"Итого: {summary}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "summary": summary, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+RTF синтеза Silero по конфигурациям: число потоков torch × оптимизация модели × частота дискретизации.
+
+Для каждой оптимизации модель загружается заново. Первый вызов apply_tts (холодный) замеряется отдельно —
+его и убирает прогрев при старте main.py. RTF = время синтеза / длительность полученного звука,
+по медиане из --runs прогонов набора фраз.
+
+Запуск из корня репозитория:
+    python -m benchmarks.silero_rtf --threads 1 2 4 --optimizations none quantize freeze --json silero_rtf.json
+"""
+import argparse
+import json
+import statistics
+import time
+
+from utils.silero_tts import (load_silero_model, synthesize, SILERO_MODEL_FILE, SILERO_OPTIMIZATIONS,
+                              SILERO_SAMPLE_RATES)
+
+PHRASES = [
+    "Готово.",
+    "Открываю браузер и ищу расписание поездов на завтра.",
+    "Сейчас в Москве плюс двенадцать градусов, небольшой дождь, к вечеру прояснится.",
+]
+
+
+def measure(model, speaker, sample_rate, threads, runs):
+    rtfs = []
+    for _ in range(runs):
+        for phrase in PHRASES:
+            started = time.perf_counter()
+            audio = synthesize(model, phrase, speaker, sample_rate, threads)
+            rtfs.append((time.perf_counter() - started) / (len(audio) / sample_rate))
+    return rtfs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-file", default=SILERO_MODEL_FILE)
+    parser.add_argument("--speaker", default="aidar")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--optimizations", nargs="+", choices=SILERO_OPTIMIZATIONS, default=list(SILERO_OPTIMIZATIONS))
+    parser.add_argument("--sample-rates", type=int, nargs="+", choices=SILERO_SAMPLE_RATES, default=[24000, 48000])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    results = []
+    for optimization in args.optimizations:
+        started = time.perf_counter()
+        model = load_silero_model(args.model_file, threads=args.threads[0], optimization=optimization)
+        load_ms = (time.perf_counter() - started) * 1000
+        for threads in args.threads:
+            for sample_rate in args.sample_rates:
+                started = time.perf_counter()
+                try:
+                    synthesize(model, PHRASES[0], args.speaker, sample_rate, threads)
+                except Exception as e:
+                    print(f"{optimization:>8} потоков {threads} {sample_rate} Гц: ошибка синтеза: {e}")
+                    continue
+                cold_ms = (time.perf_counter() - started) * 1000
+                rtfs = measure(model, args.speaker, sample_rate, threads, args.runs)
+                entry = {
+                    "optimization": optimization,
+                    "threads": threads,
+                    "sample_rate": sample_rate,
+                    "load_ms": round(load_ms, 1),
+                    "cold_call_ms": round(cold_ms, 1),
+                    "rtf_p50": round(statistics.median(rtfs), 4),
+                    "rtf_max": round(max(rtfs), 4),
+                }
+                results.append(entry)
+                print(f"{optimization:>8} потоков {threads} {sample_rate} Гц: RTF {entry['rtf_p50']:.3f} "
+                      f"(макс {entry['rtf_max']:.3f}), первый вызов {entry['cold_call_ms']:.0f} мс")
+        del model
+
+    best = min(results, key=lambda r: r["rtf_p50"]) if results else None
+    print(f"Лучшая конфигурация: {best}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "best": best, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
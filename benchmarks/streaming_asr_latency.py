@@ -0,0 +1,84 @@
+"""
+Задержка «конец речи → текст» для потоковой и пакетной расшифровки faster-whisper.
+
+Каждый клип подаётся в кольцевой буфер в реальном времени, как с микрофона.
+Пакетный путь (как listen_with_vad_whisper до потокового режима) начинает transcribe
+только после конца клипа; потоковый всё это время декодирует в фоне.
+
+Запуск из корня репозитория:
+    python -m benchmarks.streaming_asr_latency --model small --json streaming_latency.json
+"""
+import argparse
+import json
+import time
+
+from faster_whisper import WhisperModel
+
+from utils.audio_capture import RingBuffer
+from utils.audio_io import load_audio, int16_to_float
+from utils.streaming_asr import StreamingTranscriber, STREAM_STEP_MS
+
+SAMPLE_RATE = 16000
+CHUNK_SIZE = 480
+DEFAULT_CLIPS = ["test.wav", "test2.mp3", "test3.mp3", "test4.mp3", "test5.mp3", "test6.mp3"]
+
+
+def run_batch(model, audio):
+    started = time.perf_counter()
+    segments, _ = model.transcribe(int16_to_float(audio), language="ru")
+    text = "".join(segment.text for segment in segments).strip()
+    return text, (time.perf_counter() - started) * 1000
+
+
+def run_streaming(model, audio, step_ms, speed):
+    ring = RingBuffer(len(audio) + CHUNK_SIZE)
+    transcriber = StreamingTranscriber(model, ring.view, sample_rate=SAMPLE_RATE, step_ms=step_ms)
+    transcriber.start(0)
+    started = time.perf_counter()
+    for pos in range(0, len(audio), CHUNK_SIZE):
+        ring.write(audio[pos:pos + CHUNK_SIZE])
+        transcriber.update(ring.write_pos)
+        delay = started + ring.write_pos / SAMPLE_RATE / speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    text = transcriber.finish(ring.write_pos)
+    return text, transcriber.last_finish_ms, transcriber
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--step-ms", type=int, default=STREAM_STEP_MS)
+    parser.add_argument("--speed", type=float, default=1.0, help="Скорость подачи звука относительно реального времени")
+    parser.add_argument("--json", default=None)
+    parser.add_argument("clips", nargs="*", default=DEFAULT_CLIPS)
+    args = parser.parse_args()
+
+    model = WhisperModel(args.model, device="cpu", compute_type=args.compute_type)
+    results = []
+    for clip in args.clips:
+        audio = load_audio(clip, SAMPLE_RATE)
+        batch_text, batch_ms = run_batch(model, audio)
+        stream_text, stream_ms, transcriber = run_streaming(model, audio, args.step_ms, args.speed)
+        results.append({
+            "clip": clip,
+            "duration_s": round(len(audio) / SAMPLE_RATE, 2),
+            "batch_latency_ms": round(batch_ms, 1),
+            "streaming_latency_ms": round(stream_ms, 1),
+            "streaming_tail_s": round(transcriber.last_tail_seconds, 2),
+            "streaming_decodes": transcriber.decodes,
+            "batch_text": batch_text,
+            "streaming_text": stream_text,
+        })
+        print(f"{clip:>10}: {results[-1]['duration_s']:6.2f} с | пакетно {batch_ms:8.1f} мс | "
+              f"потоково {stream_ms:8.1f} мс (хвост {transcriber.last_tail_seconds:.2f} с)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "compute_type": args.compute_type, "step_ms": args.step_ms,
+                       "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
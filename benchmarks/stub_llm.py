@@ -0,0 +1,150 @@
+"""
+Локальная OpenAI-совместимая заглушка /v1/chat/completions для бенчмарков.
+
+Отдаёт детерминированный ответ с фиксированной задержкой до первого токена и между токенами,
+поддерживает stream=True (SSE) и обычный режим. Запуск отдельно:
+    python -m benchmarks.stub_llm --port 8765
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "Готово. Я открыл браузер и нашёл прогноз погоды на сегодня. "
+    "В Москве облачно, около пятнадцати градусов, ветер слабый. "
+    "К вечеру возможен небольшой дождь, зонт лучше взять с собой."
+)
+
+
+def tokenize_reply(text):
+    # Примерно как у BPE-моделей: слово вместе с предшествующим пробелом.
+    tokens = []
+    for i, word in enumerate(text.split(" ")):
+        tokens.append(word if i == 0 else " " + word)
+    return tokens
+
+
+class StubLLM:
+    def __init__(self, reply=DEFAULT_REPLY, first_token_delay=0.3, token_delay=0.03, host="127.0.0.1", port=0):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.requests = 0
+        self.prompt_chars = []
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reply_for(self, body):
+        return self.reply
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                stub.requests += 1
+                stub.prompt_chars.append(sum(len(str(m.get("content") or "")) for m in body.get("messages", [])))
+                reply = stub.reply_for(body)
+                model = body.get("model", "stub")
+                time.sleep(stub.first_token_delay)
+                if body.get("stream"):
+                    self._stream(model, reply)
+                else:
+                    time.sleep(stub.token_delay * len(tokenize_reply(reply)))
+                    self._send_json({
+                        "id": "stub-completion",
+                        "object": "chat.completion",
+                        "created": 0,
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": reply},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                    })
+
+            def _send_json(self, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, model, reply):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                tokens = tokenize_reply(reply)
+                for i, token in enumerate(tokens):
+                    delta = {"content": token}
+                    if i == 0:
+                        delta["role"] = "assistant"
+                    self._event({
+                        "id": "stub-completion",
+                        "object": "chat.completion.chunk",
+                        "created": 0,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                    })
+                    time.sleep(stub.token_delay)
+                self._event({
+                    "id": "stub-completion",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                })
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _event(self, payload):
+                self.wfile.write(b"data: " + json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.03)
+    args = parser.parse_args()
+    stub = StubLLM(first_token_delay=args.first_token_delay, token_delay=args.token_delay, port=args.port).start()
+    print(f"Заглушка LLM: {stub.base_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Время шага tool_node при нескольких tool_calls: последовательный запуск против ToolExecutor.
+
+Инструменты заменены задержками с типичной длительностью настоящих (поиск в сети, перечень установленных
+программ из реестра, список окон), чтобы не зависеть от Windows и сети. Проверяется и то, что результаты
+приходят в порядке tool_calls, а "serial"-инструменты не пересекаются по времени ни с чем.
+
+Запуск из корня репозитория:
+    python -m benchmarks.tool_concurrency --runs 5
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+from agent.tool_executor import ToolExecutor
+
+TOOL_LATENCY_S = {
+    "search_web": 0.8,
+    "get_installed_software": 1.2,
+    "get_open_windows": 0.2,
+    "find_application_name": 0.3,
+    "start_application": 0.5,
+    "interact_with_element_by_id": 0.3,
+}
+
+SCENARIOS = {
+    "read_only": ["search_web", "get_installed_software", "get_open_windows"],
+    "mixed": ["get_open_windows", "find_application_name", "start_application", "get_open_windows",
+              "interact_with_element_by_id", "interact_with_element_by_id"],
+}
+
+
+def make_invoke(log):
+    lock = threading.Lock()
+
+    def invoke(tool_call):
+        started = time.perf_counter()
+        time.sleep(TOOL_LATENCY_S[tool_call["name"]])
+        with lock:
+            log.append((tool_call["name"], started, time.perf_counter()))
+        return tool_call["id"]
+
+    return invoke
+
+
+def serial_overlaps(log, executor):
+    overlaps = 0
+    for name, start, end in log:
+        if executor.is_parallel(name):
+            continue
+        overlaps += sum(1 for other, s, e in log if (other, s, e) != (name, start, end) and s < end and e > start)
+    return overlaps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    executor = ToolExecutor()
+    results = {}
+    for scenario, names in SCENARIOS.items():
+        tool_calls = [{"name": name, "args": {}, "id": f"call_{i}"} for i, name in enumerate(names)]
+        sequential, concurrent = [], []
+        ordered, overlaps = True, 0
+        for _ in range(args.runs):
+            log = []
+            invoke = make_invoke(log)
+            started = time.perf_counter()
+            for tool_call in tool_calls:
+                invoke(tool_call)
+            sequential.append((time.perf_counter() - started) * 1000)
+
+            log = []
+            started = time.perf_counter()
+            ids = executor.run(tool_calls, make_invoke(log))
+            concurrent.append((time.perf_counter() - started) * 1000)
+            ordered = ordered and ids == [tc["id"] for tc in tool_calls]
+            overlaps += serial_overlaps(log, executor)
+        results[scenario] = {
+            "sequential_ms_p50": round(statistics.median(sequential), 1),
+            "concurrent_ms_p50": round(statistics.median(concurrent), 1),
+            "results_in_order": ordered,
+            "serial_overlaps": overlaps,
+        }
+        r = results[scenario]
+        print(f"{scenario:>10}: последовательно {r['sequential_ms_p50']:.0f} мс, параллельно "
+              f"{r['concurrent_ms_p50']:.0f} мс, порядок сохранён: {ordered}, пересечений serial: {overlaps}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
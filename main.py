@@ -1,28 +1,56 @@
-import vosk
-import pyaudio
+from utils.model_loader import StartupReport, ModelLoader
+startup = StartupReport()
+
+import contextlib
+import io
 import json
 import os
-import torch
-import pygame
 import threading
 import queue
 import re
-import numpy as np
-import webrtcvad
 import time
 import asyncio
 from collections import deque
-from faster_whisper import WhisperModel
-from openai import BadRequestError
-from gtts import gTTS
 
-from langchain_core.messages import HumanMessage
-from agent.agent import request_to_agent_async
-from gui.overlay import SubtitleOverlay
+with startup.measure("numpy, pyaudio, webrtcvad"):
+    import numpy as np
+    import pyaudio
+    import webrtcvad
 from utils.media_utils import *
+from utils.audio_capture import AudioCapture, MicrophoneSource, FileSource
+from utils.audio_io import int16_to_float, float_to_int16, resample_int16
+from utils.streaming_asr import StreamingTranscriber
+from utils.decoding_profiles import choose_profile, profile_kwargs
+from utils.endpointing import EndpointDetector, utterance_looks_complete
+from utils.tts_pipeline import TTSPipeline, TTSStream
+from utils.audio_output import AudioOutput, PyAudioSink, NullSink, AUDIO_OUTPUT_SAMPLE_RATE, AUDIO_OUTPUT_BLOCK_MS
+from utils.tts_cache import TTSCache
+from utils.asr_worker import ASRWorkerProcess
+from utils.keyword_spotter import KeywordSpotter
+from utils.barge_in import EchoReference, BargeInDetector
+from utils.noise_gate import SpectralNoiseGate
+from utils.silero_tts import load_silero_model, synthesize as silero_synthesize, SILERO_THREADS
 
 ASR_ENGINE = 'whisper'
+ASR_STREAMING = True
+# Whisper в отдельном процессе: декодирование не делит GIL с захватом, VAD и TTS.
+ASR_WORKER_PROCESS = os.getenv("ASR_WORKER_PROCESS", "0") == "1"
+ASR_WORKER_CPU_THREADS = int(os.getenv("ASR_WORKER_CPU_THREADS", "0"))
+ASR_WORKER_NUM_WORKERS = int(os.getenv("ASR_WORKER_NUM_WORKERS", "1"))
+# Номера ядер через запятую, например "2,3"; пусто — без привязки.
+ASR_WORKER_AFFINITY = [int(c) for c in os.getenv("ASR_WORKER_AFFINITY", "").split(",") if c.strip()]
+# Выгрузка моделей после простоя (секунды); 0 — модели держатся в памяти всё время.
+# Vosk не выгружается: он постоянно слушает кодовое слово.
+MODEL_IDLE_UNLOAD_SECONDS = float(os.getenv("MODEL_IDLE_UNLOAD_SECONDS", "0"))
+# Бюджет токенов истории диалога; при превышении старые ходы сворачиваются в сводку в фоне. 0 — без ограничения.
+AGENT_MEMORY_TOKEN_BUDGET = int(os.getenv("AGENT_MEMORY_TOKEN_BUDGET", "6000"))
+AGENT_MEMORY_KEEP_RECENT_TURNS = int(os.getenv("AGENT_MEMORY_KEEP_RECENT_TURNS", "3"))
+SPECULATIVE_DISPATCH = True
+STREAM_LLM_TO_TTS = True
 TTS_ENGINE = 'silero'
+# Оптимизация модели Silero (none / quantize / freeze); число потоков — SILERO_THREADS в utils/silero_tts.py.
+SILERO_OPTIMIZATION = os.getenv("SILERO_OPTIMIZATION", "none")
+SILERO_WARMUP = True
 
 WAKE_WORD = "джарвис"
 SOUND_MINUS_WORD = "тише"
@@ -33,6 +61,8 @@ NEXT_WORD = "дальше"
 BACK_WORD = "назад"
 UP_WORD = "вверх"
 DOWN_WORD = "вниз"
+# Распознаватель кодового слова ограничен грамматикой из ключевых слов: меньше CPU и ложных срабатываний.
+VOSK_KEYWORD_GRAMMAR = True
 
 MODEL_FOLDER_NAME = "vosk-model-small-ru-0.22"
 WHISPER_MODEL_NAME = "small"
@@ -44,66 +74,103 @@ VAD_AGGRESSIVENESS = 3
 VAD_FRAME_MS = 30
 VAD_CHUNK_SIZE = int(INPUT_SAMPLE_RATE * (VAD_FRAME_MS / 1000.0))
 VAD_SILENCE_TIMEOUT_MS = 1500
+ENDPOINT_SHORT_SILENCE_MS = 400
+ENDPOINT_DEFAULT_SILENCE_MS = 800
+ENDPOINT_TRAILING_PAD_MS = 150
 VAD_PRE_BUFFER_MS = 300
+WAKE_CHUNK_SIZE = 2048
+CAPTURE_BUFFER_SECONDS = 60
+CAPTURE_READ_TIMEOUT_SECONDS = 0.5
+AUDIO_INPUT_FILES = [p for p in os.getenv("AUDIO_INPUT_FILES", "").split(os.pathsep) if p]
+# Вывод звука в пустой приёмник (без устройства) — для безголовых прогонов вместе с AUDIO_INPUT_FILES.
+AUDIO_OUTPUT_NULL = os.getenv("AUDIO_OUTPUT_NULL", "0") == "1"
 MAX_RETRIES = 20
 RETRY_DELAY_SECONDS = 2
 FOLLOW_UP_TIMEOUT_SECONDS = 5
+TTS_CACHE_ENABLED = True
+# Barge-in: во время озвучки VAD продолжает слушать микрофон, речь пользователя прерывает TTS.
+BARGE_IN = True
+# Спектральный шумовой гейт перед webrtcvad: отсекает вентиляторы и музыку до Whisper.
+NOISE_GATE = os.getenv("NOISE_GATE", "0") == "1"
+NOISE_GATE_BLOCK_FRAMES = 8
+TTS_PREWARM_PHRASES = [
+    "Произошла ошибка при обработке запроса.",
+    "Готово.",
+    "Хорошо.",
+    "Секунду.",
+    "Не удалось получить ответ.",
+]
 
-chat_history = []
 gui_queue = queue.Queue()
 stop_event = threading.Event()
 
-pygame.mixer.init()
-activate_sound = pygame.mixer.Sound(WAITING_SOUND)
-
-if not os.path.exists(MODEL_FOLDER_NAME):
-    print(f"Ошибка: Папка с моделью Vosk '{MODEL_FOLDER_NAME}' не найдена.")
-    exit()
-vosk_model = vosk.Model(MODEL_FOLDER_NAME)
-
-silero_model = None
+QUICK_COMMANDS = [
+    (SOUND_MINUS_WORD, "Уменьшаю громкость.", sound_minus),
+    (SOUND_PLUS_WORD, "Увеличиваю громкость.", sound_plus),
+    (PAUSE_WORD, "Ставлю на паузу.", play_pause),
+    (PLAY_WORD, "Продолжаю воспроизведение.", play_pause),
+    (NEXT_WORD, "Следующий медиа.", next_media),
+    (BACK_WORD, "Предыдущий медиа.", back_media),
+    (UP_WORD, "Вверх.", up),
+    (DOWN_WORD, "Вниз.", down),
+]
+QUICK_COMMAND_MESSAGES = {word: message for word, message, _ in QUICK_COMMANDS}
+
+# Частота устройства вывода и заготовленных фраз (синтезируются заранее, важнее качество).
 silero_sample_rate = 48000
+# Ответы синтезируются на лету: 24 кГц примерно вдвое дешевле, до 48 кГц досэмплируются.
+silero_live_sample_rate = 24000
 silero_speaker = 'aidar'
 
-if TTS_ENGINE == 'gtts':
-    print("Движок TTS (gTTS) готов к работе.")
-elif TTS_ENGINE == 'silero':
-    print("Загрузка модели Silero TTS...")
-    device = torch.device('cpu')
-    try:
-        local_file = 'model_silero.pt'
-        if not os.path.isfile(local_file):
-            torch.hub.download_url_to_file('https://models.silero.ai/models/tts/ru/v4_ru.pt', local_file)  
-        silero_model = torch.package.PackageImporter(local_file).load_pickle("tts_models", "model")
-        silero_model.to(device)
-        print("Модель Silero TTS успешно загружена.")
-    except Exception as e:
-        print(f"Ошибка при загрузке Silero TTS: {e}")
-        exit()
-else:
-    print(f"Ошибка: Неизвестный движок TTS '{TTS_ENGINE}'.")
-    exit()
-
-whisper_model = None
-if ASR_ENGINE == 'whisper':
-    print(f"Загрузка модели faster-whisper ({WHISPER_MODEL_NAME})...")
-    try:
-        device_type = "cuda" if torch.cuda.is_available() else "cpu"
-        compute_type = "float16" if torch.cuda.is_available() else "int8"
-        whisper_model = WhisperModel(WHISPER_MODEL_NAME, device=device_type, compute_type=compute_type)
-        print("Модель faster-whisper успешно загружена.")
-    except Exception as e:
-        print(f"Ошибка при загрузке модели faster-whisper: {e}")
-        exit()
-
-pa = pyaudio.PyAudio()
-stream = pa.open(
-    format=INPUT_FORMAT,
-    channels=INPUT_CHANNELS,
-    rate=INPUT_SAMPLE_RATE,
-    input=True,
-    frames_per_buffer=VAD_CHUNK_SIZE
-)
+def load_vosk():
+    with startup.measure("vosk"):
+        import vosk
+    return vosk.Model(MODEL_FOLDER_NAME)
+
+def load_silero():
+    with startup.measure("torch"):
+        import torch
+    return load_silero_model(threads=SILERO_THREADS, optimization=SILERO_OPTIMIZATION, speaker=silero_speaker,
+                             warmup_sample_rates=(silero_live_sample_rate, silero_sample_rate) if SILERO_WARMUP else ())
+
+def load_whisper():
+    with startup.measure("faster_whisper"):
+        import ctranslate2
+        from faster_whisper import WhisperModel
+    # Устройство определяем через ctranslate2, чтобы не ждать импорта torch из соседнего потока.
+    has_cuda = ctranslate2.get_cuda_device_count() > 0
+    device_type = "cuda" if has_cuda else "cpu"
+    compute_type = "float16" if has_cuda else "int8"
+    if ASR_WORKER_PROCESS:
+        worker = ASRWorkerProcess(WHISPER_MODEL_NAME, device=device_type, compute_type=compute_type,
+                                  cpu_threads=ASR_WORKER_CPU_THREADS, num_workers=ASR_WORKER_NUM_WORKERS,
+                                  affinity=ASR_WORKER_AFFINITY).wait_ready()
+        print(f"Процесс ASR запущен (pid {worker.pid}), модель загружена за {worker.load_ms:.0f} мс.")
+        return worker
+    return WhisperModel(WHISPER_MODEL_NAME, device=device_type, compute_type=compute_type)
+
+def print_startup_report():
+    models.wait_all()
+    print(startup.format())
+
+def synthesize_silero_uncached(text, sample_rate=silero_sample_rate):
+    with models.use("silero") as silero:
+        return silero_synthesize(silero, text, silero_speaker, sample_rate, threads=SILERO_THREADS)
+
+def synthesize_silero_live(text):
+    return synthesize_silero_uncached(text, silero_live_sample_rate)
+
+def synthesize_silero(text):
+    if tts_cache is None:
+        audio = synthesize_silero_live(text)
+    else:
+        # Заготовленная фраза уже есть в полном качестве.
+        audio = tts_cache.get(tts_cache.key(text, silero_speaker, silero_sample_rate, 'silero'))
+        if audio is not None:
+            return audio
+        audio = tts_cache.get_or_synthesize(text, silero_speaker, silero_live_sample_rate, 'silero',
+                                            synthesize_silero_live)
+    return resample_int16(audio, silero_live_sample_rate, silero_sample_rate)
 
 def sentence_chunks(text):
     pat = re.compile(r'[^\.!\?…]+[\.!?…]+(?:["»)]?)(?:\s*)', re.DOTALL)
@@ -123,105 +190,221 @@ def sentence_chunks(text):
 
 def speak_gtts(text):
     try:
+        from gtts import gTTS
+
         tts = gTTS(text=text, lang='ru')
-        filename = "temp_speech.mp3"
-        tts.save(filename)
+        mp3 = io.BytesIO()
+        tts.write_to_fp(mp3)
         gui_queue.put({'type': 'agent_response_chunk', 'text': text})
-        tts_temp = pygame.mixer.Sound(filename)
-        tts_temp_lenght = tts_temp.get_length()
-        tts_temp.play()
-        pygame.time.wait(int(tts_temp_lenght * 1000))
-        os.remove(filename)
+        audio_output.play_encoded(mp3.getvalue(), channel="speech").wait()
     except Exception as e:
         print(f"Ошибка при синтезе речи с помощью gTTS: {e}")
 
+def play_activate_sound():
+    audio_output.play_file(WAITING_SOUND, channel="cue")
+
 def speak_silero(text):
     try:
-        out = pa.open(format=pyaudio.paInt16, channels=1, rate=silero_sample_rate, output=True)
-        for sent in sentence_chunks(text):
-            audio = silero_model.apply_tts(text=sent,
-                                           speaker=silero_speaker,
-                                           sample_rate=silero_sample_rate)
-            audio_np = audio.numpy() * 32767
-            audio_bytes = audio_np.astype(np.int16).tobytes()
-            out.write(audio_bytes)
-        out.stop_stream()
-        out.close()
+        job = tts_pipeline.speak(sentence_chunks(text), wait=False)
+        barge_position = wait_for_playback(job)
+        if job.time_to_first_audio_ms is not None:
+            print(f"TTS: первый звук через {job.time_to_first_audio_ms:.0f} мс, фрагментов: {job.chunks}.")
+        return barge_position
     except Exception as e:
         print(f"Ошибка при синтезе Silero: {e}")
+    return None
 
-def listen_with_vad_whisper(audio_stream, model, activation_timeout=None):
+def wait_for_playback(job):
+    """
+    Ждёт конца озвучки. С BARGE_IN слушает микрофон с первого звука задания и, если пользователь
+    заговорил поверх TTS, прерывает воспроизведение и возвращает позицию начала его речи в буфере захвата.
+    """
+    if not BARGE_IN:
+        job.done.wait()
+        return None
+    # Пока ответ не зазвучал (LLM ещё генерирует первое предложение), перебивать нечего.
+    while job.first_audio_at is None and not job.done.wait(0.02):
+        if stop_event.is_set():
+            return None
+    vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+    detector = BargeInDetector(echo_reference, frame_ms=VAD_FRAME_MS)
+    pre_buffer_samples = int(INPUT_SAMPLE_RATE * (VAD_PRE_BUFFER_MS / 1000.0))
+    barge_reader.seek_latest()
+    while not job.done.is_set() and not stop_event.is_set():
+        frame = barge_reader.read(VAD_CHUNK_SIZE, timeout=0.1)
+        if frame is None:
+            if capture.finished.is_set():
+                job.done.wait()
+                return None
+            continue
+        is_speech = vad.is_speech(frame.view(np.uint8), INPUT_SAMPLE_RATE)
+        if detector.process(frame, is_speech):
+            stop_ms = tts_pipeline.interrupt()
+            print(f"Barge-in: речь подтверждена через {detector.detection_ms:.0f} мс, "
+                  f"озвучка остановлена через {stop_ms:.0f} мс (эхо-кадров отброшено: {detector.echo_frames}).")
+            return max(0, barge_reader.position - detector.speech_samples(INPUT_SAMPLE_RATE) - pre_buffer_samples)
+    return None
+
+async def run_agent_turn(messages, first_response, tts_stream, barge_task):
+    """
+    Запрос к агенту; возвращает (сообщения графа, None). Если пользователь перебил озвучку, пока агент ещё
+    работает (генерирует ответ или вызывает инструменты), запрос отменяется и возвращается
+    (None, позиция начала речи пользователя) — команду можно слушать сразу.
+    """
+    agent_task = asyncio.ensure_future(request_to_agent_async(
+        messages,
+        first_response=first_response,
+        on_text=tts_stream.on_text if tts_stream else None,
+        cancel_event=stop_event
+    ))
+    if barge_task is not None:
+        await asyncio.wait({agent_task, barge_task}, return_when=asyncio.FIRST_COMPLETED)
+        if not agent_task.done() and barge_task.result() is not None:
+            agent_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await agent_task
+            return None, barge_task.result()
+    return await agent_task, None
+
+def show_streamed_response(text):
+    gui_queue.put({'type': 'status', 'text': 'Говорю...'})
+    gui_queue.put({'type': 'agent_response_chunk', 'text': text})
+
+def listen_with_vad_whisper(reader, model, activation_timeout=None, start_position=None, on_stable_partial=None,
+                            context="wake", on_endpoint=None):
     if activation_timeout:
         print(f"Ожидание команды ({activation_timeout} сек)...")
     else:
         print("Слушаю команду (faster-whisper)...")
 
     vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
-    frames_per_second = int(INPUT_SAMPLE_RATE / VAD_CHUNK_SIZE)
-    silence_frames_needed = int(frames_per_second * (VAD_SILENCE_TIMEOUT_MS / 1000.0))
-    pre_buffer_size = int(frames_per_second * (VAD_PRE_BUFFER_MS / 1000.0))
-    pre_buffer = deque(maxlen=pre_buffer_size)
-    speech_frames = []
-    is_speaking = False
-    silent_frames_count = 0
+    endpoint = EndpointDetector(
+        frame_ms=VAD_FRAME_MS,
+        short_silence_ms=ENDPOINT_SHORT_SILENCE_MS,
+        default_silence_ms=ENDPOINT_DEFAULT_SILENCE_MS,
+        max_silence_ms=VAD_SILENCE_TIMEOUT_MS,
+        trailing_pad_ms=ENDPOINT_TRAILING_PAD_MS
+    )
+    pre_buffer_samples = int(INPUT_SAMPLE_RATE * (VAD_PRE_BUFFER_MS / 1000.0))
+    speech_start = None
+    last_speech_pos = None
     start_time = time.time()
+    transcriber = None
+    last_speculated = None
 
-    audio_stream.stop_stream()
-    audio_stream.start_stream()
+    # Вместо stop_stream()/start_stream(): продолжаем с места, где остановился wake word,
+    # либо (для follow-up) с текущего момента, чтобы не слушать собственный TTS.
+    if start_position is None:
+        reader.seek_latest()
+    else:
+        reader.seek(start_position)
+    listen_start = reader.position
+    if noise_gate is not None:
+        noise_gate.reset()
 
     while not stop_event.is_set():
-        try:
-            if not is_speaking and activation_timeout and (time.time() - start_time > activation_timeout):
-                print("Таймаут ожидания речи.")
-                return "время вышло"
-
-            chunk = audio_stream.read(VAD_CHUNK_SIZE, exception_on_overflow=False)
-            if len(chunk) < VAD_CHUNK_SIZE * 2: continue
-
-            is_speech = vad.is_speech(chunk, INPUT_SAMPLE_RATE)
-
-            if is_speech:
-                if not is_speaking:
-                    print("Обнаружена речь...")
-                    gui_queue.put({'type': 'status', 'text': 'Говорите...'}) 
-                    is_speaking = True
-                    speech_frames.extend(list(pre_buffer))
-                speech_frames.append(chunk)
-                silent_frames_count = 0
-            else:
-                if not is_speaking:
-                    pre_buffer.append(chunk)
-                else:
-                    speech_frames.append(chunk)
-                    silent_frames_count += 1
-                    if silent_frames_count > silence_frames_needed:
-                        print("Конец фразы (таймаут по тишине).")
-                        break
-        except IOError as e:
-            print(f"Ошибка чтения потока: {e}")
+        if speech_start is None and activation_timeout and (time.time() - start_time > activation_timeout):
+            print("Таймаут ожидания речи.")
+            return "время вышло"
+
+        # С шумовым гейтом накопившиеся кадры обрабатываются одним блоком (один rfft на блок).
+        block_frames = 1
+        if noise_gate is not None:
+            block_frames = max(1, min(NOISE_GATE_BLOCK_FRAMES, reader.available() // VAD_CHUNK_SIZE))
+        block = reader.read(VAD_CHUNK_SIZE * block_frames, timeout=CAPTURE_READ_TIMEOUT_SECONDS)
+        if block is None:
+            if capture.finished.is_set():
+                break
+            continue
+        block_end = reader.position
+        gate_mask = noise_gate.process(block) if noise_gate is not None else None
+
+        utterance_done = False
+        for i in range(block_frames):
+            frame = block[i * VAD_CHUNK_SIZE:(i + 1) * VAD_CHUNK_SIZE]
+            frame_end = block_end - (block_frames - 1 - i) * VAD_CHUNK_SIZE
+            is_speech = vad.is_speech(frame.view(np.uint8), INPUT_SAMPLE_RATE)
+            if gate_mask is not None:
+                noise_gate.count_rejection(is_speech, gate_mask[i])
+                is_speech = is_speech and gate_mask[i]
+            utterance_done = endpoint.process(is_speech, frame)
+
+            if endpoint.in_speech and speech_start is None:
+                print("Обнаружена речь...")
+                gui_queue.put({'type': 'status', 'text': 'Говорите...'}) 
+                speech_start = max(listen_start, frame_end - VAD_CHUNK_SIZE - pre_buffer_samples)
+                if ASR_STREAMING:
+                    transcriber = StreamingTranscriber(model, capture.view, sample_rate=INPUT_SAMPLE_RATE,
+                                                       transcribe_kwargs=profile_kwargs("partial"))
+                    transcriber.start(speech_start)
+            if endpoint.in_speech and endpoint.silent_frames == 0:
+                last_speech_pos = frame_end
+
+            if transcriber is not None:
+                transcriber.update(frame_end)
+                if endpoint.silent_frames == 1:
+                    transcriber.request_decode()
+                # Частичная гипотеза годится для решения, только если покрывает всю речь до паузы.
+                endpoint.set_partial(transcriber.partial_text if transcriber.decoded_end >= last_speech_pos else None)
+                # В паузе свежая законченная гипотеза — повод заранее отправить запрос агенту.
+                stable = endpoint.partial_text
+                if (on_stable_partial and endpoint.silent_frames and stable
+                        and stable != last_speculated and utterance_looks_complete(stable)):
+                    last_speculated = stable
+                    on_stable_partial(stable)
+
+            if utterance_done:
+                # Остаток блока после конца фразы не наш: его дочитает следующий слушатель.
+                reader.seek(frame_end)
+                break
+
+        if utterance_done:
+            # Позиция последнего речевого кадра — для замеров задержки от конца речи.
+            if on_endpoint is not None:
+                on_endpoint(last_speech_pos)
+            report = endpoint.report()
+            print(f"Конец фразы: пауза {report['endpoint_delay_ms']} мс "
+                  f"(порог {report['timeout_ms']} мс, {report['reason']}).")
             break
+    # Хвостовую тишину в Whisper не отправляем.
+    speech_end = reader.position - endpoint.trailing_trim_samples(INPUT_SAMPLE_RATE)
     
-    if stop_event.is_set(): return "ошибка"
+    if stop_event.is_set():
+        if transcriber is not None:
+            transcriber.finish(speech_end)
+        return "ошибка"
 
-    if not speech_frames or not is_speaking:
+    if speech_start is None:
         return "время вышло"
 
-    print("Обработка запроса моделью faster-whisper...")
+    profile = choose_profile((speech_end - speech_start) / INPUT_SAMPLE_RATE, context)
+    print(f"Обработка запроса моделью faster-whisper (профиль '{profile}')...")
     gui_queue.put({'type': 'status', 'text': 'Анализ речи...'}) 
-    audio_data = b''.join(speech_frames)
-    audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
-    
-    segments, _ = model.transcribe(audio_np, language="ru")
-    command = "".join([segment.text for segment in segments]).strip()
+    if transcriber is not None:
+        command = transcriber.finish(speech_end, profile_kwargs(profile))
+        print(f"Потоковая расшифровка: хвост {transcriber.last_tail_seconds:.2f} с, "
+              f"{transcriber.last_finish_ms:.0f} мс после конца речи, декодирований: {transcriber.decodes}.")
+    else:
+        audio_np = int16_to_float(capture.view(speech_start, speech_end))
+        segments, _ = model.transcribe(audio_np, language="ru", **profile_kwargs(profile))
+        command = "".join([segment.text for segment in segments]).strip()
     
     return command if command else "время вышло"
 
-def listen_with_vosk(audio_stream, recognizer):
+def listen_with_vosk(reader, recognizer, start_position=None):
     print("Слушаю команду (Vosk)...")
     recognizer.Reset()
+    if start_position is None:
+        reader.seek_latest()
+    else:
+        reader.seek(start_position)
     while not stop_event.is_set():
         try:
-            data = audio_stream.read(4096, exception_on_overflow=False)
+            data = reader.read_bytes(WAKE_CHUNK_SIZE, timeout=CAPTURE_READ_TIMEOUT_SECONDS)
+            if data is None:
+                if capture.finished.is_set():
+                    break
+                continue
             if recognizer.AcceptWaveform(data):
                 result_json = recognizer.FinalResult()
                 result_dict = json.loads(result_json)
@@ -234,74 +417,63 @@ def listen_with_vosk(audio_stream, recognizer):
             break
     return "время вышло"
 
-def listen_for_command(audio_stream, play_sound=True, activation_timeout=None):
+def listen_for_command(play_sound=True, activation_timeout=None, start_position=None, on_stable_partial=None,
+                       context="wake"):
     if play_sound:
-        activate_sound.play()
+        play_activate_sound()
     if ASR_ENGINE == 'whisper':
-        return listen_with_vad_whisper(audio_stream, whisper_model, activation_timeout=activation_timeout)
+        with models.use("whisper") as whisper:
+            return listen_with_vad_whisper(vad_reader, whisper, activation_timeout=activation_timeout,
+                                           start_position=start_position, on_stable_partial=on_stable_partial,
+                                           context=context)
     elif ASR_ENGINE == 'vosk':
-        vosk_command_recognizer = vosk.KaldiRecognizer(vosk_model, INPUT_SAMPLE_RATE)
-        return listen_with_vosk(audio_stream, vosk_command_recognizer)
+        from vosk import KaldiRecognizer
+        vosk_command_recognizer = KaldiRecognizer(models.get("vosk"), INPUT_SAMPLE_RATE)
+        return listen_with_vosk(asr_reader, vosk_command_recognizer, start_position=start_position)
     else:
         print(f"Ошибка: Неизвестный движок распознавания '{ASR_ENGINE}'")
         return "ошибка"
 
-def wait_for_wake_word(audio_stream):
-    recognizer = vosk.KaldiRecognizer(vosk_model, INPUT_SAMPLE_RATE)
+def keyword_lag_ms(result, word, stream_start, reader):
+    # Сколько звука прошло после конца ключевого слова к моменту срабатывания (время Vosk — от создания распознавателя).
+    for item in reversed(result.get("partial_result") or result.get("result") or []):
+        if item.get("word") == word:
+            heard_until = (reader.position - stream_start) / INPUT_SAMPLE_RATE
+            return max(0.0, (heard_until - item["end"]) * 1000)
+    return None
+
+def wait_for_wake_word(reader):
+    from vosk import KaldiRecognizer
+    if VOSK_KEYWORD_GRAMMAR:
+        recognizer = KaldiRecognizer(models.get("vosk"), INPUT_SAMPLE_RATE, quick_commands.grammar())
+    else:
+        recognizer = KaldiRecognizer(models.get("vosk"), INPUT_SAMPLE_RATE)
     recognizer.SetWords(True)
-    
-    print(f"\nОжидание команд ({WAKE_WORD}, {SOUND_PLUS_WORD}, {SOUND_MINUS_WORD}, {PAUSE_WORD}, {PLAY_WORD})...")
+    recognizer.SetPartialWords(True)
+    quick_commands.reset()
+    stream_start = reader.position
+
+    print(f"\nОжидание команд ({', '.join(quick_commands.keywords)})...")
 
     while not stop_event.is_set():
         try:
-            data = audio_stream.read(4096, exception_on_overflow=False)
-            if recognizer.AcceptWaveform(data):
-                result_json = recognizer.Result()
-                result_dict = json.loads(result_json)
-                text = result_dict.get("text", "")
-
-                if SOUND_MINUS_WORD in text:
-                    print(f"Быстрая команда: '{SOUND_MINUS_WORD}'. Уменьшаю громкость.")
-                    sound_minus()
-                    continue
-
-                if SOUND_PLUS_WORD in text:
-                    print(f"Быстрая команда: '{SOUND_PLUS_WORD}'. Увеличиваю громкость.")
-                    sound_plus()
-                    continue
-
-                if PAUSE_WORD in text:
-                    print(f"Быстрая команда: '{PAUSE_WORD}'. Ставлю на паузу.")
-                    play_pause()
-                    continue
-
-                if PLAY_WORD in text:
-                    print(f"Быстрая команда: '{PLAY_WORD}'. Продолжаю воспроизведение.")
-                    play_pause()
-                    continue
-
-                if NEXT_WORD in text:
-                    print(f"Быстрая команда: '{NEXT_WORD}'. Следующий медия.")
-                    next_media()
-                    continue
-                        
-                if BACK_WORD in text:
-                    print(f"Быстрая команда: '{BACK_WORD}'. Предыдущая медия.")
-                    back_media()
-                    continue
-
-                if UP_WORD in text:
-                    print(f"Быстрая команда: '{UP_WORD}'. Вверх.")
-                    up()
-
-                if DOWN_WORD in text:
-                    print(f"Быстрая команда: '{UP_WORD}'. Вниз")
-                    down()
-
-                if WAKE_WORD in text:
-                    print(f"▶️ Кодовое слово '{WAKE_WORD}' обнаружено!")
-                    command_part = text.split(WAKE_WORD, 1)[-1].strip()
-                    return command_part
+            data = reader.read_bytes(WAKE_CHUNK_SIZE, timeout=CAPTURE_READ_TIMEOUT_SECONDS)
+            if data is None:
+                if capture.finished.is_set():
+                    break
+                continue
+            final = recognizer.AcceptWaveform(data)
+            result = json.loads(recognizer.Result() if final else recognizer.PartialResult())
+            text = result.get("text", "") if final else result.get("partial", "")
+            for word in quick_commands.match(text, final=final):
+                lag_ms = keyword_lag_ms(result, word, stream_start, reader)
+                lag = f" (через {lag_ms:.0f} мс после слова)" if lag_ms is not None else ""
+                if word == WAKE_WORD:
+                    print(f"▶️ Кодовое слово '{WAKE_WORD}' обнаружено{lag}!")
+                    # Команду после кодового слова дослушивает listen_for_command с текущей позиции.
+                    return ""
+                print(f"Быстрая команда: '{word}'. {QUICK_COMMAND_MESSAGES[word]}{lag}")
+                quick_commands.dispatch(word)
 
         except IOError as e:
             print(f"Ошибка чтения потока в wait_for_wake_word: {e}")
@@ -310,20 +482,25 @@ def wait_for_wake_word(audio_stream):
     return None
 
 async def voice_assistant_logic():
-    global chat_history
-    stream.start_stream()
+    await asyncio.to_thread(models.get, "vosk")
+    capture.start()
+    startup.mark("wake word")
+    dispatcher = None
+    on_stable_partial = None
+    if SPECULATIVE_DISPATCH and ASR_ENGINE == 'whisper' and ASR_STREAMING:
+        dispatcher = SpeculativeDispatcher(asyncio.get_running_loop(), prefetch_agent_response)
+        on_stable_partial = lambda text: dispatcher.submit_partial(text, conversation.messages())
     print(f"\n✅ Система активирована. Движок ASR: {ASR_ENGINE.upper()}. Движок TTS: {TTS_ENGINE.upper()}.")
     try:
         while not stop_event.is_set():
             gui_queue.put({'type': 'status', 'text': f'Ожидание "{WAKE_WORD}"...', 'clear_main': True})
-            command = await asyncio.to_thread(wait_for_wake_word, stream)
-            if stop_event.is_set(): break
+            command = await asyncio.to_thread(wait_for_wake_word, wake_reader)
+            if stop_event.is_set() or command is None: break
 
-            if not command:
-                gui_queue.put({'type': 'status', 'text': 'Слушаю команду...'}) 
-                command = await asyncio.to_thread(listen_for_command, stream)
-            else:
-                activate_sound.play()
+            # Сигнал активации звучит внутри listen_for_command.
+            gui_queue.put({'type': 'status', 'text': 'Слушаю команду...'}) 
+            command = await asyncio.to_thread(listen_for_command, start_position=wake_reader.position,
+                                              on_stable_partial=on_stable_partial)
 
             while command and "время вышло" not in command and "ошибка" not in command:
                 if stop_event.is_set(): break
@@ -331,15 +508,29 @@ async def voice_assistant_logic():
                 gui_queue.put({'type': 'status', 'text': '', 'clear_main': True})
                 
                 print(f"Выполнение запроса: '{command}'")
-                chat_history.append(HumanMessage(content=command))
+                conversation.add_user(command)
                 gui_queue.put({'type': 'status', 'text': 'Думаю...'}) 
+                first_response = await dispatcher.resolve(command) if dispatcher else None
                 response_history = None
+                tts_stream = None
+                barge_task = None
+                interrupted_at = None
                 for attempt in range(MAX_RETRIES):
                     if stop_event.is_set(): break
+                    if STREAM_LLM_TO_TTS and tts_pipeline is not None:
+                        tts_stream = TTSStream(tts_pipeline, on_sentence=show_streamed_response)
+                        # Barge-in слушается с первого звука ответа, пока LLM ещё генерирует продолжение.
+                        barge_task = asyncio.ensure_future(asyncio.to_thread(wait_for_playback, tts_stream.job))
                     try:
-                        response_history = await request_to_agent_async(chat_history)
+                        response_history, interrupted_at = await run_agent_turn(
+                            conversation.messages(), first_response, tts_stream, barge_task)
                         break
                     except BadRequestError as e:
+                        first_response = None
+                        if tts_stream:
+                            tts_stream.abort()
+                            tts_stream = None
+                            await barge_task
                         print(f"Ошибка (попытка {attempt + 1}/{MAX_RETRIES}): {e}")
                         if attempt < MAX_RETRIES - 1:
                             await asyncio.sleep(RETRY_DELAY_SECONDS)
@@ -349,52 +540,182 @@ async def voice_assistant_logic():
                     except Exception as e:
                         print(f"Непредвиденная ошибка: {e}")
                         response_history = None
+                        if tts_stream:
+                            tts_stream.abort()
+                            tts_stream = None
+                            await barge_task
                         break
                 
                 if stop_event.is_set(): break
 
-                if response_history:
-                    chat_history = response_history
-                    response_text = response_history[-1].content
-                    if isinstance(response_text, list):
-                        response_text = response_text[0]["text"]
+                barge_position = None
+                if interrupted_at is not None:
+                    # Пользователь перебил ответ, пока агент ещё работал: в историю идёт то, что успело прозвучать.
+                    tts_stream.abort()
+                    if tts_stream.text:
+                        from langchain_core.messages import AIMessage
+                        conversation.add_agent_result([AIMessage(content=tts_stream.text)])
+                    print(f"Запрос к агенту отменён перебиванием, прозвучало: {tts_stream.text!r}")
+                    barge_position = interrupted_at
                 else:
-                    response_text = "Произошла ошибка при обработке запроса."
-
-                if response_text:
-                    gui_queue.put({'type': 'status', 'text': 'Говорю...'}) 
-                    print(f"Ответ агента: {response_text}")
+                    if response_history:
+                        conversation.add_agent_result(response_history)
+                        print(f"Токены запроса: {conversation.last_request_usage}")
+                        response_text = response_history[-1].content
+                        if isinstance(response_text, list):
+                            response_text = response_text[0]["text"]
+                    else:
+                        response_text = "Произошла ошибка при обработке запроса."
+
+                    if response_history and tts_stream and tts_stream.text:
+                        # Ответ уже озвучивается по мере генерации, дожидаемся конца воспроизведения или перебивания.
+                        print(f"Ответ агента: {response_text}")
+                        job = tts_stream.finish()
+                        barge_position = await barge_task
+                        if job.time_to_first_audio_ms is not None:
+                            print(f"TTS (поток LLM): первый звук через {job.time_to_first_audio_ms:.0f} мс от запроса.")
+                    elif response_text:
+                        if tts_stream:
+                            tts_stream.abort()
+                            await barge_task
+                        gui_queue.put({'type': 'status', 'text': 'Говорю...'}) 
+                        print(f"Ответ агента: {response_text}")
                     
-                    if TTS_ENGINE == 'gtts':
-                        await asyncio.to_thread(speak_gtts, response_text)
-                    elif TTS_ENGINE == 'silero':
-                        await asyncio.to_thread(speak_silero, response_text)
-                else:
-                    print("Агент вернул пустой ответ.")
+                        if TTS_ENGINE == 'gtts':
+                            await asyncio.to_thread(speak_gtts, response_text)
+                        elif TTS_ENGINE == 'silero':
+                            barge_position = await asyncio.to_thread(speak_silero, response_text)
+                    else:
+                        if tts_stream:
+                            tts_stream.abort()
+                            await barge_task
+                        print("Агент вернул пустой ответ.")
                 
-                activate_sound.play()
-                gui_queue.put({'type': 'status', 'text': 'Слушаю продолжение...'}) 
-                command = await asyncio.to_thread(listen_for_command, stream, play_sound=False, activation_timeout=FOLLOW_UP_TIMEOUT_SECONDS)
+                if barge_position is not None:
+                    # Пользователь перебил ответ: сразу слушаем его команду с начала речи.
+                    gui_queue.put({'type': 'status', 'text': 'Слушаю команду...', 'clear_main': True})
+                    command = await asyncio.to_thread(listen_for_command, play_sound=False,
+                                                      start_position=barge_position,
+                                                      on_stable_partial=on_stable_partial)
+                    continue
 
+                gui_queue.put({'type': 'status', 'text': 'Слушаю продолжение...'}) 
+                command = await asyncio.to_thread(listen_for_command, activation_timeout=FOLLOW_UP_TIMEOUT_SECONDS,
+                                                  on_stable_partial=on_stable_partial, context="follow_up")
+
+            if dispatcher:
+                dispatcher.cancel()
+                print(f"Спекулятивные запросы: {dispatcher.stats()}")
+            if noise_gate is not None:
+                print(f"Шумовой гейт: {noise_gate.stats()}")
+
+            # Wake word продолжает ровно с того места, где закончил слушатель команды.
+            command_reader = vad_reader if ASR_ENGINE == 'whisper' else asr_reader
+            wake_reader.seek(max(wake_reader.position, command_reader.position))
             print(f"\n🔁 Снова жду кодовое слово '{WAKE_WORD}'...")
     except Exception as e:
         print(f"Критическая ошибка в потоке ассистента: {e}")
     finally:
         print("Поток ассистента завершает работу.")
-        if stream.is_active():
-            stream.stop_stream()
-            stream.close()
+        conversation.close()
+        print(f"История диалога: {conversation.usage()}")
+        capture.stop()
+        print(f"Статистика захвата звука: {capture.stats()}")
+        if tts_pipeline is not None:
+            tts_pipeline.close()
+        audio_output.close()
+        print(f"Вывод звука: {audio_output.stats()}")
+        if tts_cache is not None:
+            tts_cache.flush()
+            print(f"Кэш TTS: {tts_cache.stats()}")
+        if MODEL_IDLE_UNLOAD_SECONDS:
+            print(f"Память моделей: {models.memory_report()}")
+        if ASR_WORKER_PROCESS and models.is_ready("whisper"):
+            try:
+                models.get("whisper").close()
+            except Exception as e:
+                print(f"Ошибка остановки процесса ASR: {e}")
+        models.shutdown()
         pa.terminate()
 
 def shutdown_app():
     stop_event.set()
 
-assistant_thread = threading.Thread(target=lambda: asyncio.run(voice_assistant_logic()), daemon=True)
-assistant_thread.start()
+# Всё, что открывает устройства, грузит модели и тянет стек агента, выполняется только при запуске main.py:
+# дочерние процессы multiprocessing (spawn) импортируют этот модуль заново, и процессу ASR
+# не нужны ни langgraph с langchain, ни журнал агента, ни история диалога.
+if __name__ == "__main__":
+    if not os.path.exists(MODEL_FOLDER_NAME):
+        print(f"Ошибка: Папка с моделью Vosk '{MODEL_FOLDER_NAME}' не найдена.")
+        exit()
 
-app = SubtitleOverlay(gui_queue=gui_queue, stop_event_callback=shutdown_app)
-app.mainloop()
+    if TTS_ENGINE not in ('gtts', 'silero'):
+        print(f"Ошибка: Неизвестный движок TTS '{TTS_ENGINE}'.")
+        exit()
+
+    with startup.measure("openai"):
+        from openai import BadRequestError
+    with startup.measure("agent"):
+        from agent.agent import request_to_agent_async, prefetch_agent_response, new_conversation
+        from agent.speculative import SpeculativeDispatcher
+    from gui.overlay import SubtitleOverlay
+
+    conversation = new_conversation(token_budget=AGENT_MEMORY_TOKEN_BUDGET or None,
+                                      keep_recent_turns=AGENT_MEMORY_KEEP_RECENT_TURNS)
+    quick_commands = KeywordSpotter({word: action for word, _, action in QUICK_COMMANDS}, wake_word=WAKE_WORD)
+    echo_reference = EchoReference()
+    noise_gate = SpectralNoiseGate(sample_rate=INPUT_SAMPLE_RATE, frame_size=VAD_CHUNK_SIZE) if NOISE_GATE else None
+
+    # Модели грузятся параллельно; Vosk нужен первым (wake word), остальные ожидаются при первом использовании.
+    models = ModelLoader(startup, idle_unload_seconds=MODEL_IDLE_UNLOAD_SECONDS or None)
+    models.submit("vosk", load_vosk, pinned=True)
+    if TTS_ENGINE == 'silero':
+        models.submit("silero", load_silero)
+    else:
+        print("Движок TTS (gTTS) готов к работе.")
+    if ASR_ENGINE == 'whisper':
+        models.submit("whisper", load_whisper, unload_fn=(lambda worker: worker.close()) if ASR_WORKER_PROCESS else None)
 
-print("Основной поток: ожидание завершения рабочего потока...")
-assistant_thread.join(timeout=2)
-print("Программа полностью завершена.")
\ No newline at end of file
+    threading.Thread(target=print_startup_report, name="startup-report", daemon=True).start()
+
+    pa = pyaudio.PyAudio()
+    if AUDIO_INPUT_FILES:
+        print(f"Источник звука: файлы {AUDIO_INPUT_FILES}")
+        capture_source = FileSource(AUDIO_INPUT_FILES, sample_rate=INPUT_SAMPLE_RATE, chunk_size=VAD_CHUNK_SIZE)
+    else:
+        capture_source = MicrophoneSource(pa, INPUT_SAMPLE_RATE, VAD_CHUNK_SIZE, INPUT_FORMAT, INPUT_CHANNELS)
+    capture = AudioCapture(capture_source, sample_rate=INPUT_SAMPLE_RATE, buffer_seconds=CAPTURE_BUFFER_SECONDS)
+    if AUDIO_OUTPUT_NULL:
+        output_sink = NullSink(AUDIO_OUTPUT_SAMPLE_RATE)
+    else:
+        output_sink = PyAudioSink(pa, AUDIO_OUTPUT_SAMPLE_RATE, AUDIO_OUTPUT_SAMPLE_RATE * AUDIO_OUTPUT_BLOCK_MS // 1000)
+    # Один поток вывода на всё приложение: сигналы, TTS и фразы из кэша микшируются в нём.
+    audio_output = AudioOutput(output_sink, on_playback=echo_reference.push if BARGE_IN else None).start()
+    audio_output.load(WAITING_SOUND)
+    wake_reader = capture.reader("wake")
+    vad_reader = capture.reader("vad")
+    asr_reader = capture.reader("asr")
+    barge_reader = capture.reader("barge")
+
+    tts_cache = TTSCache() if TTS_CACHE_ENABLED else None
+
+    tts_pipeline = None
+    if TTS_ENGINE == 'silero':
+        if tts_cache is not None:
+            threading.Thread(
+                target=tts_cache.prewarm,
+                args=(TTS_PREWARM_PHRASES, silero_speaker, silero_sample_rate, 'silero', synthesize_silero_uncached),
+                name="tts-cache-prewarm",
+                daemon=True
+            ).start()
+        tts_pipeline = TTSPipeline(synthesize_silero, audio_output, sample_rate=silero_sample_rate)
+
+    assistant_thread = threading.Thread(target=lambda: asyncio.run(voice_assistant_logic()), daemon=True)
+    assistant_thread.start()
+
+    app = SubtitleOverlay(gui_queue=gui_queue, stop_event_callback=shutdown_app)
+    app.mainloop()
+
+    print("Основной поток: ожидание завершения рабочего потока...")
+    assistant_thread.join(timeout=2)
+    print("Программа полностью завершена.")
\ No newline at end of file
@@ -1,3 +1,125 @@
-from agent.agent import request_to_agent_sync
+"""
+Серверный режим: записанные голосовые команды (например, с телефона) проходят через тот же ASR и агента.
 
-print(request_to_agent_sync(["Создай на диске S папку с названием Test_Jarvis, в нём сделай виртуальное окрудение python с глобальной вресией python, также добавь там какой нибудь gitignore базовый"]))
\ No newline at end of file
+    POST /transcribe   тело — MP3/WAV; ответ {"text": ...}
+    POST /command      тело — MP3/WAV; расшифровка отправляется агенту, ответ {"text": ..., "response": ...}
+    POST /batch        тело — JSON {"audio": [MP3/WAV в base64]} или, если задан --batch-dir,
+                       {"files": [имена файлов внутри --batch-dir]}; ответ {"texts": [...]} в том же порядке
+
+Одновременные запросы собираются в пакеты BatchTranscriber.
+
+Агент управляет компьютером (в том числе выполняет команды оболочки), поэтому каждый запрос должен нести
+заголовок "Authorization: Bearer <токен>". Токен задаётся --token или переменной ASR_SERVER_TOKEN; если
+не задан, генерируется при запуске и печатается. По умолчанию сервер слушает только localhost.
+
+    python server.py --port 8000 --model small
+"""
+import argparse
+import base64
+import hmac
+import json
+import os
+import secrets
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.batch_asr import BatchTranscriber, BATCH_ASR_BATCH_SIZE
+
+SERVER_MAX_BODY_BYTES = 50 * 1024 * 1024
+
+
+def resolve_batch_file(batch_dir, name):
+    """Путь к файлу внутри batch_dir; выход за его пределы (.., абсолютные пути, ссылки) запрещён."""
+    root = os.path.realpath(batch_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        raise PermissionError(f"файл вне каталога пакетной расшифровки: {name}")
+    return path
+
+
+def make_handler(transcriber, token, batch_dir=None):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self._authorized():
+                self._send_json({"error": "unauthorized"}, status=401)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            if length > SERVER_MAX_BODY_BYTES:
+                self._send_json({"error": "request too large"}, status=413)
+                return
+            body = self.rfile.read(length)
+            try:
+                if self.path == "/transcribe":
+                    self._send_json({"text": transcriber.submit(body).result()})
+                elif self.path == "/command":
+                    from langchain_core.messages import HumanMessage
+                    from agent.agent import request_to_agent_sync
+                    text = transcriber.submit(body).result()
+                    response = request_to_agent_sync([HumanMessage(content=text)]) if text else None
+                    self._send_json({"text": text, "response": response})
+                elif self.path == "/batch":
+                    self._send_json({"texts": transcriber.transcribe_many(self._batch_items(body))})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+            except PermissionError as e:
+                self._send_json({"error": str(e)}, status=403)
+            except Exception as e:
+                self._send_json({"error": str(e)}, status=500)
+
+        def _authorized(self):
+            header = self.headers.get("Authorization", "")
+            scheme, _, value = header.partition(" ")
+            return scheme.lower() == "bearer" and hmac.compare_digest(value.strip().encode(), token.encode())
+
+        def _batch_items(self, body):
+            request = json.loads(body or b"{}")
+            items = [base64.b64decode(audio) for audio in request.get("audio", [])]
+            files = request.get("files", [])
+            if files and batch_dir is None:
+                raise PermissionError("пути к файлам принимаются только с --batch-dir")
+            return items + [resolve_batch_file(batch_dir, name) for name in files]
+
+        def _send_json(self, payload, status=200):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--batch-size", type=int, default=BATCH_ASR_BATCH_SIZE)
+    parser.add_argument("--token", default=os.getenv("ASR_SERVER_TOKEN"), help="Токен для заголовка Authorization")
+    parser.add_argument("--batch-dir", default=None, help="Каталог, из которого /batch может читать файлы по имени")
+    args = parser.parse_args()
+
+    token = args.token or secrets.token_urlsafe(24)
+    if not args.token:
+        print(f"Токен доступа (Authorization: Bearer ...): {token}")
+    if args.host not in ("127.0.0.1", "localhost", "::1"):
+        print(f"Внимание: сервер доступен извне ({args.host}); запросы принимаются только с токеном.")
+
+    from faster_whisper import WhisperModel
+    model = WhisperModel(args.model, device=args.device, compute_type=args.compute_type)
+    transcriber = BatchTranscriber(model, batch_size=args.batch_size)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(transcriber, token, args.batch_dir))
+    print(f"Сервер распознавания: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        transcriber.close()
+
+
+if __name__ == "__main__":
+    main()
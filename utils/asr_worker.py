@@ -0,0 +1,206 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+
+import numpy as np
+
+ASR_WORKER_MAX_SECONDS = 60
+ASR_WORKER_START_TIMEOUT_SECONDS = 120
+ASR_WORKER_WARMUP_SECONDS = 1.0
+
+_STOP = None
+
+
+def _set_affinity(cpus):
+    if not cpus:
+        return
+    try:
+        import psutil
+        psutil.Process().cpu_affinity(list(cpus))
+    except ImportError:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, set(cpus))
+    except Exception as e:
+        print(f"Не удалось закрепить процесс ASR за ядрами {cpus}: {e}")
+
+
+def _pack_segments(segments, word_timestamps):
+    packed = []
+    for segment in segments:
+        words = None
+        if word_timestamps and segment.words:
+            words = [(w.word, w.start, w.end) for w in segment.words]
+        packed.append((segment.text, segment.start, segment.end, words))
+    return packed
+
+
+def _unpack_segments(packed):
+    segments = []
+    for text, start, end, words in packed:
+        if words is not None:
+            words = [SimpleNamespace(word=w, start=ws, end=we) for w, ws, we in words]
+        segments.append(SimpleNamespace(text=text, start=start, end=end, words=words))
+    return segments
+
+
+def _worker_main(model_name, device, compute_type, cpu_threads, num_workers, affinity,
+                 shm_name, max_samples, requests, results):
+    _set_affinity(affinity)
+    from faster_whisper import WhisperModel
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buffer = np.ndarray((max_samples,), dtype=np.float32, buffer=shm.buf)
+        started = time.perf_counter()
+        model = WhisperModel(model_name, device=device, compute_type=compute_type,
+                             cpu_threads=cpu_threads, num_workers=num_workers)
+        load_ms = (time.perf_counter() - started) * 1000
+        # Прогрев: первый вызов transcribe заметно медленнее последующих.
+        warmup = np.zeros(int(16000 * ASR_WORKER_WARMUP_SECONDS), dtype=np.float32)
+        list(model.transcribe(warmup, language="ru", beam_size=1)[0])
+        results.put(("ready", {"load_ms": load_ms, "pid": os.getpid()}))
+
+        while True:
+            request = requests.get()
+            if request is _STOP:
+                break
+            request_id, length, kwargs, request_shm = request
+            if request_shm is not None:
+                # Родитель вырос под длинную фразу: переключаемся на новый буфер.
+                new_name, new_samples = request_shm
+                del buffer
+                shm.close()
+                shm = shared_memory.SharedMemory(name=new_name)
+                buffer = np.ndarray((new_samples,), dtype=np.float32, buffer=shm.buf)
+            try:
+                # Копия: родитель может перезаписать буфер следующим запросом только после ответа,
+                # но декодирование не должно зависеть от этого соглашения.
+                audio = buffer[:length].copy()
+                started = time.perf_counter()
+                segments, info = model.transcribe(audio, **kwargs)
+                packed = _pack_segments(segments, kwargs.get("word_timestamps", False))
+                meta = {
+                    "language": info.language,
+                    "language_probability": info.language_probability,
+                    "duration": info.duration,
+                    "decode_ms": (time.perf_counter() - started) * 1000,
+                }
+                results.put((request_id, (packed, meta)))
+            except Exception as e:
+                results.put((request_id, e))
+    except Exception as e:
+        results.put(("ready", e))
+    finally:
+        shm.close()
+
+
+class ASRWorkerProcess:
+    """
+    faster-whisper в отдельном процессе, чтобы декодирование не конкурировало с GIL
+    потоков захвата, VAD и TTS. Аудио передаётся через shared memory без сериализации,
+    расшифровки возвращаются через очередь. Интерфейс transcribe() совместим с WhisperModel
+    в той части, которой пользуется StreamingTranscriber.
+    """
+
+    def __init__(self, model_name, device="cpu", compute_type="int8", cpu_threads=0, num_workers=1,
+                 affinity=None, max_seconds=ASR_WORKER_MAX_SECONDS, sample_rate=16000):
+        self.sample_rate = sample_rate
+        self.max_samples = int(max_seconds * sample_rate)
+        self.requests_done = 0
+        self.last_decode_ms = None
+        self.load_ms = None
+        self.pid = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._shm = shared_memory.SharedMemory(create=True, size=self.max_samples * 4)
+        self._buffer = np.ndarray((self.max_samples,), dtype=np.float32, buffer=self._shm.buf)
+        # spawn и на Linux: fork после запуска потоков захвата и загрузчиков небезопасен.
+        ctx = mp.get_context("spawn")
+        self._requests = ctx.Queue()
+        self._results = ctx.Queue()
+        self._process = ctx.Process(
+            target=_worker_main,
+            args=(model_name, device, compute_type, cpu_threads, num_workers, affinity,
+                  self._shm.name, self.max_samples, self._requests, self._results),
+            name="asr-worker",
+            daemon=True,
+        )
+        self._process.start()
+
+    def wait_ready(self, timeout=ASR_WORKER_START_TIMEOUT_SECONDS):
+        try:
+            tag, payload = self._results.get(timeout=timeout)
+        except queue.Empty:
+            self.close()
+            raise TimeoutError("Процесс ASR не запустился вовремя")
+        if isinstance(payload, Exception):
+            self.close()
+            raise payload
+        self.load_ms = payload["load_ms"]
+        self.pid = payload["pid"]
+        return self
+
+    def transcribe(self, audio, **kwargs):
+        audio = np.asarray(audio, dtype=np.float32)
+        with self._lock:
+            if not self._process.is_alive():
+                raise RuntimeError("Процесс ASR завершился")
+            self._next_id += 1
+            request_id = self._next_id
+            request_shm = self._grow(len(audio)) if len(audio) > self.max_samples else None
+            self._buffer[:len(audio)] = audio
+            self._requests.put((request_id, len(audio), kwargs, request_shm))
+            while True:
+                try:
+                    response_id, payload = self._results.get(timeout=1.0)
+                except queue.Empty:
+                    if not self._process.is_alive():
+                        raise RuntimeError("Процесс ASR завершился во время распознавания")
+                    continue
+                if response_id == request_id:
+                    break
+        if isinstance(payload, Exception):
+            raise payload
+        packed, meta = payload
+        self.requests_done += 1
+        self.last_decode_ms = meta["decode_ms"]
+        info = SimpleNamespace(language=meta["language"], language_probability=meta["language_probability"],
+                               duration=meta["duration"])
+        return iter(_unpack_segments(packed)), info
+
+    def _grow(self, samples):
+        """
+        Заменяет буфер shared memory на больший, чтобы длинная фраза не обрезалась.
+        Старый буфер освобождается сразу: воркер к нему больше не обращается,
+        потому что предыдущий запрос уже получил ответ под self._lock.
+        """
+        max_samples = max(samples, self.max_samples * 2)
+        print(f"Фраза длиннее буфера ASR ({samples / self.sample_rate:.1f} с), "
+              f"буфер увеличен до {max_samples / self.sample_rate:.1f} с")
+        shm = shared_memory.SharedMemory(create=True, size=max_samples * 4)
+        old_shm = self._shm
+        self._buffer = np.ndarray((max_samples,), dtype=np.float32, buffer=shm.buf)
+        self._shm = shm
+        self.max_samples = max_samples
+        old_shm.close()
+        try:
+            old_shm.unlink()
+        except FileNotFoundError:
+            pass
+        return shm.name, max_samples
+
+    def close(self, timeout=2.0):
+        if self._process.is_alive():
+            self._requests.put(_STOP)
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
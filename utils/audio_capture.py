@@ -0,0 +1,272 @@
+import threading
+import time
+import numpy as np
+
+from utils.audio_io import load_audio
+
+
+class RingBuffer:
+    """
+    Кольцевой буфер int16 с зеркальной копией: каждый сэмпл пишется дважды,
+    поэтому любой диапазон длиной до capacity читается одним срезом без копирования.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.write_pos = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self._data = np.zeros(capacity * 2, dtype=np.int16)
+
+    def write(self, samples):
+        cap = self.capacity
+        with self.cond:
+            if len(samples) > cap:
+                self.write_pos += len(samples) - cap
+                samples = samples[-cap:]
+            n = len(samples)
+            start = self.write_pos % cap
+            end = start + n
+            self._data[start:end] = samples
+            if end <= cap:
+                self._data[start + cap:end + cap] = samples
+            else:
+                self._data[start + cap:] = samples[:cap - start]
+                self._data[:end - cap] = samples[cap - start:]
+            self.write_pos += n
+            self.cond.notify_all()
+
+    def view(self, start, end):
+        # Вызывающий должен держать self.cond либо мириться с тем, что очень старые данные перезапишутся.
+        start = max(start, self.write_pos - self.capacity)
+        end = min(end, self.write_pos)
+        if end <= start:
+            return self._data[:0]
+        offset = start % self.capacity
+        return self._data[offset:offset + (end - start)]
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class RingReader:
+    def __init__(self, ring, name, position):
+        self.ring = ring
+        self.name = name
+        self.position = position
+        self.dropped = 0
+
+    def available(self):
+        return self.ring.write_pos - self.position
+
+    def seek(self, position):
+        with self.ring.cond:
+            self.position = max(position, self.ring.write_pos - self.ring.capacity)
+
+    def seek_latest(self):
+        with self.ring.cond:
+            self.position = self.ring.write_pos
+
+    def read(self, n, timeout=None):
+        """Возвращает срез ровно из n сэмплов (view в буфер) или None по таймауту/концу потока."""
+        ring = self.ring
+        with ring.cond:
+            ring.cond.wait_for(lambda: ring.write_pos - self.position >= n or ring.closed, timeout)
+            lag = ring.write_pos - self.position
+            if lag > ring.capacity:
+                self.dropped += lag - ring.capacity
+                self.position = ring.write_pos - ring.capacity
+            if ring.write_pos - self.position < n:
+                return None
+            chunk = ring.view(self.position, self.position + n)
+            self.position += n
+            return chunk
+
+    def read_bytes(self, n, timeout=None):
+        # Vosk принимает только bytes, поэтому здесь копия неизбежна.
+        chunk = self.read(n, timeout)
+        return None if chunk is None else chunk.tobytes()
+
+
+class MicrophoneSource:
+    """
+    Микрофон PyAudio. Переполнение не бросается исключением (PyAudio при этом выбрасывает уже прочитанные
+    сэмплы), а оценивается по времени: за интервал между чтениями устройство выдаёт interval * rate сэмплов,
+    и всё, что не дошло до буфера потока, потеряно. Оценка кладётся в lost_samples перед возвратом чанка,
+    чтобы AudioCapture заполнил пропуск тишиной и позиции в кольцевом буфере не сдвигались.
+    """
+
+    def __init__(self, pa, sample_rate, chunk_size, sample_format, channels=1):
+        self.pa = pa
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.sample_format = sample_format
+        self.channels = channels
+        self.stream = None
+        self.lost_samples = 0
+        self._read_at = None
+        self._backlog = 0
+
+    def open(self):
+        self.stream = self.pa.open(
+            format=self.sample_format,
+            channels=self.channels,
+            rate=self.sample_rate,
+            input=True,
+            frames_per_buffer=self.chunk_size
+        )
+        self._read_at = None
+
+    def read(self):
+        available = self.stream.get_read_available()
+        now = time.perf_counter()
+        self.lost_samples = 0
+        if self._read_at is not None:
+            produced = (now - self._read_at) * self.sample_rate
+            lost = int(produced - (available - self._backlog))
+            # Допуск в один чанк поглощает неточность часов и планировщика.
+            if lost > self.chunk_size:
+                self.lost_samples = lost
+        data = self.stream.read(self.chunk_size, exception_on_overflow=False)
+        self._read_at = time.perf_counter()
+        self._backlog = self.stream.get_read_available()
+        return np.frombuffer(data, dtype=np.int16)
+
+    def close(self):
+        if self.stream is not None:
+            if self.stream.is_active():
+                self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+
+class FileSource:
+    """Подменяет микрофон файлом (или списком файлов) для безголового прогона конвейера."""
+
+    def __init__(self, paths, sample_rate=16000, chunk_size=480, realtime=True, gap_seconds=1.0, tail_seconds=2.0):
+        if isinstance(paths, str):
+            paths = [paths]
+        self.paths = list(paths)
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.realtime = realtime
+        self.gap_seconds = gap_seconds
+        self.tail_seconds = tail_seconds
+        self._audio = None
+        self._pos = 0
+        self._started_at = None
+        self.offsets = []
+
+    def open(self):
+        gap = np.zeros(int(self.sample_rate * self.gap_seconds), dtype=np.int16)
+        tail = np.zeros(int(self.sample_rate * self.tail_seconds), dtype=np.int16)
+        parts = []
+        offset = 0
+        for path in self.paths:
+            audio = load_audio(path, self.sample_rate)
+            self.offsets.append((path, offset, offset + len(audio)))
+            parts.extend([audio, gap])
+            offset += len(audio) + len(gap)
+        parts.append(tail)
+        self._audio = np.concatenate(parts)
+        self._pos = 0
+
+    def read(self):
+        if self._pos >= len(self._audio):
+            return None
+        if self.realtime:
+            if self._started_at is None:
+                self._started_at = time.perf_counter()
+            due = self._started_at + self._pos / self.sample_rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        chunk = self._audio[self._pos:self._pos + self.chunk_size]
+        self._pos += self.chunk_size
+        return chunk
+
+    def sample_time(self, position):
+        """Момент (perf_counter), когда сэмпл position поступает в захват при подаче в реальном времени."""
+        return self._started_at + position / self.sample_rate
+
+    def close(self):
+        pass
+
+
+class AudioCapture:
+    """Единственный поток захвата звука; потребители читают через независимые курсоры RingReader."""
+
+    def __init__(self, source, sample_rate=16000, buffer_seconds=60):
+        self.source = source
+        self.sample_rate = sample_rate
+        self.ring = RingBuffer(int(sample_rate * buffer_seconds))
+        self.readers = {}
+        self.overflows = 0
+        self.lost_samples = 0
+        self.chunks_captured = 0
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def reader(self, name, position=None):
+        if position is None:
+            position = self.ring.write_pos
+        reader = RingReader(self.ring, name, position)
+        self.readers[name] = reader
+        return reader
+
+    def view(self, start, end):
+        return self.ring.view(start, end)
+
+    @property
+    def position(self):
+        return self.ring.write_pos
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.source.open()
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.source.close()
+        self.ring.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                chunk = self.source.read()
+            except IOError as e:
+                print(f"Ошибка чтения потока захвата: {e}")
+                break
+            if chunk is None:
+                break
+            lost = getattr(self.source, "lost_samples", 0)
+            if lost:
+                # Пропуск заполняется тишиной, чтобы время в буфере совпадало с временем микрофона.
+                self.overflows += 1
+                self.lost_samples += lost
+                if self.overflows == 1 or self.overflows % 100 == 0:
+                    print(f"Переполнение входного буфера ({self.overflows}): потеряно "
+                          f"{self.lost_samples / self.sample_rate:.2f} с, заполнено тишиной")
+                self.ring.write(np.zeros(lost, dtype=np.int16))
+            self.ring.write(chunk)
+            self.chunks_captured += 1
+        self.finished.set()
+        self.ring.close()
+
+    def stats(self):
+        return {
+            "captured_seconds": round(self.ring.write_pos / self.sample_rate, 2),
+            "chunks": self.chunks_captured,
+            "overflows": self.overflows,
+            "lost_seconds": round(self.lost_samples / self.sample_rate, 2),
+            "dropped_samples": {name: r.dropped for name, r in self.readers.items()},
+        }
@@ -0,0 +1,40 @@
+import io
+import wave
+import numpy as np
+
+
+def load_audio(path, sample_rate=16000):
+    """Декодирует WAV/MP3 в моно int16 с нужной частотой дискретизации."""
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wf:
+            if wf.getsampwidth() == 2 and wf.getnchannels() == 1 and wf.getframerate() == sample_rate:
+                return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+    # Всё остальное (mp3, стерео, другие частоты) декодируем через PyAV из faster-whisper.
+    from faster_whisper import decode_audio
+    audio = decode_audio(path, sampling_rate=sample_rate)
+    return float_to_int16(audio)
+
+
+def decode_audio_bytes(data, sample_rate=16000):
+    """Декодирует сжатый звук (mp3 и т.п.) из памяти в моно int16."""
+    from faster_whisper import decode_audio
+    return float_to_int16(decode_audio(io.BytesIO(data), sampling_rate=sample_rate))
+
+
+def int16_to_float(samples):
+    return np.multiply(samples, np.float32(1.0 / 32768.0), dtype=np.float32)
+
+
+def float_to_int16(samples):
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def resample_int16(samples, from_rate, to_rate):
+    """Линейная передискретизация; для речи TTS 24→48 кГц этого достаточно."""
+    if from_rate == to_rate or len(samples) == 0:
+        return samples
+    count = int(round(len(samples) * to_rate / from_rate))
+    positions = np.arange(count, dtype=np.float64) * (from_rate / to_rate)
+    resampled = np.interp(positions, np.arange(len(samples)), samples.astype(np.float32))
+    return resampled.astype(np.int16)
@@ -0,0 +1,247 @@
+import threading
+import time
+
+import numpy as np
+
+from utils.audio_io import load_audio, decode_audio_bytes, resample_int16
+
+AUDIO_OUTPUT_SAMPLE_RATE = 48000
+AUDIO_OUTPUT_BLOCK_MS = 20
+# Каналы микшируются друг с другом; внутри канала звуки играют по очереди.
+AUDIO_OUTPUT_CHANNELS = ("speech", "cue")
+
+
+class OutputUnderflow(Exception):
+    pass
+
+
+class PyAudioSink:
+    def __init__(self, pa, sample_rate, block_size):
+        self.pa = pa
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.stream = None
+
+    def open(self):
+        import pyaudio
+        self.stream = self.pa.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            output=True,
+            frames_per_buffer=self.block_size
+        )
+
+    def write(self, pcm):
+        # exception_on_underflow=True: опустошение буфера устройства считаем в AudioOutput.
+        import pyaudio
+        try:
+            self.stream.write(pcm.tobytes(), exception_on_underflow=True)
+        except IOError as e:
+            if e.errno == pyaudio.paOutputUnderflowed:
+                raise OutputUnderflow(str(e))
+            raise
+
+    def close(self):
+        if self.stream is not None:
+            if self.stream.is_active():
+                self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+
+class NullSink:
+    """Вывод без устройства для безголовых прогонов: write() длится столько же, сколько блок звучит."""
+
+    def __init__(self, sample_rate, realtime=True, keep_audio=False):
+        self.sample_rate = sample_rate
+        self.realtime = realtime
+        self.keep_audio = keep_audio
+        self.frames_written = 0
+        self.blocks = []
+        self._next_write_at = None
+
+    def open(self):
+        self._next_write_at = time.perf_counter()
+
+    def write(self, pcm):
+        self.frames_written += len(pcm)
+        if self.keep_audio:
+            self.blocks.append(pcm.copy())
+        if self.realtime:
+            # Как у устройства с буфером в один блок: запись возвращается, когда доигран предыдущий.
+            now = time.perf_counter()
+            start = max(self._next_write_at, now)
+            self._next_write_at = start + len(pcm) / self.sample_rate
+            if start > now:
+                time.sleep(start - now)
+
+    def audio(self):
+        return np.concatenate(self.blocks) if self.blocks else np.zeros(0, dtype=np.int16)
+
+    def close(self):
+        pass
+
+
+class Playback:
+    """Один звук в очереди канала: позиция воспроизведения, отмена, ожидание конца."""
+
+    def __init__(self, pcm, channel):
+        self.pcm = pcm
+        self.channel = channel
+        self.position = 0
+        self.started_at = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+    @property
+    def duration_frames(self):
+        return len(self.pcm)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class AudioOutput:
+    """
+    Единственный долгоживущий поток вывода. Звуки (сигналы, фрагменты TTS, фразы из кэша) передаются
+    как PCM и приводятся к частоте устройства; поток микшера каждые block_ms складывает текущие звуки
+    всех каналов и пишет блок в устройство. Отмена срабатывает на границе блока.
+
+    on_playback получает каждый смикшированный блок перед записью (опорный сигнал для barge-in).
+    """
+
+    def __init__(self, sink, sample_rate=AUDIO_OUTPUT_SAMPLE_RATE, block_ms=AUDIO_OUTPUT_BLOCK_MS, on_playback=None):
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.block_size = int(sample_rate * block_ms / 1000)
+        self.on_playback = on_playback
+        self.frames_played = 0
+        self.underruns = 0
+        self.blocks_written = 0
+        self._queues = {channel: [] for channel in AUDIO_OUTPUT_CHANNELS}
+        self._cond = threading.Condition()
+        self._decoded = {}
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+        self.sink.open()
+        self._thread = threading.Thread(target=self._mix_loop, name="audio-output", daemon=True)
+        self._thread.start()
+        return self
+
+    def play(self, pcm, sample_rate=None, channel="speech"):
+        pcm = np.asarray(pcm, dtype=np.int16)
+        if sample_rate is not None and sample_rate != self.sample_rate:
+            pcm = resample_int16(pcm, sample_rate, self.sample_rate)
+        playback = Playback(pcm, channel)
+        with self._cond:
+            self._queues[channel].append(playback)
+            self._cond.notify()
+        return playback
+
+    def load(self, path):
+        """Декодирует файл (mp3/wav) в PCM частоты устройства один раз и держит в памяти."""
+        pcm = self._decoded.get(path)
+        if pcm is None:
+            pcm = self._decoded[path] = load_audio(path, self.sample_rate)
+        return pcm
+
+    def play_file(self, path, channel="cue"):
+        return self.play(self.load(path), channel=channel)
+
+    def play_encoded(self, data, channel="speech"):
+        """Сжатый звук (например, mp3 от gTTS) декодируется в памяти, без временных файлов."""
+        return self.play(decode_audio_bytes(data, self.sample_rate), channel=channel)
+
+    def stop(self, channel=None):
+        with self._cond:
+            for name, playbacks in self._queues.items():
+                if channel is None or name == channel:
+                    for playback in playbacks:
+                        playback.cancel()
+            self._cond.notify()
+
+    def is_active(self, channel=None):
+        with self._cond:
+            return any(self._queues[name] for name in self._queues if channel is None or name == channel)
+
+    @property
+    def position_seconds(self):
+        return self.frames_played / self.sample_rate
+
+    def stats(self):
+        return {
+            "played_s": round(self.position_seconds, 2),
+            "blocks": self.blocks_written,
+            "underruns": self.underruns,
+        }
+
+    def close(self):
+        self.stop()
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self.sink.close()
+
+    def _next_block(self):
+        """Складывает по блоку от текущего звука каждого канала; None — выводить нечего."""
+        mix = None
+        finished = []
+        for playbacks in self._queues.values():
+            while playbacks and playbacks[0].cancelled:
+                finished.append(playbacks.pop(0))
+            if not playbacks:
+                continue
+            playback = playbacks[0]
+            if playback.started_at is None:
+                playback.started_at = time.perf_counter()
+            chunk = playback.pcm[playback.position:playback.position + self.block_size]
+            playback.position += len(chunk)
+            if mix is None:
+                mix = np.zeros(self.block_size, dtype=np.int32)
+            mix[:len(chunk)] += chunk
+            if playback.position >= len(playback.pcm):
+                finished.append(playbacks.pop(0))
+        return mix, finished
+
+    def _mix_loop(self):
+        idle = True
+        while True:
+            with self._cond:
+                mix, finished = self._next_block()
+                while mix is None and not finished and self._running:
+                    idle = True
+                    self._cond.wait()
+                    mix, finished = self._next_block()
+                running = self._running
+            for playback in finished:
+                playback.done.set()
+            if not running:
+                return
+            if mix is None:
+                continue
+            block = np.clip(mix, -32768, 32767).astype(np.int16)
+            if self.on_playback is not None:
+                self.on_playback(block, self.sample_rate)
+            try:
+                self.sink.write(block)
+            except OutputUnderflow:
+                # После простоя буфер устройства пуст законно — это не опустошение.
+                if not idle:
+                    self.underruns += 1
+            except Exception as e:
+                print(f"Ошибка вывода звука: {e}")
+            idle = False
+            self.frames_played += len(block)
+            self.blocks_written += 1
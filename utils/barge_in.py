@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from utils.endpointing import frame_energy_db
+
+ECHO_SUBFRAME_MS = 10
+ECHO_HISTORY_SECONDS = 3.0
+# Задержка тракта «запись в устройство → звук в микрофоне» (буфер PortAudio + акустика).
+ECHO_MAX_DELAY_MS = 250
+ECHO_DELAY_TOLERANCE_MS = 20
+ECHO_DELAY_ESTIMATE_EVERY_FRAMES = 10
+ECHO_LEVEL_FLOOR_DB = -70.0
+# Связь динамик→микрофон оцениваем только по громким участкам TTS, где эхо выше шума.
+ECHO_ACTIVE_DB = -45.0
+BARGE_IN_MIN_SPEECH_MS = 90
+BARGE_IN_MARGIN_DB = 6.0
+# Речь пользователя должна быть заметно громче шумового фона микрофона: щелчки и вдохи на уровне фона
+# в паузах TTS, где решает только VAD, перебиванием не считаются.
+BARGE_IN_NOISE_MARGIN_DB = 12.0
+BARGE_IN_NOISE_FLOOR_INIT_DB = -50.0
+ECHO_COUPLING_INIT_DB = -10.0
+# Подстройка связи динамик→микрофон: быстро вверх по кадрам без речи, медленно вверх по кадрам,
+# где VAD слышит речь (это может быть начало речи пользователя, ещё не прошедшее порог), медленно вниз.
+ECHO_COUPLING_UP_ALPHA = 0.5
+ECHO_COUPLING_SPEECH_UP_ALPHA = 0.05
+ECHO_COUPLING_DOWN_ALPHA = 0.01
+
+
+class EchoReference:
+    """
+    Уровень исходящего звука во времени. Микшер AudioOutput передаёт в push (on_playback) каждый
+    сведённый блок перед записью в устройство; BargeInDetector по этим уровням оценивает, сколько эха
+    должно быть в микрофоне.
+    """
+
+    def __init__(self, history_seconds=ECHO_HISTORY_SECONDS):
+        self._levels = deque(maxlen=int(history_seconds * 1000 / ECHO_SUBFRAME_MS))
+        self._lock = threading.Lock()
+
+    def push(self, pcm, sample_rate, at=None):
+        at = time.perf_counter() if at is None else at
+        step = max(int(sample_rate * ECHO_SUBFRAME_MS / 1000), 1)
+        usable = len(pcm) - len(pcm) % step
+        if usable:
+            blocks = np.asarray(pcm[:usable], dtype=np.float32).reshape(-1, step)
+            rms = np.sqrt(np.mean(blocks * blocks, axis=1))
+            levels = 20.0 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+        else:
+            levels = []
+        with self._lock:
+            for i, level in enumerate(levels):
+                self._levels.append((at + i * ECHO_SUBFRAME_MS / 1000, float(level)))
+
+    def levels(self):
+        with self._lock:
+            return list(self._levels)
+
+    def level_db(self, start, end):
+        """Максимальный уровень опорного сигнала на интервале [start, end] или None, если TTS молчал."""
+        with self._lock:
+            levels = [level for at, level in self._levels if start <= at <= end]
+        return max(levels) if levels else None
+
+    def clear(self):
+        with self._lock:
+            self._levels.clear()
+
+
+class BargeInDetector:
+    """
+    Отличает речь пользователя от эха собственного TTS во время воспроизведения.
+
+    Кадр считается речью пользователя, если webrtcvad видит речь и энергия микрофона выше
+    ожидаемого эха (уровень опорного сигнала + оценка связи динамик→микрофон) на margin_db.
+    Оценка связи — верхняя огибающая (микрофон − опорный сигнал) по кадрам, признанным эхом:
+    быстро вверх, медленно вниз, чтобы паузы между слогами TTS не занижали её. По кадрам, где VAD
+    слышит речь, связь растёт медленно: иначе тихое начало речи пользователя поднимало бы порог.
+    Кроме того, кадр должен быть громче шумового фона микрофона на noise_margin_db.
+    Задержка эха оценивается по корреляции огибающих микрофона и опорного сигнала; пока она
+    неизвестна, опорный уровень берётся как максимум по всему окну max_delay_ms.
+    Прерывание срабатывает после min_speech_ms подряд таких кадров.
+    """
+
+    def __init__(self, reference, frame_ms=30, min_speech_ms=BARGE_IN_MIN_SPEECH_MS, margin_db=BARGE_IN_MARGIN_DB,
+                 max_delay_ms=ECHO_MAX_DELAY_MS, coupling_db=ECHO_COUPLING_INIT_DB,
+                 noise_margin_db=BARGE_IN_NOISE_MARGIN_DB):
+        self.reference = reference
+        self.frame_ms = frame_ms
+        self.min_frames = max(1, round(min_speech_ms / frame_ms))
+        self.margin_db = margin_db
+        self.max_delay_ms = max_delay_ms
+        self.coupling_db = coupling_db
+        self.noise_margin_db = noise_margin_db
+        self.noise_floor_db = None
+        self.speech_frames = 0
+        self.echo_frames = 0
+        self.onset_at = None
+        self.triggered_at = None
+        self.delay_ms = None
+        self._mic_levels = deque(maxlen=int(ECHO_HISTORY_SECONDS * 1000 / ECHO_SUBFRAME_MS))
+        self._frames = 0
+
+    def process(self, frame, vad_speech, now=None):
+        """Возвращает True один раз — в момент, когда речь пользователя подтверждена."""
+        now = time.perf_counter() if now is None else now
+        mic_db = frame_energy_db(frame)
+        self._remember_mic(frame, now)
+        self._update_noise_floor(mic_db, vad_speech)
+        vad_speech = vad_speech and mic_db > self.noise_floor_db + self.noise_margin_db
+        if self.delay_ms is None:
+            ref_db = self.reference.level_db(now - (self.frame_ms + self.max_delay_ms) / 1000, now)
+        else:
+            tolerance = ECHO_DELAY_TOLERANCE_MS / 1000
+            delay = self.delay_ms / 1000
+            ref_db = self.reference.level_db(now - delay - self.frame_ms / 1000 - tolerance, now - delay + tolerance)
+        if ref_db is None or ref_db < ECHO_LEVEL_FLOOR_DB:
+            # TTS в этот момент молчал: эха нет, решает только VAD.
+            ref_db = None
+            user_speech = vad_speech
+        else:
+            user_speech = vad_speech and mic_db > ref_db + self.coupling_db + self.margin_db
+            if not user_speech and ref_db > ECHO_ACTIVE_DB:
+                coupling = mic_db - ref_db
+                if coupling <= self.coupling_db:
+                    alpha = ECHO_COUPLING_DOWN_ALPHA
+                else:
+                    alpha = ECHO_COUPLING_SPEECH_UP_ALPHA if vad_speech else ECHO_COUPLING_UP_ALPHA
+                self.coupling_db += alpha * (coupling - self.coupling_db)
+                if vad_speech:
+                    self.echo_frames += 1
+
+        if not user_speech:
+            self.speech_frames = 0
+            self.onset_at = None
+            self._frames += 1
+            if ref_db is not None and self._frames % ECHO_DELAY_ESTIMATE_EVERY_FRAMES == 0:
+                self._estimate_delay()
+            return False
+        if self.speech_frames == 0:
+            self.onset_at = now - self.frame_ms / 1000
+        self.speech_frames += 1
+        if self.speech_frames == self.min_frames and self.triggered_at is None:
+            self.triggered_at = now
+            return True
+        return False
+
+    def _update_noise_floor(self, mic_db, vad_speech):
+        # Как в EndpointDetector: фон быстро опускается и медленно поднимается по кадрам без речи.
+        if self.noise_floor_db is None:
+            self.noise_floor_db = min(mic_db, BARGE_IN_NOISE_FLOOR_INIT_DB)
+        if mic_db < self.noise_floor_db:
+            self.noise_floor_db += 0.5 * (mic_db - self.noise_floor_db)
+        elif not vad_speech:
+            self.noise_floor_db += 0.05 * (mic_db - self.noise_floor_db)
+
+    def _remember_mic(self, frame, now):
+        step = len(frame) * ECHO_SUBFRAME_MS // self.frame_ms
+        if step <= 0:
+            return
+        count = len(frame) // step
+        blocks = frame[:count * step].astype(np.float32).reshape(count, step)
+        levels = 20.0 * np.log10(np.maximum(np.sqrt(np.mean(blocks * blocks, axis=1)), 1.0) / 32768.0)
+        start = now - self.frame_ms / 1000
+        for i, level in enumerate(levels):
+            self._mic_levels.append((start + i * ECHO_SUBFRAME_MS / 1000, float(level)))
+
+    def _estimate_delay(self):
+        reference = self.reference.levels()
+        if len(reference) < 2 or len(self._mic_levels) < 50:
+            return
+        ref_times, ref_levels = np.array(reference).T
+        mic_times, mic_levels = np.array(self._mic_levels).T
+        mic_levels = np.maximum(mic_levels, ECHO_LEVEL_FLOOR_DB)
+        mic_levels = mic_levels - mic_levels.mean()
+        best_lag, best_score = None, 0.0
+        for lag_ms in range(0, self.max_delay_ms + 1, ECHO_SUBFRAME_MS):
+            shifted = np.maximum(np.interp(mic_times - lag_ms / 1000, ref_times, ref_levels,
+                                           left=ECHO_LEVEL_FLOOR_DB, right=ECHO_LEVEL_FLOOR_DB), ECHO_LEVEL_FLOOR_DB)
+            shifted = shifted - shifted.mean()
+            norm = np.sqrt(np.sum(shifted * shifted) * np.sum(mic_levels * mic_levels))
+            score = float(np.sum(shifted * mic_levels) / norm) if norm else 0.0
+            if score > best_score:
+                best_lag, best_score = lag_ms, score
+        # Слабая корреляция — эха почти не слышно или в истории много речи пользователя.
+        if best_lag is not None and best_score >= 0.5:
+            self.delay_ms = best_lag
+
+    @property
+    def detection_ms(self):
+        if self.triggered_at is None or self.onset_at is None:
+            return None
+        return (self.triggered_at - self.onset_at) * 1000
+
+    def speech_samples(self, sample_rate):
+        return int(self.speech_frames * self.frame_ms * sample_rate / 1000)
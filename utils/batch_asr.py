@@ -0,0 +1,150 @@
+import bisect
+import io
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from utils.audio_io import load_audio, int16_to_float
+
+BATCH_ASR_BATCH_SIZE = 8
+BATCH_ASR_DECODE_WORKERS = 2
+BATCH_ASR_MAX_PENDING = 64
+BATCH_ASR_MAX_WAIT_MS = 50
+# Один клип — одно окно Whisper; длинные записи режутся на куски по 30 с.
+BATCH_ASR_CHUNK_SECONDS = 30
+
+_STOP = object()
+
+
+def decode_item(item, sample_rate=16000):
+    """Путь к файлу, закодированные байты (MP3/WAV) или массив сэмплов → моно float32."""
+    if isinstance(item, np.ndarray):
+        return int16_to_float(item) if item.dtype == np.int16 else item.astype(np.float32, copy=False)
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        from faster_whisper import decode_audio
+        return decode_audio(io.BytesIO(bytes(item)), sampling_rate=sample_rate)
+    return int16_to_float(load_audio(item, sample_rate))
+
+
+class BatchTranscriber:
+    """
+    Пакетная расшифровка множества записей через BatchedInferencePipeline faster-whisper.
+
+    Клипы склеиваются в один массив, а границы передаются как clip_timestamps: так конвейер
+    кодирует по batch_size клипов за один проход энкодера, а сегменты однозначно
+    сопоставляются исходным клипам. Декодирование файлов идёт в ограниченном пуле потоков.
+    submit() собирает одиночные запросы (например, из сервера) в пакеты.
+    """
+
+    def __init__(self, model, batch_size=BATCH_ASR_BATCH_SIZE, decode_workers=BATCH_ASR_DECODE_WORKERS,
+                 language="ru", sample_rate=16000, transcribe_kwargs=None,
+                 max_pending=BATCH_ASR_MAX_PENDING, max_wait_ms=BATCH_ASR_MAX_WAIT_MS):
+        from faster_whisper import BatchedInferencePipeline
+
+        self.pipeline = BatchedInferencePipeline(model)
+        self.batch_size = batch_size
+        self.language = language
+        self.sample_rate = sample_rate
+        self.transcribe_kwargs = transcribe_kwargs or {}
+        self.max_wait_ms = max_wait_ms
+        self.clips_done = 0
+        self.batches_done = 0
+        self._decoder = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="batch-asr-decode")
+        self._model_lock = threading.Lock()
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._collector = None
+        self._collector_lock = threading.Lock()
+
+    def transcribe_many(self, items):
+        """Расшифровки в том же порядке, что и items."""
+        audios = list(self._decoder.map(lambda item: decode_item(item, self.sample_rate), items))
+        return self._transcribe_audios(audios)
+
+    def transcribe(self, item):
+        return self.transcribe_many([item])[0]
+
+    def _transcribe_audios(self, audios):
+        chunk = BATCH_ASR_CHUNK_SECONDS * self.sample_rate
+        pieces, owners, starts = [], [], []
+        offset = 0
+        for index, audio in enumerate(audios):
+            for pos in range(0, len(audio), chunk):
+                piece = audio[pos:pos + chunk]
+                pieces.append(piece)
+                owners.append(index)
+                starts.append(offset / self.sample_rate)
+                offset += len(piece)
+        texts = [[] for _ in audios]
+        if not pieces:
+            return ["" for _ in audios]
+
+        clip_timestamps = [{"start": start, "end": start + len(piece) / self.sample_rate}
+                           for start, piece in zip(starts, pieces)]
+        with self._model_lock:
+            segments, _ = self.pipeline.transcribe(
+                np.concatenate(pieces),
+                language=self.language,
+                clip_timestamps=clip_timestamps,
+                batch_size=self.batch_size,
+                **self.transcribe_kwargs
+            )
+            for segment in segments:
+                # Время сегмента отсчитывается от начала склейки: по нему находим клип.
+                piece_index = max(bisect.bisect_right(starts, segment.start + 1e-3) - 1, 0)
+                texts[owners[piece_index]].append(segment.text)
+        self.clips_done += len(audios)
+        self.batches_done += 1
+        return ["".join(parts).strip() for parts in texts]
+
+    def submit(self, item):
+        """Ставит запись в очередь; Future вернёт текст. Блокируется, если очередь заполнена."""
+        self._ensure_collector()
+        future = Future()
+        self._pending.put((item, future))
+        return future
+
+    def _ensure_collector(self):
+        with self._collector_lock:
+            if self._collector is None:
+                self._collector = threading.Thread(target=self._collect, name="batch-asr", daemon=True)
+                self._collector.start()
+
+    def _collect(self):
+        while True:
+            first = self._pending.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait_ms / 1000
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = self._pending.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            try:
+                texts = self.transcribe_many([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), text in zip(batch, texts):
+                    future.set_result(text)
+            if stop:
+                return
+
+    def close(self):
+        if self._collector is not None:
+            self._pending.put(_STOP)
+            self._collector.join(timeout=2)
+        self._decoder.shutdown(wait=False)
@@ -0,0 +1,42 @@
+DECODING_PROFILES = {
+    # Короткая команда: жадный поиск, без токенов времени и без перезапусков с температурой.
+    "command": {
+        "beam_size": 1,
+        "best_of": 1,
+        "temperature": 0.0,
+        "without_timestamps": True,
+        "condition_on_previous_text": False,
+    },
+    # Длинная фраза или диктовка: поиск по лучу и стандартная цепочка температур faster-whisper.
+    "dictation": {
+        "beam_size": 5,
+        "best_of": 5,
+        "temperature": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+        "condition_on_previous_text": True,
+    },
+    # Промежуточные гипотезы потоковой расшифровки: всё равно будут перезаписаны.
+    "partial": {
+        "beam_size": 1,
+        "best_of": 1,
+        "temperature": 0.0,
+        "condition_on_previous_text": False,
+    },
+}
+
+# Контекст прослушивания → максимальная длительность речи (с), при которой фраза считается командой.
+COMMAND_MAX_SECONDS = {
+    "wake": 4.0,
+    "follow_up": 2.5,
+    "dictation": 0.0,
+}
+
+
+def choose_profile(duration_s, context="wake"):
+    """Выбирает профиль декодирования по длительности фразы и контексту прослушивания."""
+    if duration_s <= COMMAND_MAX_SECONDS.get(context, 0.0):
+        return "command"
+    return "dictation"
+
+
+def profile_kwargs(name):
+    return dict(DECODING_PROFILES[name])
@@ -0,0 +1,123 @@
+import re
+import numpy as np
+
+# Слова, после которых фраза почти наверняка продолжится.
+INCOMPLETE_TAIL_WORDS = {
+    "и", "а", "но", "или", "либо", "в", "во", "на", "с", "со", "к", "ко", "по", "за", "из", "от",
+    "до", "для", "про", "о", "об", "у", "при", "над", "под", "что", "чтобы", "как", "который",
+    "которая", "которое", "которые", "потом", "затем", "ещё", "еще", "также", "это", "мне",
+}
+
+NOISE_FLOOR_INIT_DB = -50.0
+
+
+def utterance_looks_complete(text):
+    text = (text or "").strip()
+    if not text:
+        return False
+    if text[-1] in ",—-:;" or text.endswith("..."):
+        return False
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return False
+    return words[-1] not in INCOMPLETE_TAIL_WORDS
+
+
+def frame_energy_db(frame):
+    samples = frame.astype(np.float32)
+    rms = np.sqrt(np.mean(samples * samples)) if len(samples) else 0.0
+    return float(20.0 * np.log10(max(rms, 1.0) / 32768.0))
+
+
+class EndpointDetector:
+    """
+    Адаптивное определение конца фразы вместо фиксированных VAD_SILENCE_TIMEOUT_MS тишины.
+
+    Решение webrtcvad дополнительно проверяется энергией кадра относительно оценки шумового
+    фона. Порог тишины выбирается по частичной расшифровке: законченная фраза закрывается
+    через short_silence_ms, незаконченная ждёт max_silence_ms, а паузы, которые пользователь
+    уже делал внутри фразы, растягивают порог.
+    """
+
+    def __init__(self, frame_ms=30, short_silence_ms=400, default_silence_ms=800, max_silence_ms=1500,
+                 trailing_pad_ms=150, energy_margin_db=6.0, noise_alpha=0.05):
+        self.frame_ms = frame_ms
+        self.short_silence_ms = short_silence_ms
+        self.default_silence_ms = default_silence_ms
+        self.max_silence_ms = max_silence_ms
+        self.trailing_pad_ms = trailing_pad_ms
+        self.energy_margin_db = energy_margin_db
+        self.noise_alpha = noise_alpha
+        self.noise_floor_db = None
+        self.last_report = None
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self.speech_frames = 0
+        self.silent_frames = 0
+        self.longest_pause_ms = 0
+        self.partial_text = None
+        self.timeout_ms = self.default_silence_ms
+        self.reason = "default"
+
+    def set_partial(self, text):
+        self.partial_text = text
+
+    @property
+    def silence_ms(self):
+        return self.silent_frames * self.frame_ms
+
+    def is_speech(self, vad_speech, frame):
+        energy = frame_energy_db(frame)
+        if self.noise_floor_db is None:
+            self.noise_floor_db = min(energy, NOISE_FLOOR_INIT_DB)
+        # Шумовой фон быстро опускается и медленно поднимается только по кадрам без речи.
+        if energy < self.noise_floor_db:
+            self.noise_floor_db += 0.5 * (energy - self.noise_floor_db)
+        elif not vad_speech:
+            self.noise_floor_db += self.noise_alpha * (energy - self.noise_floor_db)
+        return vad_speech and energy > self.noise_floor_db + self.energy_margin_db
+
+    def process(self, vad_speech, frame):
+        """Принимает кадр и решение webrtcvad; возвращает True, когда фраза закончилась."""
+        speech = self.is_speech(vad_speech, frame)
+        if speech:
+            if self.in_speech and self.silent_frames:
+                self.longest_pause_ms = max(self.longest_pause_ms, self.silence_ms)
+            self.in_speech = True
+            self.speech_frames += 1
+            self.silent_frames = 0
+            return False
+        if not self.in_speech:
+            return False
+        self.silent_frames += 1
+        self.timeout_ms = self._choose_timeout()
+        return self.silence_ms > self.timeout_ms
+
+    def _choose_timeout(self):
+        if self.partial_text is None:
+            timeout, self.reason = self.default_silence_ms, "default"
+        elif utterance_looks_complete(self.partial_text):
+            timeout, self.reason = self.short_silence_ms, "complete"
+        else:
+            timeout, self.reason = self.max_silence_ms, "incomplete"
+        if self.longest_pause_ms and timeout < self.longest_pause_ms + self.frame_ms * 4:
+            timeout, self.reason = self.longest_pause_ms + self.frame_ms * 4, "mid_pause"
+        return min(timeout, self.max_silence_ms)
+
+    def trailing_trim_samples(self, sample_rate):
+        """Сколько сэмплов хвостовой тишины отрезать перед transcribe (с небольшим запасом)."""
+        trim_ms = max(self.silence_ms - self.trailing_pad_ms, 0)
+        return int(sample_rate * trim_ms / 1000)
+
+    def report(self):
+        self.last_report = {
+            "endpoint_delay_ms": self.silence_ms,
+            "timeout_ms": self.timeout_ms,
+            "reason": self.reason,
+            "trimmed_ms": max(self.silence_ms - self.trailing_pad_ms, 0),
+            "longest_pause_ms": self.longest_pause_ms,
+            "noise_floor_db": round(self.noise_floor_db, 1) if self.noise_floor_db is not None else None,
+        }
+        return self.last_report
@@ -0,0 +1,68 @@
+import json
+import re
+import time
+
+KEYWORD_DEBOUNCE_MS = 1500
+
+
+class KeywordSpotter:
+    """
+    Быстрые команды по частичным результатам Vosk (PartialResult), а не по финальным.
+
+    commands — таблица {слово: действие}. Частичная гипотеза растёт по мере речи, поэтому в пределах
+    одной фразы слово срабатывает столько раз, сколько раз оно в ней встретилось; финальный результат
+    закрывает фразу. Между фразами повтор того же слова глушится на debounce_ms: Vosk иногда
+    разрезает одно слово на две фразы.
+    """
+
+    def __init__(self, commands, wake_word=None, debounce_ms=KEYWORD_DEBOUNCE_MS):
+        self.commands = dict(commands)
+        self.wake_word = wake_word
+        self.debounce_ms = debounce_ms
+        self.fired = 0
+        self.suppressed = 0
+        self._utterance_counts = {}
+        self._last_fired_at = {}
+
+    @property
+    def keywords(self):
+        words = list(self.commands)
+        if self.wake_word and self.wake_word not in self.commands:
+            words.append(self.wake_word)
+        return words
+
+    def grammar(self):
+        """Грамматика для KaldiRecognizer: только ключевые слова, остальное уходит в [unk]."""
+        return json.dumps(self.keywords + ["[unk]"], ensure_ascii=False)
+
+    def reset(self):
+        self._utterance_counts = {}
+
+    def match(self, text, final=False, now=None):
+        """Возвращает новые (ещё не сработавшие) ключевые слова из гипотезы в порядке появления."""
+        now = time.perf_counter() if now is None else now
+        keywords = set(self.keywords)
+        seen = {}
+        matched = []
+        for word in re.findall(r"\w+", (text or "").lower()):
+            if word not in keywords:
+                continue
+            seen[word] = seen.get(word, 0) + 1
+            if seen[word] <= self._utterance_counts.get(word, 0):
+                continue
+            self._utterance_counts[word] = seen[word]
+            last = self._last_fired_at.get(word)
+            if seen[word] == 1 and last is not None and (now - last) * 1000 < self.debounce_ms:
+                self.suppressed += 1
+                continue
+            self._last_fired_at[word] = now
+            matched.append(word)
+        if final:
+            self.reset()
+        return matched
+
+    def dispatch(self, word):
+        self.fired += 1
+        action = self.commands.get(word)
+        if action is not None:
+            action()
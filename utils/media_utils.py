@@ -1,13 +1,23 @@
 from ctypes import cast, POINTER
-from comtypes import CLSCTX_ALL
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-import pyautogui
 
 
-def sound_plus():
+def _master_volume():
+    from comtypes import CLSCTX_ALL
+    from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+
     devices = AudioUtilities.GetSpeakers()
     interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-    volume = cast(interface, POINTER(IAudioEndpointVolume))
+    return cast(interface, POINTER(IAudioEndpointVolume))
+
+
+def _press(key):
+    import pyautogui
+
+    pyautogui.press(key)
+
+
+def sound_plus():
+    volume = _master_volume()
 
     current = volume.GetMasterVolumeLevelScalar()
 
@@ -17,9 +27,7 @@ def sound_plus():
 
 
 def sound_minus():
-    devices = AudioUtilities.GetSpeakers()
-    interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-    volume = cast(interface, POINTER(IAudioEndpointVolume))
+    volume = _master_volume()
 
     current = volume.GetMasterVolumeLevelScalar()
 
@@ -29,20 +37,20 @@ def sound_minus():
 
 
 def play_pause():
-    pyautogui.press('playpause')
+    _press('playpause')
 
 
 def next_media():
-    pyautogui.press("nexttrack")
+    _press("nexttrack")
 
 
 def back_media():
-    pyautogui.press("prevtrack")
+    _press("prevtrack")
 
 
 def up():
-    pyautogui.press("up")
+    _press("up")
 
 
 def down():
-    pyautogui.press("down")
\ No newline at end of file
+    _press("down")
\ No newline at end of file
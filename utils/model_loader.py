@@ -0,0 +1,218 @@
+import ctypes
+import gc
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class StartupReport:
+    """Собирает время импортов и загрузки моделей при старте (в том числе из рабочих потоков)."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.sections = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, name, kind="import"):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.sections.append({
+                    "name": name,
+                    "kind": kind,
+                    "thread": threading.current_thread().name,
+                    "start_ms": round((started - self.started_at) * 1000, 1),
+                    "duration_ms": round((finished - started) * 1000, 1),
+                })
+
+    def mark(self, name):
+        with self.measure(name, kind="ready"):
+            pass
+
+    def format(self):
+        wall_ms = (time.perf_counter() - self.started_at) * 1000
+        lines = [f"Отчёт о запуске (общее время {wall_ms:.0f} мс):"]
+        with self._lock:
+            sections = sorted(self.sections, key=lambda s: s["start_ms"])
+        for s in sections:
+            lines.append(
+                f"  {s['kind']:<6} {s['name']:<28} старт {s['start_ms']:>8.0f} мс, "
+                f"длительность {s['duration_ms']:>8.0f} мс [{s['thread']}]"
+            )
+        return "\n".join(lines)
+
+
+def process_rss_mb(pid=None):
+    import psutil
+    return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+
+
+def _trim_heap():
+    # glibc не возвращает освобождённую память системе сам по себе.
+    if sys.platform.startswith("linux"):
+        try:
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+
+class ModelLoader:
+    """
+    Параллельная загрузка моделей в рабочих потоках. Каждая модель доступна через future:
+    get() ждёт её готовности только при первом реальном использовании.
+
+    С idle_unload_seconds включается режим экономии памяти: модели, к которым не обращались
+    дольше этого времени, выгружаются и загружаются заново при следующем get()/use().
+    Чтобы замерить RSS каждой модели, загрузки в этом режиме идут по одной.
+    """
+
+    def __init__(self, report, max_workers=3, idle_unload_seconds=None, check_interval_seconds=10):
+        self.report = report
+        self.idle_unload_seconds = idle_unload_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-loader")
+        self._futures = {}
+        self._specs = {}
+        self._last_used = {}
+        self._in_use = {}
+        self._lock = threading.RLock()
+        self._measure_lock = threading.Lock() if idle_unload_seconds else None
+        self._stopped = threading.Event()
+        self.wait_ms = {}
+        self.rss_mb = {}
+        self.freed_mb = {}
+        self.reload_ms = {}
+        if idle_unload_seconds:
+            threading.Thread(target=self._unload_idle_loop, name="model-unloader", daemon=True).start()
+
+    def submit(self, name, load_fn, unload_fn=None, pinned=False):
+        """unload_fn(model) освобождает внешние ресурсы (процесс, устройство); pinned-модели не выгружаются."""
+        with self._lock:
+            self._specs[name] = (load_fn, unload_fn, pinned)
+            self._last_used[name] = time.monotonic()
+            return self._start(name, kind="model")
+
+    def _start(self, name, kind):
+        load_fn = self._specs[name][0]
+
+        def run():
+            with self.report.measure(name, kind=kind):
+                if self._measure_lock is None:
+                    return load_fn()
+                with self._measure_lock:
+                    before = process_rss_mb()
+                    model = load_fn()
+                    pid = getattr(model, "pid", None)
+                    # Модель в отдельном процессе (ASRWorkerProcess) считаем по RSS этого процесса.
+                    self.rss_mb[name] = process_rss_mb(pid) if pid else process_rss_mb() - before
+                    return model
+
+        future = self._executor.submit(run)
+        future.add_done_callback(lambda f: self._on_done(name, f))
+        self._futures[name] = future
+        return future
+
+    def _on_done(self, name, future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            print(f"Ошибка при загрузке модели {name}: {error}")
+        else:
+            print(f"Модель {name} загружена.")
+
+    def is_ready(self, name):
+        return name in self._futures and self._futures[name].done()
+
+    def get(self, name):
+        with self._lock:
+            self._last_used[name] = time.monotonic()
+            future = self._futures.get(name)
+            reloading = future is None
+            if reloading:
+                print(f"Повторная загрузка выгруженной модели {name}...")
+                future = self._start(name, kind="reload")
+        if not future.done():
+            started = time.perf_counter()
+            if not reloading:
+                print(f"Ожидание загрузки модели {name}...")
+            result = future.result()
+            waited_ms = (time.perf_counter() - started) * 1000
+            if reloading:
+                self.reload_ms.setdefault(name, []).append(waited_ms)
+            else:
+                self.wait_ms[name] = self.wait_ms.get(name, 0.0) + waited_ms
+            return result
+        return future.result()
+
+    @contextmanager
+    def use(self, name):
+        """Модель не выгружается, пока внутри блока with."""
+        with self._lock:
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+        try:
+            yield self.get(name)
+        finally:
+            with self._lock:
+                self._in_use[name] -= 1
+                self._last_used[name] = time.monotonic()
+
+    def unload(self, name):
+        with self._lock:
+            future = self._futures.get(name)
+            if future is None or not future.done() or self._in_use.get(name) or future.exception() is not None:
+                return False
+            del self._futures[name]
+        unload_fn = self._specs[name][1]
+        before = process_rss_mb()
+        model = future.result()
+        if unload_fn is not None:
+            try:
+                unload_fn(model)
+            except Exception as e:
+                print(f"Ошибка выгрузки модели {name}: {e}")
+        del model, future
+        gc.collect()
+        _trim_heap()
+        self.freed_mb[name] = max(before - process_rss_mb(), 0.0)
+        print(f"Модель {name} выгружена после простоя, освобождено {self.freed_mb[name]:.0f} МБ.")
+        return True
+
+    def _unload_idle_loop(self):
+        while not self._stopped.wait(self.check_interval_seconds):
+            now = time.monotonic()
+            with self._lock:
+                idle = [
+                    name for name, (_, _, pinned) in self._specs.items()
+                    if not pinned and name in self._futures
+                    and now - self._last_used.get(name, now) > self.idle_unload_seconds
+                ]
+            for name in idle:
+                self.unload(name)
+
+    def memory_report(self):
+        report = {}
+        for name in self._specs:
+            reloads = self.reload_ms.get(name, [])
+            report[name] = {
+                "loaded": self.is_ready(name),
+                "rss_mb": round(self.rss_mb[name], 1) if name in self.rss_mb else None,
+                "freed_mb": round(self.freed_mb[name], 1) if name in self.freed_mb else None,
+                "reloads": len(reloads),
+                "reload_ms_avg": round(sum(reloads) / len(reloads), 1) if reloads else None,
+            }
+        return report
+
+    def wait_all(self):
+        for future in list(self._futures.values()):
+            future.exception()
+
+    def shutdown(self):
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,133 @@
+import numpy as np
+
+NOISE_GATE_BAND_HZ = (250, 4000)
+NOISE_GATE_SNR_DB = 8.0
+NOISE_GATE_MIN_BAND_FRACTION = 0.1
+NOISE_GATE_HANGOVER_MS = 300
+# Скорость подстройки спектра шума за кадр: по закрытым кадрам, по открытым (чтобы постоянный
+# шум вроде вентилятора всё же уходил в фон) и вниз (шум стих).
+NOISE_GATE_UP_ALPHA = 0.05
+NOISE_GATE_OPEN_UP_ALPHA = 0.002
+NOISE_GATE_DOWN_ALPHA = 0.3
+NOISE_GATE_MIN_TRIGGER_FRAMES = 3
+# Пауза webrtcvad, после которой следующая речь считается новой фразой (как пауза конца фразы по умолчанию).
+NOISE_GATE_UTTERANCE_GAP_MS = 800
+
+
+class SpectralNoiseGate:
+    """
+    Спектральный шумовой гейт перед webrtcvad.
+
+    Блок кадров обрабатывается одним вызовом rfft. Для каждой полосы речевого диапазона хранится
+    адаптивная оценка спектра шума; кадр проходит, если в достаточной доле полос мощность выше
+    шума на snr_db. После открытия гейт держится hangover_ms, чтобы не резать тихие окончания слов.
+
+    rejected_utterances считает фразы webrtcvad (речь, разделённая паузами не короче utterance_gap_ms),
+    в которых было не меньше min_trigger_frames речевых кадров подряд под закрытым гейтом, а пропущено
+    меньше min_trigger_frames речевых кадров подряд, — ложные срабатывания, не дошедшие до Whisper.
+    Фраза учитывается один раз, когда заканчивается: после паузы, в reset() или finish_utterance().
+    """
+
+    def __init__(self, sample_rate=16000, frame_size=480, band_hz=NOISE_GATE_BAND_HZ, snr_db=NOISE_GATE_SNR_DB,
+                 min_band_fraction=NOISE_GATE_MIN_BAND_FRACTION, hangover_ms=NOISE_GATE_HANGOVER_MS,
+                 min_trigger_frames=NOISE_GATE_MIN_TRIGGER_FRAMES, utterance_gap_ms=NOISE_GATE_UTTERANCE_GAP_MS):
+        self.frame_size = frame_size
+        self.snr_ratio = 10 ** (snr_db / 10)
+        self.min_band_fraction = min_band_fraction
+        self.hangover_frames = int(hangover_ms * sample_rate / 1000 / frame_size)
+        self.min_trigger_frames = min_trigger_frames
+        self.utterance_gap_frames = max(1, int(utterance_gap_ms * sample_rate / 1000 / frame_size))
+        self._window = np.hanning(frame_size).astype(np.float32)
+        freqs = np.fft.rfftfreq(frame_size, 1.0 / sample_rate)
+        self._band = (freqs >= band_hz[0]) & (freqs <= band_hz[1])
+        self.noise_psd = None
+        self.frames = 0
+        self.frames_passed = 0
+        self.rejected_utterances = 0
+        self._hangover = 0
+        self._clear_utterance()
+
+    def reset(self):
+        self.finish_utterance()
+        self._hangover = 0
+
+    def process(self, block):
+        """Принимает int16-блок из целого числа кадров, возвращает маску открытых кадров."""
+        count = len(block) // self.frame_size
+        if count == 0:
+            return np.zeros(0, dtype=bool)
+        frames = block[:count * self.frame_size].reshape(count, self.frame_size).astype(np.float32)
+        spectrum = np.fft.rfft(frames * self._window, axis=1)[:, self._band]
+        psd = spectrum.real ** 2 + spectrum.imag ** 2 + 1e-3
+        if self.noise_psd is None:
+            self.noise_psd = psd.mean(axis=0)
+
+        loud = psd > self.noise_psd * self.snr_ratio
+        raw_open = loud.mean(axis=1) >= self.min_band_fraction
+        mask = np.empty(count, dtype=bool)
+        for i, is_open in enumerate(raw_open):
+            if is_open:
+                self._hangover = self.hangover_frames
+                mask[i] = True
+            elif self._hangover:
+                self._hangover -= 1
+                mask[i] = True
+            else:
+                mask[i] = False
+
+        self._update_noise(psd, raw_open)
+        self.frames += count
+        self.frames_passed += int(mask.sum())
+        return mask
+
+    def _update_noise(self, psd, raw_open):
+        closed = ~raw_open
+        if closed.any():
+            target = psd[closed].mean(axis=0)
+            up = 1 - (1 - NOISE_GATE_UP_ALPHA) ** int(closed.sum())
+        else:
+            target = psd.mean(axis=0)
+            up = 1 - (1 - NOISE_GATE_OPEN_UP_ALPHA) ** len(psd)
+        rising = target > self.noise_psd
+        alpha = np.where(rising, up, NOISE_GATE_DOWN_ALPHA)
+        self.noise_psd += alpha * (target - self.noise_psd)
+
+    def count_rejection(self, vad_speech, gate_open):
+        """Учитывает решение webrtcvad и гейта по кадру; отсечённая фраза считается один раз."""
+        if not vad_speech:
+            self._silent_run += 1
+            self._rejected_run = self._passed_run = 0
+            if self._silent_run >= self.utterance_gap_frames:
+                self.finish_utterance()
+            return
+        self._in_utterance = True
+        self._silent_run = 0
+        if gate_open:
+            self._passed_run += 1
+            self._rejected_run = 0
+            self._passed = self._passed or self._passed_run >= self.min_trigger_frames
+        else:
+            self._rejected_run += 1
+            self._passed_run = 0
+            self._triggered = self._triggered or self._rejected_run >= self.min_trigger_frames
+
+    def finish_utterance(self):
+        """Закрывает текущую фразу webrtcvad: конец потока или прослушивания."""
+        if self._in_utterance and self._triggered and not self._passed:
+            self.rejected_utterances += 1
+        self._clear_utterance()
+
+    def _clear_utterance(self):
+        self._in_utterance = False
+        self._triggered = False
+        self._passed = False
+        self._rejected_run = 0
+        self._passed_run = 0
+        self._silent_run = 0
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "passed_ratio": round(self.frames_passed / self.frames, 3) if self.frames else None,
+            "rejected_utterances": self.rejected_utterances,
+        }
@@ -0,0 +1,76 @@
+import os
+import time
+
+from utils.audio_io import float_to_int16
+
+SILERO_MODEL_URL = "https://models.silero.ai/models/tts/ru/v4_ru.pt"
+SILERO_MODEL_FILE = "model_silero.pt"
+SILERO_SAMPLE_RATES = (8000, 24000, 48000)
+# Потоков intra-op для синтеза: остальные ядра остаются Whisper и захвату звука.
+SILERO_THREADS = int(os.getenv("SILERO_THREADS", "2"))
+# none — модель как есть; quantize — динамическое квантование Linear в int8; freeze — torch.jit.freeze.
+SILERO_OPTIMIZATIONS = ("none", "quantize", "freeze")
+SILERO_WARMUP_TEXT = "Проверка синтеза речи."
+
+
+def set_torch_threads(threads):
+    import torch
+    # При OpenMP число потоков хранится отдельно для каждого вызывающего потока.
+    if threads and torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+
+
+def optimize_silero(model, optimization):
+    """Заменяет внутреннюю сеть модели оптимизированной; возвращает исходную или None, если не вышло."""
+    import torch
+    if optimization == "none":
+        return None
+    original = model.model
+    try:
+        if optimization == "quantize":
+            model.model = torch.ao.quantization.quantize_dynamic(original, {torch.nn.Linear}, dtype=torch.qint8)
+        elif optimization == "freeze":
+            model.model = torch.jit.optimize_for_inference(torch.jit.freeze(original.eval()))
+        else:
+            raise ValueError(f"неизвестная оптимизация '{optimization}'")
+    except Exception as e:
+        print(f"Оптимизация Silero '{optimization}' недоступна: {e}")
+        model.model = original
+        return None
+    return original
+
+
+def synthesize(model, text, speaker, sample_rate, threads=SILERO_THREADS):
+    set_torch_threads(threads)
+    audio = model.apply_tts(text=text, speaker=speaker, sample_rate=sample_rate)
+    return float_to_int16(audio.numpy())
+
+
+def warm_up(model, speaker, sample_rates, threads=SILERO_THREADS, text=SILERO_WARMUP_TEXT):
+    """Первый вызов apply_tts в несколько раз медленнее: JIT-профилирование и выделение буферов. Возвращает мс."""
+    started = time.perf_counter()
+    for sample_rate in sample_rates:
+        synthesize(model, text, speaker, sample_rate, threads)
+    return (time.perf_counter() - started) * 1000
+
+
+def load_silero_model(path=SILERO_MODEL_FILE, threads=SILERO_THREADS, optimization="none", speaker=None,
+                      warmup_sample_rates=()):
+    import torch
+    set_torch_threads(threads)
+    if not os.path.isfile(path):
+        torch.hub.download_url_to_file(SILERO_MODEL_URL, path)
+    model = torch.package.PackageImporter(path).load_pickle("tts_models", "model")
+    model.to(torch.device("cpu"))
+    original = optimize_silero(model, optimization)
+    if speaker and warmup_sample_rates:
+        try:
+            warm_up(model, speaker, warmup_sample_rates, threads)
+        except Exception as e:
+            if original is None:
+                raise
+            # Оптимизированная сеть не подошла к apply_tts — работаем на исходной.
+            print(f"Silero с оптимизацией '{optimization}' не синтезирует ({e}), используется исходная модель.")
+            model.model = original
+            warm_up(model, speaker, warmup_sample_rates, threads)
+    return model
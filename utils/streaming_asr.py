@@ -0,0 +1,158 @@
+import re
+import threading
+import time
+
+from utils.audio_io import int16_to_float
+
+STREAM_STEP_MS = 500
+STREAM_MIN_TAIL_MS = 100
+STREAM_PROMPT_CHARS = 200
+
+
+def _normalize_word(word):
+    return re.sub(r"[^\w]", "", word.lower())
+
+
+class StreamingTranscriber:
+    """
+    Инкрементальная расшифровка faster-whisper, пока пользователь ещё говорит.
+
+    Фоновый поток каждые STREAM_STEP_MS перерасшифровывает незафиксированный хвост фразы.
+    Слова, совпавшие в двух последних гипотезах (LocalAgreement-2), фиксируются, и начало
+    окна сдвигается на конец последнего зафиксированного слова. К моменту конца речи
+    остаётся расшифровать только короткий хвост после стабильного префикса.
+    """
+
+    def __init__(self, model, audio_view, sample_rate=16000, language="ru", step_ms=STREAM_STEP_MS,
+                 on_partial=None, transcribe_kwargs=None):
+        self.model = model
+        self.audio_view = audio_view
+        self.sample_rate = sample_rate
+        self.language = language
+        self.step_samples = int(sample_rate * step_ms / 1000)
+        self.on_partial = on_partial
+        self.transcribe_kwargs = transcribe_kwargs or {}
+
+        self.committed_words = []
+        self.hypothesis_words = []
+        self.commit_pos = 0
+        self.decodes = 0
+        self.last_tail_seconds = 0.0
+        self.last_finish_ms = 0.0
+
+        self._end_pos = 0
+        self._decoded_end = 0
+        self._prev_words = []
+        self._cond = threading.Condition()
+        self._finishing = False
+        self._decode_requested = False
+        self._thread = None
+
+    @property
+    def committed_text(self):
+        return "".join(self.committed_words).strip()
+
+    @property
+    def partial_text(self):
+        return "".join(self.committed_words + self.hypothesis_words).strip()
+
+    def start(self, start_pos):
+        self.commit_pos = start_pos
+        self._end_pos = start_pos
+        self._decoded_end = start_pos
+        self._thread = threading.Thread(target=self._run, name="streaming-asr", daemon=True)
+        self._thread.start()
+
+    def update(self, end_pos):
+        with self._cond:
+            self._end_pos = end_pos
+            if end_pos - self._decoded_end >= self.step_samples:
+                self._cond.notify()
+
+    @property
+    def decoded_end(self):
+        return self._decoded_end
+
+    def request_decode(self):
+        # Не ждать полного шага: нужна свежая гипотеза, например, в начале паузы.
+        with self._cond:
+            if self._end_pos > self._decoded_end:
+                self._decode_requested = True
+                self._cond.notify()
+
+    def finish(self, end_pos, transcribe_kwargs=None):
+        """transcribe_kwargs переопределяет параметры декодирования для финального хвоста (профиль фразы)."""
+        started = time.perf_counter()
+        with self._cond:
+            self._finishing = True
+            self._end_pos = end_pos
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+        tail_samples = end_pos - self.commit_pos
+        self.last_tail_seconds = tail_samples / self.sample_rate
+        tail_words = []
+        if tail_samples >= self.sample_rate * STREAM_MIN_TAIL_MS / 1000:
+            words = self._decode(self.commit_pos, end_pos, word_timestamps=False, transcribe_kwargs=transcribe_kwargs)
+            tail_words = [text for text, _ in words]
+        elif self.hypothesis_words:
+            tail_words = self.hypothesis_words
+        self.committed_words.extend(tail_words)
+        self.hypothesis_words = []
+        self.last_finish_ms = (time.perf_counter() - started) * 1000
+        return self.committed_text
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._finishing or self._decode_requested
+                    or self._end_pos - self._decoded_end >= self.step_samples
+                )
+                if self._finishing:
+                    return
+                self._decode_requested = False
+                end_pos = self._end_pos
+            words = self._decode(self.commit_pos, end_pos, word_timestamps=True)
+            self._decoded_end = end_pos
+            self._agree(words)
+            if self.on_partial:
+                self.on_partial(self.partial_text)
+
+    def _decode(self, start_pos, end_pos, word_timestamps, transcribe_kwargs=None):
+        # Копия нужна: хвост кольцевого буфера может быть перезаписан во время декодирования.
+        audio = int16_to_float(self.audio_view(start_pos, end_pos))
+        prompt = self.committed_text[-STREAM_PROMPT_CHARS:] or None
+        kwargs = dict(self.transcribe_kwargs)
+        kwargs.update(transcribe_kwargs or {})
+        if word_timestamps:
+            # Разметка слов нужна для LocalAgreement.
+            kwargs.pop("without_timestamps", None)
+        segments, _ = self.model.transcribe(
+            audio,
+            language=self.language,
+            word_timestamps=word_timestamps,
+            initial_prompt=prompt,
+            **kwargs
+        )
+        self.decodes += 1
+        if not word_timestamps:
+            return [(segment.text, segment.end) for segment in segments]
+        return [(word.word, word.end) for segment in segments for word in (segment.words or [])]
+
+    def _agree(self, words):
+        agreed = 0
+        for (text, _), prev in zip(words, self._prev_words):
+            if _normalize_word(text) != _normalize_word(prev):
+                break
+            agreed += 1
+
+        # Последнее слово окна может быть оборвано на полуслове, его не фиксируем.
+        agreed = min(agreed, max(len(words) - 1, 0))
+        if agreed:
+            self.committed_words.extend(text for text, _ in words[:agreed])
+            self.commit_pos += int(words[agreed - 1][1] * self.sample_rate)
+        remaining = words[agreed:]
+        self.hypothesis_words = [text for text, _ in remaining]
+        self._prev_words = self.hypothesis_words
@@ -0,0 +1,219 @@
+import hashlib
+import os
+import queue
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+TTS_CACHE_DIR = "tts_cache"
+TTS_CACHE_MEMORY_BYTES = 32 * 1024 * 1024
+TTS_CACHE_DISK_BYTES = 256 * 1024 * 1024
+# Живые фразы попадают на диск, только если прозвучали столько раз: разовые ответы LLM диск не засоряют.
+TTS_CACHE_PERSIST_AFTER_USES = 2
+TTS_CACHE_TRACKED_PHRASES = 4096
+
+
+def normalize_phrase(text):
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class TTSCache:
+    """
+    Кэш синтезированной речи: LRU в памяти и сырые int16 файлы на диске.
+    Ключ — (нормализованная фраза, голос, частота, движок).
+
+    На диск пишутся заготовленные фразы и живые, повторившиеся persist_after_uses раз; запись и удаление
+    старых файлов идут в фоновом потоке, чтобы не задерживать поток синтеза. Размер кэша на диске
+    считается по индексу, а не обходом каталога. Файлы читаются целиком в память (без memmap):
+    открытое отображение на Windows не дало бы удалить или заменить файл.
+    """
+
+    def __init__(self, cache_dir=TTS_CACHE_DIR, memory_bytes=TTS_CACHE_MEMORY_BYTES, disk_bytes=TTS_CACHE_DISK_BYTES,
+                 persist_after_uses=TTS_CACHE_PERSIST_AFTER_USES):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.persist_after_uses = persist_after_uses
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_writes = 0
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._uses = OrderedDict()
+        self._disk = OrderedDict()
+        self._disk_size = 0
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._writes = queue.Queue()
+        self._writer = None
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_disk_index()
+
+    @staticmethod
+    def key(text, speaker, sample_rate, engine):
+        raw = f"{engine}|{speaker}|{sample_rate}|{normalize_phrase(text)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pcm")
+
+    def _load_disk_index(self):
+        # Каталог обходится один раз при создании; дальше размер ведётся по индексу.
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pcm"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-len(".pcm")], stat.st_size))
+        # Самые давно использованные файлы (mtime обновляется при попадании) — в начале индекса.
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+
+    def get(self, key):
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            on_disk = key in self._disk
+        if audio is not None:
+            self._count_use(key, audio)
+            return audio
+        if not on_disk:
+            return None
+        path = self._path(key)
+        try:
+            audio = np.fromfile(path, dtype=np.int16)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self.disk_hits += 1
+        self._remember(key, audio)
+        return audio
+
+    def put(self, key, audio, persist=False):
+        """Кладёт фразу в память; на диск — сразу при persist, иначе когда она повторится."""
+        audio = np.ascontiguousarray(audio, dtype=np.int16)
+        self._remember(key, audio)
+        if persist:
+            self._schedule_write(key, audio)
+        else:
+            self._count_use(key, audio)
+
+    def _count_use(self, key, audio):
+        with self._lock:
+            if key in self._disk or key in self._pending:
+                return
+            uses = self._uses.pop(key, 0) + 1
+            self._uses[key] = uses
+            while len(self._uses) > TTS_CACHE_TRACKED_PHRASES:
+                self._uses.popitem(last=False)
+        if uses >= self.persist_after_uses:
+            self._schedule_write(key, audio)
+
+    def _schedule_write(self, key, audio):
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            self._uses.pop(key, None)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_worker, name="tts-cache-writer", daemon=True)
+                self._writer.start()
+        self._writes.put((key, audio))
+
+    def _write_worker(self):
+        while True:
+            key, audio = self._writes.get()
+            try:
+                self._write(key, audio)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                self._writes.task_done()
+
+    def _write(self, key, audio):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            audio.tofile(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Не удалось сохранить фразу в кэш TTS: {e}")
+            return
+        with self._lock:
+            self._disk_size += audio.nbytes - self._disk.pop(key, 0)
+            self._disk[key] = audio.nbytes
+            self.disk_writes += 1
+        self._evict_disk()
+
+    def flush(self):
+        """Дожидается записи всех запланированных фраз на диск."""
+        self._writes.join()
+
+    def get_or_synthesize(self, text, speaker, sample_rate, engine, synthesize, persist=False):
+        key = self.key(text, speaker, sample_rate, engine)
+        audio = self.get(key)
+        if audio is not None:
+            return audio
+        with self._lock:
+            self.misses += 1
+        audio = synthesize(text)
+        self.put(key, audio, persist=persist)
+        return audio
+
+    def prewarm(self, phrases, speaker, sample_rate, engine, synthesize):
+        for phrase in phrases:
+            try:
+                self.get_or_synthesize(phrase, speaker, sample_rate, engine, synthesize, persist=True)
+            except Exception as e:
+                print(f"Ошибка прогрева кэша TTS для '{phrase}': {e}")
+
+    def _remember(self, key, audio):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = audio
+            self._memory_size += audio.nbytes
+            while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= evicted.nbytes
+
+    def _evict_disk(self):
+        while True:
+            with self._lock:
+                if self._disk_size <= self.disk_bytes or len(self._disk) <= 1:
+                    return
+                key, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Не удалось удалить фразу из кэша TTS: {e}")
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_size,
+            "disk_writes": self.disk_writes,
+        }
@@ -0,0 +1,224 @@
+import queue
+import re
+import threading
+import time
+
+TTS_FIRST_CHUNK_CHARS = 80
+TTS_MAX_CHUNK_CHARS = 200
+TTS_MAX_BUFFERED_CHUNKS = 3
+
+_END = object()
+
+
+def split_for_tts(text, max_chars=TTS_MAX_CHUNK_CHARS, first_max_chars=None):
+    """Режет длинное предложение по знакам препинания и словам, чтобы первый кусок был коротким."""
+    chunks = []
+    current = []
+    current_len = 0
+    for word in text.split():
+        limit = first_max_chars if first_max_chars and not chunks else max_chars
+        if current and current_len + 1 + len(word) > limit:
+            chunks.append(" ".join(current))
+            current, current_len = [], 0
+            limit = max_chars
+        current_len += len(word) + (1 if current else 0)
+        current.append(word)
+        if current_len >= limit // 2 and word[-1] in ",;:—":
+            chunks.append(" ".join(current))
+            current, current_len = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class SentenceSplitter:
+    """Инкрементально собирает поток токенов LLM в законченные предложения."""
+
+    _sentence_end = re.compile(r'[\.!\?…]+["»)]?\s+')
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, delta):
+        self.buffer += delta
+        sentences = []
+        while True:
+            match = self._sentence_end.search(self.buffer)
+            if not match:
+                break
+            sentences.append(self.buffer[:match.end()])
+            self.buffer = self.buffer[match.end():]
+        return sentences
+
+    def flush(self):
+        rest, self.buffer = self.buffer, ""
+        return [rest] if rest.strip() else []
+
+
+class TTSJob:
+    def __init__(self):
+        self.created_at = time.perf_counter()
+        self.first_audio_at = None
+        self.chunks = 0
+        self.cancelled = False
+        self.done = threading.Event()
+        self.playbacks = []
+
+    @property
+    def time_to_first_audio_ms(self):
+        if self.first_audio_at is None:
+            return None
+        return (self.first_audio_at - self.created_at) * 1000
+
+
+class TTSPipeline:
+    """
+    Конвейер синтеза и воспроизведения: поток синтеза заполняет ограниченную очередь PCM,
+    поток воспроизведения ставит фрагменты в канал "speech" общего AudioOutput.
+    """
+
+    def __init__(self, synthesize, output, sample_rate, max_buffered_chunks=TTS_MAX_BUFFERED_CHUNKS,
+                 first_chunk_chars=TTS_FIRST_CHUNK_CHARS, max_chunk_chars=TTS_MAX_CHUNK_CHARS):
+        self.synthesize = synthesize
+        self.output = output
+        self.sample_rate = sample_rate
+        self.first_chunk_chars = first_chunk_chars
+        self.max_chunk_chars = max_chunk_chars
+        self.text_queue = queue.Queue()
+        self.pcm_queue = queue.Queue(maxsize=max_buffered_chunks)
+        self._active_jobs = set()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._synthesis_worker, name="tts-synthesis", daemon=True),
+                threading.Thread(target=self._playback_worker, name="tts-playback", daemon=True),
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def begin(self):
+        self._ensure_started()
+        job = TTSJob()
+        with self._lock:
+            self._active_jobs.add(job)
+        return job
+
+    def feed(self, job, sentence):
+        first_max = self.first_chunk_chars if job.chunks == 0 else None
+        for piece in split_for_tts(sentence, self.max_chunk_chars, first_max):
+            job.chunks += 1
+            self.text_queue.put((job, piece))
+
+    def end(self, job):
+        self.text_queue.put((job, _END))
+
+    def speak(self, sentences, wait=True):
+        job = self.begin()
+        for sentence in sentences:
+            self.feed(job, sentence)
+        self.end(job)
+        if wait:
+            job.done.wait()
+        return job
+
+    def stop(self):
+        with self._lock:
+            playbacks = []
+            for job in self._active_jobs:
+                job.cancelled = True
+                playbacks.extend(job.playbacks)
+        for playback in playbacks:
+            playback.cancel()
+        return playbacks
+
+    @property
+    def is_playing(self):
+        with self._lock:
+            return any(not p.done.is_set() for job in self._active_jobs for p in job.playbacks)
+
+    def interrupt(self, timeout=0.5):
+        """Отменяет все задания и ждёт, пока микшер перестанет выводить их звук (мс)."""
+        started = time.perf_counter()
+        for playback in self.stop():
+            playback.wait(max(timeout - (time.perf_counter() - started), 0))
+        return (time.perf_counter() - started) * 1000
+
+    def close(self):
+        self.stop()
+
+    def _synthesis_worker(self):
+        while True:
+            job, item = self.text_queue.get()
+            if item is _END:
+                self.pcm_queue.put((job, _END))
+                continue
+            if job.cancelled:
+                continue
+            try:
+                pcm = self.synthesize(item)
+            except Exception as e:
+                print(f"Ошибка синтеза фрагмента '{item}': {e}")
+                continue
+            self.pcm_queue.put((job, pcm))
+
+    def _playback_worker(self):
+        previous = None
+        while True:
+            job, pcm = self.pcm_queue.get()
+            if pcm is _END:
+                if previous is not None:
+                    previous.wait()
+                    previous = None
+                with self._lock:
+                    self._active_jobs.discard(job)
+                job.done.set()
+                continue
+            if job.cancelled:
+                continue
+            if job.first_audio_at is None:
+                job.first_audio_at = time.perf_counter()
+            with self._lock:
+                playback = self.output.play(pcm, self.sample_rate, channel="speech")
+                job.playbacks.append(playback)
+                if job.cancelled:
+                    playback.cancel()
+            # Следующий фрагмент ставится в очередь канала, пока звучит текущий: без пауз между ними.
+            if previous is not None:
+                previous.wait()
+            previous = playback
+
+
+class TTSStream:
+    """Озвучивает ответ LLM по мере генерации: токены → предложения → TTSPipeline."""
+
+    def __init__(self, pipeline, on_sentence=None):
+        self.pipeline = pipeline
+        self.on_sentence = on_sentence
+        self.job = pipeline.begin()
+        self.splitter = SentenceSplitter()
+        self.text = ""
+
+    def on_text(self, delta):
+        for sentence in self.splitter.feed(delta):
+            self._say(sentence)
+
+    def _say(self, sentence):
+        self.text += sentence
+        if self.on_sentence:
+            self.on_sentence(self.text)
+        self.pipeline.feed(self.job, sentence)
+
+    def finish(self):
+        for sentence in self.splitter.flush():
+            self._say(sentence)
+        self.pipeline.end(self.job)
+        return self.job
+
+    def abort(self):
+        self.job.cancelled = True
+        self.pipeline.end(self.job)